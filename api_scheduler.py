@@ -0,0 +1,198 @@
+import email.utils
+import os
+import random
+import threading
+import time
+
+# Shared admission control for every API request (transcriptions, Responses,
+# Chat Completions). Each API endpoint (client base URL) gets one scheduler
+# with token buckets for requests and tokens per minute, a cap on requests in
+# flight, and retries with exponential backoff and full jitter for 429s,
+# timeouts, connection errors and 5xx answers. A Retry-After header is always
+# honoured, and it pauses every request to that endpoint, not only the one that
+# got it. Clients are created with max_retries=0 so retries only happen here:
+#   result = get_scheduler(client).call(lambda: client.responses.create(...), tokens=prompt_tokens)
+# A streamed answer is read through consume=, so the request keeps its slot
+# until the whole body has arrived, not just the headers.
+
+REQUESTS_PER_MINUTE = int(os.getenv("API_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("API_TOKENS_PER_MINUTE", "500000"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", "8"))
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0  # Seconds before the first retry (before jitter), doubled on each attempt
+BACKOFF_MAX = 60.0
+BUCKET_SECONDS = 10  # Burst size of the buckets, in seconds of their per-minute rate
+RETRY_STATUS_CODES = (408, 409, 429)  # Plus every 5xx
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60
+        self.capacity = capacity or max(1.0, per_minute * BUCKET_SECONDS / 60)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take amount (at most a full bucket) and return the seconds to wait
+        before using it; the bucket may go into debt, so callers queue up."""
+        with self.lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            self.available -= min(amount, self.capacity)
+            return max(0.0, -self.available / self.rate)
+
+
+# Seconds an error's Retry-After / retry-after-ms header asks for, or None
+def get_retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    import openai  # Imported here so scripts that never send a request skip the SDK import
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRY_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+class APIScheduler:
+    def __init__(
+        self,
+        name,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        max_concurrent=MAX_CONCURRENT_REQUESTS,
+        max_retries=MAX_RETRIES,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.max_retries = max_retries
+        self.paused_until = 0.0  # Set by Retry-After answers, applies to every request
+        self.random = random.Random()
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "throttled": 0, "throttle_seconds": 0.0, "retried": 0, "rate_limited": 0, "failed": 0}
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] += value
+
+    # Wait for the endpoint pause, a request and `tokens` tokens; returns the seconds waited
+    def admit(self, tokens):
+        wait = max(0.0, self.paused_until - time.time())
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def get_backoff(self, attempt, error):
+        retry_after = get_retry_after(error)
+        backoff = self.random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))  # Full jitter
+        if retry_after is None:
+            return backoff
+        # The server knows best: wait at least that long, jittered so waiting requests do not return together
+        delay = retry_after + self.random.uniform(0, BACKOFF_BASE)
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + retry_after)
+        return delay
+
+    def call(self, send, tokens=0, trace_span=None, consume=None):
+        """Run send() (one API request) under the limits, retrying transient
+        failures; returns its result or raises its last error. tokens is the
+        request's estimated token count; trace_span (a tracing span) gets
+        retries and throttle_seconds. With consume, consume(result) is run
+        (and returned) while the request still holds its slot, e.g. to read a
+        stream to the end; it is not retried."""
+        self.count("calls")
+        throttle_seconds = 0.0
+        attempt = 0
+        while True:
+            waited = self.admit(tokens if attempt == 0 else 0)
+            throttle_seconds += waited
+            try:
+                self.slots.acquire()
+                try:
+                    result = send()
+                except BaseException:
+                    self.slots.release()
+                    raise
+                break
+            except Exception as e:
+                if getattr(e, "status_code", None) == 429:
+                    self.count("rate_limited")
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self.count("failed")
+                    if is_retryable(e):
+                        print(f"{self.name}: giving up after {attempt + 1} attempts ({type(e).__name__})")
+                    raise
+                delay = self.get_backoff(attempt, e)
+                attempt += 1
+                self.count("retried")
+                print(f"{self.name}: {type(e).__name__}, retry {attempt}/{self.max_retries} in {delay:.1f} seconds")
+                time.sleep(delay)
+                throttle_seconds += delay
+
+        if throttle_seconds > 0:
+            self.count("throttled")
+            self.count("throttle_seconds", throttle_seconds)
+        if trace_span:
+            trace_span.set(retries=attempt, throttle_seconds=round(throttle_seconds, 3))
+        try:
+            return consume(result) if consume else result
+        finally:
+            self.slots.release()
+
+
+# Scheduler shared by every client of the same endpoint
+def get_scheduler(client):
+    name = str(client.base_url)
+    with _schedulers_lock:
+        if name not in _schedulers:
+            _schedulers[name] = APIScheduler(name)
+        return _schedulers[name]
+
+
+# {endpoint: counters} of every scheduler used in this process
+def get_scheduler_stats():
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    stats = {}
+    for scheduler in schedulers:
+        with scheduler.lock:
+            stats[scheduler.name] = dict(scheduler.stats)
+    return stats
+
+
+def print_scheduler_stats():
+    for name, stats in get_scheduler_stats().items():
+        if stats["calls"]:
+            print(
+                f"API {name}: {stats['calls']} call(s), {stats['throttled']} throttled ({stats['throttle_seconds']:.1f}s waiting), "
+                f"{stats['retried']} retried ({stats['rate_limited']} rate limited), {stats['failed']} failed"
+            )
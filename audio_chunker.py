@@ -0,0 +1,273 @@
+import json
+import os
+import subprocess
+import tempfile
+from collections import namedtuple
+from tracing import span
+
+# Streaming audio helpers built directly on ffmpeg/ffprobe (the same tools
+# pydub shells out to). Every window is decoded and encoded by its own ffmpeg
+# process that seeks straight to the window start, so memory use stays bounded
+# no matter how long the recording is. Joining and splitting whole recordings
+# (join_audio_files, split_audio_copy) copies the compressed packets instead,
+# decoding only when the inputs' formats differ.
+
+AudioChunk = namedtuple("AudioChunk", ["path", "start_ms", "end_ms"])
+
+
+def run_ffmpeg(args):
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y", *args]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found. Install ffmpeg and make sure it is on PATH")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg failed: {e.stderr.decode('utf-8', errors='replace').strip()}")
+    return result.stdout
+
+
+def probe_audio(audio_file):
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"Audio file not found: {audio_file}")
+
+    command = ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", "-select_streams", "a:0", audio_file]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffprobe not found. Install ffmpeg and make sure it is on PATH")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffprobe failed for {audio_file}: {e.stderr.decode('utf-8', errors='replace').strip()}")
+    return json.loads(result.stdout)
+
+
+# Duration of an audio file in milliseconds, read from the container without decoding
+def get_audio_duration(audio_file):
+    info = probe_audio(audio_file)
+    duration = info.get("format", {}).get("duration")
+    if duration is None and info.get("streams"):
+        duration = info["streams"][0].get("duration")
+    if duration is None:
+        raise ValueError(f"Could not determine duration of audio file: {audio_file}")
+    return int(float(duration) * 1000)
+
+
+# Encode [start_ms, end_ms) of the input into output_file; only that window is decoded
+def export_audio_window(audio_file, output_file, start_ms, end_ms, bitrate=None, extra_args=()):
+    args = ["-ss", f"{start_ms / 1000:.3f}", "-t", f"{(end_ms - start_ms) / 1000:.3f}", "-i", audio_file, "-vn", "-map_metadata", "-1"]
+    if bitrate:
+        args += ["-b:a", bitrate]
+    args += [*extra_args, output_file]
+    run_ffmpeg(args)
+    return output_file
+
+
+# Encode the (start_ms, end_ms) spans of the input back to back into output_file,
+# dropping the audio between them; only the stretch from the first span to the
+# last is decoded, and aselect keeps whole decoded frames (~20 ms) inside the spans
+def export_audio_spans(audio_file, output_file, spans, bitrate=None, extra_args=()):
+    first_ms, last_ms = spans[0][0], spans[-1][1]
+    ranges = "+".join(f"between(t,{(start_ms - first_ms) / 1000:.3f},{(end_ms - first_ms) / 1000:.3f})" for start_ms, end_ms in spans)
+    args = ["-ss", f"{first_ms / 1000:.3f}", "-t", f"{(last_ms - first_ms) / 1000:.3f}", "-i", audio_file, "-vn", "-map_metadata", "-1"]
+    args += ["-af", f"aselect='{ranges}',asetpts=N/SR/TB"]
+    if bitrate:
+        args += ["-b:a", bitrate]
+    args += [*extra_args, output_file]
+    run_ffmpeg(args)
+    return output_file
+
+
+# Decode (start_ms, end_ms) windows to raw 16-bit little-endian mono PCM bytes at
+# sample_rate; all windows share one ffmpeg process, each with its own input seek
+def decode_audio_windows(audio_file, windows, sample_rate=8000):
+    if not windows:
+        return []
+    with tempfile.TemporaryDirectory() as work_dir, span("decode", windows=len(windows), sample_rate=sample_rate) as current:
+        args = []
+        for start_ms, end_ms in windows:
+            args += ["-ss", f"{start_ms / 1000:.3f}", "-t", f"{(end_ms - start_ms) / 1000:.3f}", "-i", audio_file]
+        output_files = [os.path.join(work_dir, f"window_{i}.raw") for i in range(len(windows))]
+        for i, output_file in enumerate(output_files):
+            args += ["-map", f"{i}:a:0", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", output_file]
+        run_ffmpeg(args)
+
+        pcm_windows = []
+        for output_file in output_files:
+            with open(output_file, "rb") as file:
+                pcm_windows.append(file.read())
+        current.set(bytes=sum(len(pcm) for pcm in pcm_windows))
+    return pcm_windows
+
+
+# Split [0, duration_ms) into num_chunks equal windows, the last one taking the remainder
+def fixed_boundaries(duration_ms, num_chunks):
+    chunk_duration = duration_ms // num_chunks
+    boundaries = []
+    for i in range(num_chunks):
+        start_ms = i * chunk_duration
+        end_ms = (i + 1) * chunk_duration if i < num_chunks - 1 else duration_ms
+        boundaries.append((start_ms, end_ms))
+    return boundaries
+
+
+def iter_audio_chunks(
+    audio_file,
+    output_dir,
+    boundaries,
+    bitrate=None,
+    extension="mp3",
+    name_format="chunk_{number}",
+    extra_args=(),
+    max_size=None,
+    split_window=None,
+    speech_map=None,
+    skip_window=None,
+):
+    """Encode each (start_ms, end_ms) window of audio_file and yield an AudioChunk
+    as soon as its file is written.
+
+    If max_size is given, a chunk that encodes larger than max_size bytes is
+    discarded and its window re-planned with split_window(start_ms, end_ms),
+    which returns smaller windows; only that window is re-encoded.
+
+    With a speech_map (voice_activity.SpeechMap) the windows are on its
+    condensed timeline, and each chunk holds only the speech spans they cover.
+
+    Windows for which skip_window(start_ms, end_ms) is true (e.g. already
+    transcribed) are yielded without encoding, as AudioChunks with path None.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pending = list(reversed(boundaries))
+    number = 0
+    while pending:
+        start_ms, end_ms = pending.pop()
+        if skip_window is not None and skip_window(start_ms, end_ms):
+            number += 1
+            yield AudioChunk(None, start_ms, end_ms)
+            continue
+        chunk_file = os.path.join(output_dir, f"{name_format.format(number=number + 1)}.{extension}")
+        with span("encode", chunk=number + 1, start_ms=start_ms, end_ms=end_ms, bitrate=bitrate) as current:
+            if speech_map is None:
+                export_audio_window(audio_file, chunk_file, start_ms, end_ms, bitrate=bitrate, extra_args=extra_args)
+            else:
+                export_audio_spans(audio_file, chunk_file, speech_map.original_spans(start_ms, end_ms), bitrate=bitrate, extra_args=extra_args)
+            current.set(bytes=os.path.getsize(chunk_file))
+
+        if max_size is not None and os.path.getsize(chunk_file) > max_size:
+            if split_window is None:
+                raise ValueError(f"Chunk {start_ms}-{end_ms} ms is {os.path.getsize(chunk_file)} bytes, over the {max_size} byte limit")
+            os.remove(chunk_file)
+            pending.extend(reversed(split_window(start_ms, end_ms)))
+            continue
+
+        number += 1
+        yield AudioChunk(chunk_file, start_ms, end_ms)
+
+
+# Concatenate audio files by streaming them through ffmpeg's concat filter
+def concat_audio_files(input_files, output_file, extra_args=()):
+    if len(input_files) < 2:
+        raise ValueError(f"Need at least two audio files to join, got {len(input_files)}")
+
+    args = []
+    for input_file in input_files:
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"Audio file not found: {input_file}")
+        args += ["-i", input_file]
+    inputs = "".join(f"[{i}:a:0]" for i in range(len(input_files)))
+    args += ["-filter_complex", f"{inputs}concat=n={len(input_files)}:v=0:a=1[out]", "-map", "[out]", *extra_args, output_file]
+    run_ffmpeg(args)
+    return output_file
+
+
+# (codec, sample rate, channels) of the first audio stream; packets from files
+# with the same format can be joined without decoding
+def get_audio_format(audio_file):
+    streams = probe_audio(audio_file).get("streams") or []
+    if not streams:
+        raise ValueError(f"No audio stream found in: {audio_file}")
+    stream = streams[0]
+    return stream.get("codec_name"), int(stream.get("sample_rate") or 0), stream.get("channels")
+
+
+# One line of an ffmpeg concat demuxer list, with quotes escaped the way the demuxer expects
+def format_concat_entry(path):
+    escaped = os.path.abspath(path).replace("'", "'\\''")
+    return f"file '{escaped}'\n"
+
+
+# Concatenate audio files by copying their compressed packets (concat demuxer); nothing is decoded
+def concat_audio_copy(input_files, output_file):
+    if len(input_files) < 2:
+        raise ValueError(f"Need at least two audio files to join, got {len(input_files)}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        list_path = os.path.join(work_dir, "inputs.txt")
+        with open(list_path, "w", encoding="utf-8") as file:
+            for input_file in input_files:
+                if not os.path.exists(input_file):
+                    raise FileNotFoundError(f"Audio file not found: {input_file}")
+                file.write(format_concat_entry(input_file))
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-map", "0:a:0", "-c", "copy", "-map_metadata", "-1", output_file])
+    return output_file
+
+
+def join_audio_files(input_files, output_file, reencode=False, extra_args=()):
+    """Join input_files into output_file in order. When every input has the
+    same codec, sample rate and channel count, and the same file extension as
+    the output (so the container is known to hold the codec), the packets are
+    copied as they are; otherwise, or with reencode=True, they are decoded and
+    re-encoded through the concat filter, with extra_args. Returns True when
+    the packets were copied."""
+    formats = [get_audio_format(input_file) for input_file in input_files]
+    extensions = {os.path.splitext(path)[1].lower() for path in [*input_files, output_file]}
+    if not reencode:
+        if len(extensions) > 1:
+            print(f"Output {os.path.basename(output_file)} is not in the inputs' container, re-encoding")
+        elif len(set(formats)) == 1:
+            try:
+                with span("join", files=len(input_files), copy=True) as current:
+                    concat_audio_copy(input_files, output_file)
+                    current.set(bytes=os.path.getsize(output_file))
+                return True
+            except RuntimeError as e:
+                print(f"Stream copy into {os.path.basename(output_file)} failed, re-encoding instead ({e})")
+        else:
+            different = ", ".join(sorted({f"{codec} {rate} Hz {channels}ch" for codec, rate, channels in formats}))
+            print(f"Inputs differ in format ({different}), re-encoding")
+
+    with span("join", files=len(input_files), copy=False) as current:
+        concat_audio_files(input_files, output_file, extra_args)
+        current.set(bytes=os.path.getsize(output_file))
+    return False
+
+
+def split_audio_copy(audio_file, output_dir, boundaries, name_format="part{number}"):
+    """Cut audio_file at the start of every (start_ms, end_ms) window after
+    the first by copying packets into one file per window (segment muxer),
+    in the input's container. Cuts land on the
+    first packet at or after each boundary (a ~20-30 ms AAC/MP3 frame), so the
+    returned AudioChunks carry the actual times, read from the parts."""
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"Audio file not found: {audio_file}")
+    extension = os.path.splitext(audio_file)[1].lstrip(".")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # The segment muxer numbers files with printf patterns, so literal % signs are doubled
+    pattern = os.path.join(output_dir.replace("%", "%%"), name_format.replace("%", "%%").replace("{number}", "%d") + f".{extension}")
+    args = ["-i", audio_file, "-map", "0:a:0", "-c", "copy", "-map_metadata", "-1", "-f", "segment", "-segment_start_number", "1", "-reset_timestamps", "1"]
+    if len(boundaries) > 1:
+        args += ["-segment_times", ",".join(f"{start_ms / 1000:.3f}" for start_ms, _ in boundaries[1:])]
+    with span("split", parts=len(boundaries), copy=True) as current:
+        run_ffmpeg([*args, pattern])
+
+        chunks = []
+        start_ms = boundaries[0][0] if boundaries else 0
+        for number in range(1, len(boundaries) + 1):
+            chunk_file = os.path.join(output_dir, f"{name_format.format(number=number)}.{extension}")
+            if not os.path.exists(chunk_file):
+                break
+            end_ms = start_ms + get_audio_duration(chunk_file)
+            chunks.append(AudioChunk(chunk_file, start_ms, end_ms))
+            start_ms = end_ms
+        current.set(bytes=sum(os.path.getsize(chunk.path) for chunk in chunks))
+    return chunks
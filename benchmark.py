@@ -0,0 +1,1157 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from chunk_planner import SEARCH_WINDOW_MS, estimate_encoded_size
+from fake_openai_server import start_fake_server
+
+# Offline benchmarks for the session pipeline. API calls go to the local
+# fake server in fake_openai_server.py, audio is synthesized with ffmpeg.
+#   python benchmark.py transcription --jobs 1,2,4,8
+#   python benchmark.py chunker --hours 3 --compare-pydub
+#   python benchmark.py planner --hours 4 --chunks 4
+#   python benchmark.py chunk-count --hours 1,2.25,3.5
+#   python benchmark.py notes --count 500
+#   python benchmark.py context --count 60 --budget 30000
+#   python benchmark.py stream --latency 2 --generation-time 20
+#   python benchmark.py llm-cache --requests 20
+#   python benchmark.py whisper-daemon --model tiny --jobs 3
+#   python benchmark.py whisper-workers --model tiny --workers 1,2,4,8 --threads 1
+#   python benchmark.py summary --hours 2,4,6,8 --latency-per-kchar 0.05
+#   python benchmark.py e2e --minutes 10,30,60 --jitter 0.5 --rpm-limit 20 --output bench.json --baseline old.json
+#   python benchmark.py scheduler --requests 40 --rate-limit-rate 0.1
+#   python benchmark.py cold-start --repeat 5
+#   python benchmark.py join-split --parts 4 --minutes 30
+#   python benchmark.py silence --minutes 60 --break-seconds 120
+#   python benchmark.py live --minutes 60 --speed 20 --format mp3 --latency-per-mb 3
+
+
+# Generate a synthetic recording with ffmpeg (a tone, so every codec accepts it).
+# With pauses=True the tone drops out for the first second of every 7, like
+# gaps between sentences; break_seconds silences the start of every 10 minutes,
+# like a table break.
+def make_synthetic_audio(path, duration_seconds, channels=1, pauses=False, break_seconds=0):
+    if pauses or break_seconds:
+        gates = "*gt(mod(t\\,7)\\,1)" if pauses else ""
+        gates += f"*gt(mod(t\\,600)\\,{break_seconds})" if break_seconds else ""
+        source = f"aevalsrc=sin(2*PI*220*t){gates}:s=44100:d={duration_seconds}"
+    else:
+        source = f"sine=frequency=220:sample_rate=44100:duration={duration_seconds}"
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            source,
+            "-ac",
+            str(channels),
+            *(["-b:a", "96k"] if path.endswith(".m4a") else []),
+            path,
+        ],
+        check=True,
+    )
+    return path
+
+
+# Import main_openai pointed at the fake server
+def import_main_openai(server):
+    os.environ["OPENAI_API_KEY"] = "fake-key"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    import main_openai
+
+    return main_openai
+
+
+# Wall-clock time of transcribe_audio for several --jobs values
+def benchmark_transcription(args):
+    server = start_fake_server(latency=args.latency)
+    main_openai = import_main_openai(server)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_file = make_synthetic_audio(os.path.join(work_dir, "session_bench.wav"), args.duration)
+
+        # Shrink the size limit so the synthetic session splits into about `--chunks` chunks
+        chunk_duration = args.duration * 1000 // args.chunks + 2 * SEARCH_WINDOW_MS
+        main_openai.OPENAI_MAX_FILE_SIZE = estimate_encoded_size(chunk_duration, main_openai.CHUNK_BITRATE)
+
+        print(f"Fake latency per request: {args.latency:.2f} s, audio: {args.duration} s")
+        print(f"{'jobs':>6} {'wall (s)':>10} {'speedup':>8}")
+        baseline = None
+        for jobs in [int(value) for value in args.jobs.split(",")]:
+            main_openai.TRANSCRIPTION_CACHE_DIRECTORY = os.path.join(work_dir, f"cache_jobs_{jobs}")
+            start_time = time.time()
+            main_openai.transcribe_audio(audio_file, os.path.join(work_dir, f"session_jobs_{jobs}"), jobs=jobs)
+            elapsed = time.time() - start_time
+            baseline = baseline or elapsed
+            print(f"{jobs:>6} {elapsed:>10.2f} {baseline / elapsed:>7.2f}x")
+
+    server.shutdown()
+
+
+# Run a Python snippet in a fresh process and return (seconds, peak RSS in MB)
+# of that process or anything it spawned (ffmpeg included)
+def measure_subprocess(code):
+    code += (
+        "\nimport resource\n"
+        "peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)\n"
+        "print(f'PEAK_RSS_KB={peak}')\n"
+    )
+    start_time = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    elapsed = time.time() - start_time
+    peak_kb = int(result.stdout.strip().splitlines()[-1].split("=")[1])
+    return elapsed, peak_kb / 1024
+
+
+# Peak memory of the streaming chunker on a synthetic multi-hour stereo m4a
+def benchmark_chunker(args):
+    with tempfile.TemporaryDirectory() as work_dir:
+        duration = int(args.hours * 3600)
+        audio_file = os.path.join(work_dir, "session_bench.m4a")
+        print(f"Synthesizing {args.hours:g} h stereo m4a...")
+        make_synthetic_audio(audio_file, duration, channels=2)
+        print(f"Input size: {os.path.getsize(audio_file) / (1024*1024):.1f} MB")
+
+        chunks_dir = os.path.join(work_dir, "chunks")
+        num_chunks = max(1, duration // args.chunk_seconds)
+        elapsed, peak = measure_subprocess(
+            "from audio_chunker import fixed_boundaries, get_audio_duration, iter_audio_chunks\n"
+            f"audio_file = {audio_file!r}\n"
+            f"boundaries = fixed_boundaries(get_audio_duration(audio_file), {num_chunks})\n"
+            f"for chunk in iter_audio_chunks(audio_file, {chunks_dir!r}, boundaries, bitrate='48k'):\n"
+            "    pass\n"
+        )
+        print(f"Streaming chunker: {num_chunks} chunks in {elapsed:.1f} s, peak RSS {peak:.0f} MB")
+
+        if args.compare_pydub:
+            elapsed, peak = measure_subprocess(
+                "from pydub import AudioSegment\n"
+                f"audio = AudioSegment.from_file({audio_file!r})\n"
+                "print(len(audio))\n"
+            )
+            print(f"pydub full decode: {elapsed:.1f} s, peak RSS {peak:.0f} MB")
+
+
+# Silence-aware boundary planning time per hour of audio
+def benchmark_planner(args):
+    from audio_chunker import get_audio_duration
+    from chunk_planner import plan_chunk_boundaries
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_file = os.path.join(work_dir, "session_bench.m4a")
+        print(f"Synthesizing {args.hours:g} h stereo m4a with pauses...")
+        make_synthetic_audio(audio_file, int(args.hours * 3600), channels=2, pauses=True)
+
+        duration = get_audio_duration(audio_file)
+        start_time = time.time()
+        boundaries = plan_chunk_boundaries(audio_file, duration, args.chunks, duration)
+        elapsed = time.time() - start_time
+
+        # Pauses are at [0, 1) s of every 7 s, so a good cut has a phase below 1 s
+        phases = ", ".join(f"{(end_ms / 1000) % 7:.2f}" for _, end_ms in boundaries[:-1])
+        print(f"Planned {len(boundaries)} chunks in {elapsed:.3f} s ({elapsed / args.hours:.3f} s per hour of audio)")
+        print(f"Cut phase within the 7 s pause cycle (pause = 0-1 s): {phases}")
+
+
+# Analytic chunk-count planning vs the old 60-second test encode with a 1.2x margin
+def benchmark_chunk_count(args):
+    from audio_chunker import export_audio_window
+    from chunk_planner import plan_chunk_count
+
+    bitrate = "48k"
+    max_size = 25 * 1024 * 1024
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_file = make_synthetic_audio(os.path.join(work_dir, "session_bench.m4a"), args.check_seconds, channels=2)
+
+        # Old approach: encode the first 60 seconds and extrapolate
+        start_time = time.time()
+        test_file = export_audio_window(audio_file, os.path.join(work_dir, "test_chunk.mp3"), 0, 60000, bitrate=bitrate)
+        bytes_per_ms = os.path.getsize(test_file) / 60000
+        test_encode_seconds = time.time() - start_time
+
+        start_time = time.time()
+        hours = [float(value) for value in args.hours.split(",")]
+        analytic_counts = [plan_chunk_count(int(h * 3600 * 1000), bitrate, max_size) for h in hours]
+        analytic_seconds = time.time() - start_time
+
+        print(f"Planning time: test encode {test_encode_seconds * 1000:.1f} ms, analytic {analytic_seconds * 1000:.3f} ms")
+        print(f"{'hours':>6} {'old chunks':>11} {'analytic':>9} {'analytic chunk (MB)':>20}")
+        for h, analytic_count in zip(hours, analytic_counts):
+            duration_ms = h * 3600 * 1000
+            old_count = int((bytes_per_ms * duration_ms / max_size) * 1.2) + 1
+            chunk_mb = estimate_encoded_size(duration_ms / analytic_count, bitrate) / (1024 * 1024)
+            print(f"{h:>6g} {old_count:>11} {analytic_count:>9} {chunk_mb:>20.2f}")
+
+        # Check the size model against a real encode
+        check_file = export_audio_window(audio_file, os.path.join(work_dir, "check.mp3"), 0, args.check_seconds * 1000, bitrate=bitrate)
+        actual_size = os.path.getsize(check_file)
+        estimated_size = estimate_encoded_size(args.check_seconds * 1000, bitrate)
+        print(f"Size model check ({args.check_seconds} s): estimated {estimated_size} bytes, actual {actual_size} bytes")
+
+
+# Session-notes context load time: the old re-read-everything approach vs the mtime/size cache
+def benchmark_notes(args):
+    from session_notes import SESSION_SEPARATOR, get_markdown_file_paths, get_text_from_file, load_session_notes, write_combined_sessions
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        notes_directory = os.path.join(work_dir, "Sessions")
+        cache_directory = os.path.join(work_dir, "cache")
+        combined_path = os.path.join(work_dir, "combined_sessions.md")
+        os.makedirs(notes_directory)
+        paragraph = "O grupo viaja até Beshkarl e encontra o Thorkell na Cidade Baixa. " * 20 + "\n\n"
+        for number in range(1, args.count + 1):
+            with open(os.path.join(notes_directory, f"session {number}.md"), "w", encoding="utf-8") as file:
+                file.write(paragraph * args.paragraphs)
+
+        def legacy_load(last=None):
+            text = ""
+            for notes_file in get_markdown_file_paths(notes_directory)[-last if last else 0 :]:
+                text += get_text_from_file(notes_file) + SESSION_SEPARATOR
+            with open(combined_path, "w", encoding="utf-8") as file:
+                file.write(text.strip())
+
+        def cached_load(last=None):
+            write_combined_sessions(load_session_notes(notes_directory, last=last, cache_directory=cache_directory), combined_path)
+
+        def timed(function):
+            start_time = time.time()
+            function()
+            return (time.time() - start_time) * 1000
+
+        print(f"Vault: {args.count} notes of ~{len(paragraph) * args.paragraphs / 1024:.0f} KB")
+        for label, last in [("all sessions (main.py, join_text.py)", None), ("last 10 sessions (main_openai.py)", 10)]:
+            print(f"\n{label}:")
+            print(f"  Before (re-read, always rewrite): {timed(lambda: legacy_load(last)):8.1f} ms")
+            print(f"  After, cold cache:                {timed(lambda: cached_load(last)):8.1f} ms")
+            print(f"  After, warm cache:                {timed(lambda: cached_load(last)):8.1f} ms")
+            with open(os.path.join(notes_directory, f"session {args.count}.md"), "a", encoding="utf-8") as file:
+                file.write("Nova nota.\n")
+            print(f"  After, one note changed:          {timed(lambda: cached_load(last)):8.1f} ms")
+            shutil.rmtree(cache_directory)
+
+
+# Summary latency on long synthetic transcripts: one request vs map-reduce
+def benchmark_summary(args):
+    server = start_fake_server(latency=args.latency, latency_per_kchar=args.latency_per_kchar)
+    main_openai = import_main_openai(server)
+    main_openai.USE_LLM_CACHE = False  # Both modes send the same prompts
+    sentence = "O Thorkell leva o grupo até ao farol de Beshkarl e fala do cálice que a Ordem de Sangue escondeu. "
+    chunk_transcript = sentence * 60  # One chunk transcript paragraph, roughly 10 minutes of speech
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        rows = []
+        for hours in [float(value) for value in args.hours.split(",")]:
+            transcript = "\n\n".join([chunk_transcript] * max(1, int(hours * 6)))
+            times = {}
+            for mode in main_openai.SUMMARY_MODES:
+                start_time = time.time()
+                main_openai.summarize_text(transcript, "session_bench", os.path.join(work_dir, mode), "", mode=mode)
+                times[mode] = time.time() - start_time
+            rows.append((hours, main_openai.count_tokens(transcript), times))
+
+    print(f"\nFake latency: {args.latency:.2f} s + {args.latency_per_kchar:.3f} s per 1000 prompt characters")
+    print(f"{'hours':>6} {'tokens':>9} {'single (s)':>11} {'map-reduce (s)':>15} {'speedup':>8}")
+    for hours, tokens, times in rows:
+        print(f"{hours:>6g} {tokens:>9,} {times['single']:>11.2f} {times['map-reduce']:>15.2f} {times['single'] / times['map-reduce']:>7.2f}x")
+    server.shutdown()
+
+
+# Time until the first words reach the output file, and until it is complete,
+# with and without streaming, for both API styles
+def benchmark_stream(args):
+    from openai import OpenAI
+    from llm import create_chat_text, create_response_text
+
+    server = start_fake_server(latency=args.latency, generation_time=args.generation_time)
+    client = OpenAI(api_key="fake-key", base_url=server.base_url, max_retries=0)
+    calls = {
+        "Responses API": lambda path, stream: create_response_text(client, "gpt-5-mini", "Resume a sessão.", path, stream=stream, cache=False),
+        "Chat Completions": lambda path, stream: create_chat_text(
+            client, "deepseek-reasoner", [{"role": "user", "content": "Resume a sessão."}], path, stream=stream, cache=False
+        ),
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        rows = []
+        for api, call in calls.items():
+            for stream in (False, True):
+                output_path = os.path.join(work_dir, f"{api}_{stream}.txt")
+                watched_path = f"{output_path}.partial" if stream else output_path
+                first_output = []
+
+                # Poll the file the user would open, as a reader would
+                def watch():
+                    while not first_output:
+                        for path in (watched_path, output_path):
+                            if os.path.exists(path) and os.path.getsize(path) > 0:
+                                first_output.append(time.time())
+                                return
+                        time.sleep(0.01)
+
+                watcher = threading.Thread(target=watch, daemon=True)
+                start_time = time.time()
+                watcher.start()
+                call(output_path, stream)
+                total = time.time() - start_time
+                watcher.join(timeout=1)
+                rows.append((api, stream, first_output[0] - start_time if first_output else total, total))
+
+    print(f"\nFake latency: {args.latency:.2f} s to the first token, {args.generation_time:.2f} s of generation")
+    print(f"{'API':<18} {'mode':<10} {'first output (s)':>17} {'complete (s)':>13}")
+    for api, stream, first, total in rows:
+        print(f"{api:<18} {'stream' if stream else 'blocking':<10} {first:>17.2f} {total:>13.2f}")
+    server.shutdown()
+
+
+# Repeated LLM requests (re-running campaign_summary.py, asking the same
+# custom question) with and without the response cache
+def benchmark_llm_cache(args):
+    from openai import OpenAI
+    import llm
+
+    server = start_fake_server(latency=args.latency)
+    client = OpenAI(api_key="fake-key", base_url=server.base_url, max_retries=0)
+    combined_sessions = "O grupo viaja até Beshkarl e encontra o Thorkell na Cidade Baixa. " * 2000
+    prompts = [f"Pergunta {number % args.distinct}: o que aconteceu?\n{combined_sessions}" for number in range(args.requests)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        llm.CACHE_DIRECTORY = os.path.join(work_dir, "llm")
+        rows = []
+        for label, cache in [("no cache", False), ("cold cache", True), ("warm cache", True)]:
+            hits, misses = llm.get_cache_stats()
+            start_time = time.time()
+            for prompt in prompts:
+                llm.create_chat_text(client, "deepseek-reasoner", [{"role": "user", "content": prompt}], cache=cache)
+            elapsed = time.time() - start_time
+            new_hits, new_misses = llm.get_cache_stats()
+            rows.append((label, elapsed, new_hits - hits, new_misses - misses))
+
+        # Eviction keeps the cache under its size limit
+        llm.MAX_CACHE_SIZE = 1024
+        for number in range(20):
+            llm.create_chat_text(client, "deepseek-reasoner", [{"role": "user", "content": f"Evict {number}"}])
+        cache_size = sum(entry.stat().st_size for entry in os.scandir(llm.CACHE_DIRECTORY))
+
+    print(f"\n{args.requests} requests, {args.distinct} distinct prompts of {len(prompts[0]) / 1024:.0f} KB, fake latency {args.latency:.2f} s")
+    print(f"{'run':<12} {'wall (s)':>9} {'hits':>5} {'misses':>7}")
+    for label, elapsed, hits, misses in rows:
+        print(f"{label:<12} {elapsed:>9.2f} {hits:>5} {misses:>7}")
+    print(f"Cache size after 20 entries with a 1 KB limit: {cache_size} bytes")
+    server.shutdown()
+
+
+# Per-job latency of a local Whisper transcription as main.py sees it: a fresh
+# process that loads the model itself (cold) vs one that hands the job to a
+# running whisper_daemon.py (warm). Needs openai-whisper installed.
+def benchmark_whisper_daemon(args):
+    from whisper_daemon import get_daemon_status
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_file = make_synthetic_audio(os.path.join(work_dir, "session_bench.wav"), args.duration)
+        url = f"http://127.0.0.1:{args.port}"
+        options = "language='pt', fp16=False"
+
+        cold = []
+        for job in range(args.jobs):
+            elapsed, peak = measure_subprocess(f"from whisper_daemon import transcribe_local\ntranscribe_local({audio_file!r}, {args.model!r}, {options})\n")
+            cold.append((elapsed, peak))
+            print(f"Cold job {job + 1}: {elapsed:.2f} s, peak RSS {peak:.0f} MB")
+
+        start_time = time.time()
+        daemon = subprocess.Popen(
+            [sys.executable, "whisper_daemon.py", "--model", args.model, "--port", str(args.port)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            while not get_daemon_status(url):
+                if daemon.poll() is not None:
+                    raise RuntimeError("whisper_daemon.py exited before it was ready")
+                time.sleep(0.1)
+            startup = time.time() - start_time
+            print(f"Daemon ready in {startup:.2f} s")
+
+            warm = []
+            for job in range(args.jobs):
+                elapsed, peak = measure_subprocess(
+                    f"from whisper_daemon import transcribe_with_daemon\ntranscribe_with_daemon({audio_file!r}, {args.model!r}, {url!r}, {options})\n"
+                )
+                warm.append((elapsed, peak))
+                print(f"Warm job {job + 1}: {elapsed:.2f} s, client peak RSS {peak:.0f} MB")
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print(f"\nModel '{args.model}', {args.duration} s of audio per job")
+    print(f"{'mode':<6} {'mean job (s)':>13} {'client peak RSS (MB)':>21}")
+    for label, runs in [("cold", cold), ("warm", warm)]:
+        print(f"{label:<6} {sum(e for e, _ in runs) / len(runs):>13.2f} {max(p for _, p in runs):>21.0f}")
+    print(f"Daemon startup (paid once): {startup:.2f} s")
+
+
+# Real-time factor of multi-process local Whisper vs worker count. Needs
+# openai-whisper installed; use --threads so workers * threads fits the cores.
+def benchmark_whisper_workers(args):
+    from whisper_pool import transcribe_parallel
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        duration = int(args.minutes * 60)
+        audio_file = make_synthetic_audio(os.path.join(work_dir, "session_bench.wav"), duration, pauses=True)
+        rows = []
+        for workers in [int(value) for value in args.workers.split(",")]:
+            start_time = time.time()
+            transcribe_parallel(audio_file, args.model, workers, args.threads, language="pt", fp16=False)
+            elapsed = time.time() - start_time
+            rows.append((workers, elapsed))
+
+    print(f"\nModel '{args.model}', {args.minutes:g} min of audio, {args.threads or 'default'} thread(s) per worker, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'wall (s)':>9} {'RTF':>7} {'speedup':>8}")
+    for workers, elapsed in rows:
+        print(f"{workers:>8} {elapsed:>9.2f} {elapsed / duration:>7.3f} {rows[0][1] / elapsed:>7.2f}x")
+
+
+# Context tokens and recall: the old last-10 slice vs BM25 selection under a token budget
+def benchmark_context(args):
+    from context_retrieval import ContextIndex, count_tokens, get_tokenizer_name
+    from session_notes import SESSION_SEPARATOR
+
+    filler = "O grupo viaja pela estrada, descansa na taverna e discute o pagamento da última missão. "
+    arc = "O Thorkell revela que a Ordem de Sangue escondeu o cálice sob o farol de Beshkarl. "
+    session_texts = []
+    for number in range(1, args.count + 1):
+        text = f"# Session {number}\n\n" + filler * (40 + (number * 37) % 80)
+        if number % 17 == 3:  # An older arc the transcript calls back to
+            text += arc * 4
+        session_texts.append((f"Session {number}.md", text))
+    vault_texts = [(f"NPC {number}.md", f"# NPC {number}\n\nUm mercador de Valmora que vende especiarias.") for number in range(args.count)]
+    vault_texts.append(("Thorkell.md", "# Thorkell\n\nAnão guardião do farol de Beshkarl, antigo membro da Ordem de Sangue."))
+    transcript = (filler * 5 + "Voltamos ao farol de Beshkarl para falar com o Thorkell sobre o cálice. ") * 200
+    arc_sessions = {path for path, text in session_texts if arc in text}
+
+    start_time = time.time()
+    index = ContextIndex(session_texts, vault_texts)
+    index_ms = (time.time() - start_time) * 1000
+    start_time = time.time()
+    selection = index.select(transcript, args.budget)
+    select_ms = (time.time() - start_time) * 1000
+
+    last_ten = session_texts[-10:]
+    last_ten_tokens = count_tokens("".join(text + SESSION_SEPARATOR for _, text in last_ten))
+    chosen = {note.path for note in selection.notes}
+    print(f"Vault: {len(session_texts)} session notes, {len(vault_texts)} other notes (tokenizer: {get_tokenizer_name()})")
+    print(f"Index build {index_ms:.1f} ms, selection {select_ms:.1f} ms")
+    print(f"{'Strategy':<20} {'Notes':>6} {'Tokens':>8} {'Arc sessions':>13} {'Thorkell note':>14}")
+    print(f"{'Last 10 sessions':<20} {len(last_ten):>6} {last_ten_tokens:>8,} {len(arc_sessions & {p for p, _ in last_ten}):>9}/{len(arc_sessions)} {'no':>14}")
+    print(
+        f"{'BM25 + budget':<20} {len(selection.notes):>6} {selection.tokens:>8,} {len(arc_sessions & chosen):>9}/{len(arc_sessions)} "
+        f"{'yes' if 'Thorkell.md' in chosen else 'no':>14}"
+    )
+
+
+def benchmark_segments(args):
+    import json
+    from segment_store import read_segments, write_segments
+
+    sentence = "O grupo entra na taverna e fala com o Idagar sobre a Ordem de Sangue, o Thorkell pede mais cerveja."
+    segments = [{"start": n * 4.0, "end": n * 4.0 + 3.8, "text": f"{sentence} ({n})"} for n in range(int(args.hours * 3600 / 4))]
+    range_start, range_end = args.range_minutes[0] * 60, args.range_minutes[1] * 60
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jsonl_path = os.path.join(temp_dir, "transcript.jsonl")
+        store_path = os.path.join(temp_dir, "transcript.seg")
+        with open(jsonl_path, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(segment, ensure_ascii=False) + "\n" for segment in segments)
+        write_segments(store_path, segments)
+
+        start_time = time.time()
+        with open(jsonl_path, encoding="utf-8") as file:
+            scanned = [segment for segment in map(json.loads, file) if segment["end"] > range_start and segment["start"] < range_end]
+        scan_ms = (time.time() - start_time) * 1000
+        start_time = time.time()
+        ranged = read_segments(store_path, range_start, range_end)
+        range_ms = (time.time() - start_time) * 1000
+        start_time = time.time()
+        read_segments(store_path)
+        full_ms = (time.time() - start_time) * 1000
+
+        print(f"{len(segments):,} segments over {args.hours:g} hours")
+        print(f"Size: JSONL {os.path.getsize(jsonl_path) / 1024:,.0f} KB, segment store {os.path.getsize(store_path) / 1024:,.0f} KB")
+        print(f"Minutes {args.range_minutes[0]}-{args.range_minutes[1]}: JSONL scan {scan_ms:.1f} ms ({len(scanned)} segments), range read {range_ms:.1f} ms ({len(ranged)} segments)")
+        print(f"Full read of the segment store: {full_ms:.1f} ms")
+
+
+# Prompt size and answer latency of custom_prompt.py with whole transcripts vs retrieved passages
+def benchmark_custom_prompt(args):
+    server = start_fake_server(latency=args.latency, latency_per_kchar=args.latency_per_kchar)
+    os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+    import custom_prompt
+    import transcript_passages
+
+    filler = "O grupo viaja pela estrada, descansa na taverna e discute o pagamento da última missão. "
+    sentence = "O Thorkell revela que a Ordem de Sangue escondeu o cálice sob o farol de Beshkarl. "
+    question = "O que é que o Thorkell disse sobre o cálice e o farol de Beshkarl?"
+    session_numbers = [str(number) for number in range(1, args.sessions + 1)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        custom_prompt.SESSIONS_DIRECTORY = work_dir
+        transcript_passages.CACHE_DIRECTORY = os.path.join(work_dir, "cache")
+        for number in session_numbers:
+            os.makedirs(custom_prompt.get_session_directory(number))
+            paragraphs = [filler * 20] * int(args.hours * 60)  # Roughly a minute of speech each
+            paragraphs[len(paragraphs) * int(number) // (args.sessions + 1)] += sentence  # One mention per session
+            with open(os.path.join(custom_prompt.get_session_directory(number), "transcript.txt"), "w", encoding="utf-8") as file:
+                file.write("\n\n".join(paragraphs))
+
+        directories = [(number, custom_prompt.get_session_directory(number)) for number in session_numbers]
+        index_times = []
+        for _ in range(2):  # Cold (builds the passage caches), then warm
+            start_time = time.time()
+            transcript_passages.PassageIndex(directories)
+            index_times.append(time.time() - start_time)
+
+        print(f"\n{args.sessions} session(s) of {args.hours:g} h, fake latency {args.latency:.2f} s + {args.latency_per_kchar:.3f} s per 1000 prompt characters")
+        print(f"Passage index: {index_times[0]:.2f} seconds cold, {index_times[1]:.2f} seconds from cache")
+        print(f"{'mode':<10} {'tokens':>9} {'seconds':>8} {'mentions':>9}")
+        for mode in custom_prompt.PROMPT_MODES:
+            content = custom_prompt.build_custom_prompt_content(session_numbers, question, mode)
+            start_time = time.time()
+            custom_prompt.send_custom_prompt_request(session_numbers, question, "fake-key", cache=False, mode=mode)
+            elapsed = time.time() - start_time
+            print(f"{mode:<10} {custom_prompt.count_tokens(content):>9,} {elapsed:>8.2f} {content.count('Thorkell revela'):>5}/{args.sessions}")
+    server.shutdown()
+
+
+# Prompt size and latency of each campaign summary run as sessions accumulate, full vs incremental
+def benchmark_campaign_summary(args):
+    server = start_fake_server(latency=args.latency, latency_per_kchar=args.latency_per_kchar)
+    os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+    import campaign_summary
+    from session_notes import SESSION_SEPARATOR
+
+    filler = "O grupo viaja pela estrada, descansa na taverna e discute o pagamento da última missão. "
+    with tempfile.TemporaryDirectory() as work_dir:
+        campaign_summary.COMBINED_SESSIONS_PATH = os.path.join(work_dir, "combined_sessions.md")
+        rows = []
+        for sessions in range(1, args.sessions + 1):
+            with open(campaign_summary.COMBINED_SESSIONS_PATH, "w", encoding="utf-8") as file:
+                file.write(SESSION_SEPARATOR.join(f"# Session {number}\n\n" + filler * 60 for number in range(1, sessions + 1)))
+            times = {}
+            prompts = {}
+            for mode in ("full", "incremental"):
+                campaign_summary.OUTPUT_DIRECTORY = os.path.join(work_dir, mode)
+                state = campaign_summary.load_state()
+                prompt, _ = campaign_summary.build_campaign_prompt(campaign_summary.load_combined_sessions(), state, full=mode == "full", rebuild_every=0)
+                prompts[mode] = len(prompt)
+                start_time = time.time()
+                campaign_summary.generate_campaign_summary("fake-key", cache=False, full=mode == "full", rebuild_every=0)
+                times[mode] = time.time() - start_time
+            rows.append((sessions, prompts, times))
+
+    print(f"\nFake latency: {args.latency:.2f} s + {args.latency_per_kchar:.3f} s per 1000 prompt characters")
+    print(f"{'sessions':>8} {'full chars':>11} {'full (s)':>9} {'incr. chars':>12} {'incr. (s)':>10}")
+    for sessions, prompts, times in rows:
+        if sessions in (1, args.sessions) or sessions % max(1, args.sessions // 5) == 0:
+            print(f"{sessions:>8} {prompts['full']:>11,} {times['full']:>9.2f} {prompts['incremental']:>12,} {times['incremental']:>10.2f}")
+    server.shutdown()
+
+
+# Pipeline runs for the e2e benchmark. Each one runs in a fresh process and
+# prints BENCH_RESULT=<json> with its wall time, time spent producing audio
+# chunks, and peak RSS of the process and its ffmpeg children.
+E2E_MAIN_OPENAI = """
+import json, os, resource, sys, time
+sys.path.insert(0, {repo!r})
+import main_openai
+
+main_openai.SESSIONS_DIRECTORY = {sessions_directory!r}
+main_openai.VAULT_DIRECTORY = {vault_directory!r}
+main_openai.TRANSCRIPTION_CACHE_DIRECTORY = {cache_directory!r}
+main_openai.USE_LLM_CACHE = False
+split_seconds = 0.0
+split_chunks = 0
+split_audio_into_chunks = main_openai.split_audio_into_chunks
+
+
+def timed_split(*args, **kwargs):
+    global split_seconds, split_chunks
+    chunks = split_audio_into_chunks(*args, **kwargs)
+    while True:
+        start_time = time.time()
+        chunk = next(chunks, None)
+        split_seconds += time.time() - start_time
+        if chunk is None:
+            return
+        split_chunks += 1
+        yield chunk
+
+
+main_openai.split_audio_into_chunks = timed_split
+start_time = time.time()
+main_openai.process_session({audio_file!r}, main_openai.load_session_context(), jobs={jobs}, summary_mode={summary_mode!r})
+wall_seconds = time.time() - start_time
+peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+print("BENCH_RESULT=" + json.dumps({{"wall_seconds": wall_seconds, "split_seconds": split_seconds, "chunks": split_chunks, "peak_rss_mb": peak / 1024}}))
+"""
+
+E2E_MAIN = """
+import json, os, resource, sys, time
+sys.path.insert(0, {repo!r})
+import main
+
+main.AUDIO_FILE = {audio_file!r}
+main.SESSION_DIRECTORY = {session_directory!r}
+main.WHISPER_MODEL = {whisper_model!r}
+main.USE_LLM_CACHE = False
+start_time = time.time()
+main.main()
+wall_seconds = time.time() - start_time
+peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+print("BENCH_RESULT=" + json.dumps({{"wall_seconds": wall_seconds, "split_seconds": None, "chunks": None, "peak_rss_mb": peak / 1024}}))
+"""
+
+
+# Run a pipeline snippet in a fresh process; returns its BENCH_RESULT dict, or {"error": ...}
+def run_e2e_pipeline(code, env, cwd):
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=cwd, env={**os.environ, **env})
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("BENCH_RESULT="):
+            return json.loads(line.split("=", 1)[1])
+    error_lines = result.stderr.strip().splitlines()
+    return {"error": error_lines[-1] if error_lines else f"exit code {result.returncode}"}
+
+
+# Requests the fake server got since `first`: (count, bytes uploaded, 429 answers)
+def get_server_traffic(server, first):
+    with server.requests_lock:
+        requests = server.requests[first:]
+    return len(requests), sum(request["bytes"] for request in requests), sum(1 for request in requests if request["status"] == 429)
+
+
+# Full main_openai.py and main.py runs on synthetic recordings of several
+# lengths against the fake server; results are printed and saved as JSON
+def benchmark_e2e(args):
+    server = start_fake_server(
+        latency=args.latency,
+        latency_per_kchar=args.latency_per_kchar,
+        generation_time=args.generation_time,
+        jitter=args.jitter,
+        rpm_limit=args.rpm_limit,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    repo = os.path.dirname(os.path.abspath(__file__))
+    pipelines = args.pipelines.split(",")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        notes_directory = os.path.join(work_dir, "vault", "Sessions")
+        os.makedirs(notes_directory)
+        for number in range(1, 11):
+            with open(os.path.join(notes_directory, f"Session {number}.md"), "w", encoding="utf-8") as file:
+                file.write("O grupo chega a Valmora e fala com o Idagar sobre a Ordem de Sangue. " * 40)
+        env = {
+            "OPENAI_API_KEY": "fake-key",
+            "OPENAI_BASE_URL": server.base_url,
+            "DEEPSEEK_API_KEY": "fake-key",
+            "DEEPSEEK_BASE_URL": server.base_url,
+            "SESSION_NOTES_DIRECTORY": notes_directory,
+            "WHISPER_DAEMON_URL": "http://127.0.0.1:9",  # Always the cold in-process model, never a running daemon
+        }
+
+        for minutes in [float(value) for value in args.minutes.split(",")]:
+            audio_file = make_synthetic_audio(os.path.join(work_dir, f"session_{minutes:g}m.m4a"), int(minutes * 60), pauses=True)
+            for pipeline in pipelines:
+                run_directory = os.path.join(work_dir, f"{pipeline}_{minutes:g}m")
+                os.makedirs(run_directory)
+                if pipeline == "main_openai":
+                    code = E2E_MAIN_OPENAI.format(
+                        repo=repo,
+                        sessions_directory=os.path.join(run_directory, "sessions"),
+                        vault_directory=os.path.dirname(notes_directory),
+                        cache_directory=os.path.join(run_directory, "cache"),
+                        audio_file=audio_file,
+                        jobs=args.jobs,
+                        summary_mode=args.summary_mode,
+                    )
+                else:
+                    code = E2E_MAIN.format(
+                        repo=repo, audio_file=audio_file, session_directory=os.path.join(run_directory, "session"), whisper_model=args.whisper_model
+                    )
+
+                print(f"Running {pipeline} on {minutes:g} min of audio...")
+                first_request = len(server.requests)
+                result = run_e2e_pipeline(code, env, run_directory)
+                requests, uploaded, rate_limited = get_server_traffic(server, first_request)
+                results.append(
+                    {"pipeline": pipeline, "minutes": minutes, **result, "requests": requests, "bytes_uploaded": uploaded, "rate_limited": rate_limited}
+                )
+    server.shutdown()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = {(result["pipeline"], result["minutes"]): result for result in json.load(file)["results"]}
+
+    print(
+        f"\nFake server: latency {args.latency:.2f} s + {args.latency_per_kchar:.3f} s per 1000 prompt characters, jitter {args.jitter:.2f} s, "
+        f"rpm limit {args.rpm_limit or 'none'}, random 429 rate {args.rate_limit_rate:.0%}"
+    )
+    print(f"{'pipeline':<12} {'min':>5} {'wall (s)':>9} {'split (s)':>10} {'peak RSS':>9} {'uploaded':>10} {'requests':>9} {'429s':>5} {'vs baseline':>12}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['pipeline']:<12} {result['minutes']:>5g} failed: {result['error']}")
+            continue
+        split = f"{result['split_seconds']:.2f}" if result["split_seconds"] is not None else "-"
+        previous = baseline.get((result["pipeline"], result["minutes"]))
+        change = f"{result['wall_seconds'] / previous['wall_seconds'] - 1:+.1%}" if previous and previous.get("wall_seconds") else "-"
+        print(
+            f"{result['pipeline']:<12} {result['minutes']:>5g} {result['wall_seconds']:>9.2f} {split:>10} {result['peak_rss_mb']:>7.0f}MB "
+            f"{result['bytes_uploaded'] / 1024 / 1024:>8.1f}MB {result['requests']:>9} {result['rate_limited']:>5} {change:>12}"
+        )
+
+    if args.output:
+        config = {name: value for name, value in vars(args).items() if name not in ("func", "output", "baseline")}
+        report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "config": config, "results": results}
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+# Cost of one span with tracing off and on (on: written to a temporary trace file)
+def benchmark_tracing(args):
+    import tracing
+
+    def run_spans(count):
+        start_time = time.time()
+        for number in range(count):
+            with tracing.span("upload", chunk=number, bytes=1024) as current:
+                current.set(retries=0)
+        return (time.time() - start_time) / count * 1e6
+
+    baseline_start = time.time()
+    for number in range(args.spans):
+        pass
+    loop_us = (time.time() - baseline_start) / args.spans * 1e6
+    off_us = run_spans(args.spans)
+    with tempfile.TemporaryDirectory() as work_dir:
+        tracing.enable_tracing(os.path.join(work_dir, "trace.jsonl"), os.path.join(work_dir, "metrics.prom"))
+        on_us = run_spans(args.spans)
+        tracing.close_tracing()
+
+    print(f"{args.spans:,} spans: empty loop {loop_us:.3f} us, tracing off {off_us:.3f} us/span, tracing on {on_us:.1f} us/span")
+
+
+# Transcription with and without the voice-activity pre-pass on a session with table breaks
+def benchmark_silence(args):
+    server = start_fake_server(latency=args.latency)
+    main_openai = import_main_openai(server)
+    from segment_store import read_segments
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_file = make_synthetic_audio(os.path.join(work_dir, "session_bench.m4a"), args.minutes * 60, pauses=True, break_seconds=args.break_seconds)
+        rows = []
+        for remove_silence in (False, True):
+            label = "silence removed" if remove_silence else "full recording"
+            session_directory = os.path.join(work_dir, label.replace(" ", "_"))
+            main_openai.TRANSCRIPTION_CACHE_DIRECTORY = os.path.join(session_directory, "cache")
+            first_request = len(server.requests)
+            start_time = time.time()
+            main_openai.transcribe_audio(audio_file, session_directory, jobs=args.jobs, remove_silence=remove_silence)
+            elapsed = time.time() - start_time
+            requests, uploaded, _ = get_server_traffic(server, first_request)
+            segments = read_segments(os.path.join(session_directory, "transcript.seg"))
+            rows.append((label, elapsed, requests, uploaded, segments[0]["start"] if segments else 0.0))
+
+    print(f"\n{args.minutes:g} min session with a {args.break_seconds} s break every 10 min, fake latency {args.latency:.2f} s per chunk, {args.jobs} job(s)")
+    print(f"{'upload':<16} {'wall (s)':>9} {'requests':>9} {'uploaded (MB)':>14} {'first segment at (s)':>21}")
+    for label, elapsed, requests, uploaded, first_start in rows:
+        print(f"{label:<16} {elapsed:>9.2f} {requests:>9} {uploaded / (1024 * 1024):>14.2f} {first_start:>21.1f}")
+    server.shutdown()
+
+
+# Copy source_file to recording_file in small blocks at `speed` times real time,
+# like a recorder writing a session; returns the thread, which sets ended_at
+def start_slow_writer(source_file, recording_file, duration_seconds, speed, block_seconds=0.1):
+    bytes_per_block = max(1, int(os.path.getsize(source_file) / (duration_seconds / speed) * block_seconds))
+
+    def write():
+        with open(source_file, "rb") as source, open(recording_file, "wb") as recording:
+            while block := source.read(bytes_per_block):
+                recording.write(block)
+                recording.flush()
+                time.sleep(block_seconds)
+        writer.ended_at = time.time()
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    return writer
+
+
+# Time from the end of a recording to a finished transcript: watch mode
+# (transcribing while the file is written) vs transcribing the whole file after
+def benchmark_live(args):
+    import live_transcription
+
+    server = start_fake_server(latency=args.latency, latency_per_mb=args.latency_per_mb)
+    main_openai = import_main_openai(server)
+    live_transcription.POLL_SECONDS = args.poll
+    live_transcription.IDLE_SECONDS = args.idle
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        duration_seconds = args.minutes * 60
+        source_file = make_synthetic_audio(os.path.join(work_dir, f"source.{args.format}"), duration_seconds, pauses=True)
+        recording_file = os.path.join(work_dir, f"session_bench.{args.format}")
+        print(f"Recording {args.minutes:g} min of {args.format} at {args.speed:g}x real time ({duration_seconds / args.speed:.0f} s)...")
+
+        # Watch mode runs while the recording is written; its wait for the file to go idle counts as part of its time
+        main_openai.TRANSCRIPTION_CACHE_DIRECTORY = os.path.join(work_dir, "cache_live")
+        first_request = len(server.requests)
+        writer = start_slow_writer(source_file, recording_file, duration_seconds, args.speed)
+        main_openai.watch_audio(recording_file, os.path.join(work_dir, "live"))
+        live_after_end = time.time() - writer.ended_at
+        writer.join()
+        live_requests, live_uploaded, _ = get_server_traffic(server, first_request)
+
+        # After the fact: the same recording, transcribed once it is complete
+        main_openai.TRANSCRIPTION_CACHE_DIRECTORY = os.path.join(work_dir, "cache_batch")
+        first_request = len(server.requests)
+        start_time = time.time()
+        main_openai.transcribe_audio(recording_file, os.path.join(work_dir, "batch"), jobs=args.jobs)
+        batch_after_end = time.time() - start_time
+        batch_requests, batch_uploaded, _ = get_server_traffic(server, first_request)
+
+        with open(os.path.join(work_dir, "live", "transcript.txt"), encoding="utf-8") as file:
+            live_words = len(file.read().split())
+        with open(os.path.join(work_dir, "batch", "transcript.txt"), encoding="utf-8") as file:
+            batch_words = len(file.read().split())
+
+    print(f"\n{args.minutes:g} min recording, windows of {live_transcription.WINDOW_MS / 60000:g} min, fake latency {args.latency:.2f} s + {args.latency_per_mb:.2f} s/MB per request")
+    print(f"{'mode':<22} {'requests':>9} {'uploaded (MB)':>14} {'words':>7} {'transcript ready after recording end (s)':>41}")
+    print(f"{'watch (live)':<22} {live_requests:>9} {live_uploaded / (1024 * 1024):>14.2f} {live_words:>7} {live_after_end:>41.2f}")
+    print(f"{'after the fact':<22} {batch_requests:>9} {batch_uploaded / (1024 * 1024):>14.2f} {batch_words:>7} {batch_after_end:>41.2f}")
+    print(f"Watch mode time includes {args.idle:g} s of waiting for the file to stop growing.")
+    server.shutdown()
+
+
+# Joining N recordings and splitting the result into N parts: decode and
+# re-encode (concat filter, WAV parts) vs stream copy (concat demuxer, segment muxer)
+def benchmark_join_split(args):
+    from audio_chunker import concat_audio_files, fixed_boundaries, get_audio_duration, iter_audio_chunks, join_audio_files, split_audio_copy
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"Generating {args.parts} parts of {args.minutes:g} minutes...")
+        parts = [make_synthetic_audio(os.path.join(work_dir, f"part{number}.m4a"), args.minutes * 60, pauses=True) for number in range(1, args.parts + 1)]
+        input_bytes = sum(os.path.getsize(part) for part in parts)
+
+        rows = []
+        for label, join in [("re-encode", lambda output: concat_audio_files(parts, output)), ("stream copy", lambda output: join_audio_files(parts, output))]:
+            output_file = os.path.join(work_dir, f"joined_{label.replace(' ', '_')}.m4a")
+            start_time = time.time()
+            join(output_file)
+            rows.append(("join", label, time.time() - start_time, os.path.getsize(output_file), get_audio_duration(output_file)))
+
+        joined = os.path.join(work_dir, "joined_stream_copy.m4a")
+        boundaries = fixed_boundaries(get_audio_duration(joined), args.parts)
+        for label in ("WAV (re-encode)", "stream copy"):
+            output_dir = os.path.join(work_dir, f"split_{label.split()[0]}")
+            start_time = time.time()
+            if label == "stream copy":
+                chunks = split_audio_copy(joined, output_dir, boundaries)
+            else:
+                chunks = list(iter_audio_chunks(joined, output_dir, boundaries, extension="wav", name_format="part{number}"))
+            elapsed = time.time() - start_time
+            rows.append(("split", label, elapsed, sum(os.path.getsize(chunk.path) for chunk in chunks), sum(chunk.end_ms - chunk.start_ms for chunk in chunks)))
+
+    print(f"\n{args.parts} parts x {args.minutes:g} min of 96k AAC ({input_bytes / (1024 * 1024):.1f} MB in)")
+    print(f"{'step':<6} {'method':<16} {'time (s)':>9} {'disk (MB)':>10} {'audio (s)':>10}")
+    for step, label, elapsed, size, duration_ms in rows:
+        print(f"{step:<6} {label:<16} {elapsed:>9.2f} {size / (1024 * 1024):>10.1f} {duration_ms / 1000:>10.1f}")
+
+
+# Start-up runs for the cold-start benchmark: each imports cli.py in a fresh
+# process, runs one command and reports whether the OpenAI SDK got imported
+COLD_START_SNIPPET = """
+import sys
+sys.path.insert(0, {repo!r})
+import cli
+{setup}
+try:
+    cli.main({argv!r})
+finally:
+    print("OPENAI_LOADED=" + str("openai" in sys.modules))
+"""
+# Points the modules at the benchmark's files, for commands that read them
+COLD_START_SETUP = """
+import main_openai, campaign_summary
+main_openai.SESSIONS_DIRECTORY = {sessions_directory!r}
+campaign_summary.COMBINED_SESSIONS_PATH = {combined_path!r}
+campaign_summary.OUTPUT_DIRECTORY = {campaign_directory!r}
+"""
+
+
+# Fresh-process start-up time of each cli.py subcommand: --help, and runs that have nothing to do
+def benchmark_cold_start(args):
+    import campaign_summary
+    from session_notes import SESSION_SEPARATOR
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as work_dir:
+        sessions_directory = os.path.join(work_dir, "sessions")
+        os.makedirs(os.path.join(sessions_directory, "session17"))
+        with open(os.path.join(sessions_directory, "session17", "transcript.txt"), "w", encoding="utf-8") as file:
+            file.write("O grupo entra na taverna e fala com o Idagar.")
+
+        # An up-to-date campaign summary, so the campaign run has nothing to send
+        campaign_summary.COMBINED_SESSIONS_PATH = os.path.join(work_dir, "combined_sessions.md")
+        campaign_summary.OUTPUT_DIRECTORY = os.path.join(work_dir, "campaign_summary")
+        with open(campaign_summary.COMBINED_SESSIONS_PATH, "w", encoding="utf-8") as file:
+            file.write(SESSION_SEPARATOR.join(f"# Session {number}\n\nO grupo viaja pela estrada." for number in range(1, 4)))
+        campaign_summary.save_state("Resumo da campanha.", campaign_summary.load_combined_sessions(), 0)
+
+        commands = [
+            ("cli.py --help", ["--help"]),
+            ("transcribe --help", ["transcribe", "--help"]),
+            ("summarize --help", ["summarize", "--help"]),
+            ("ask --help", ["ask", "--help"]),
+            ("campaign --help", ["campaign", "--help"]),
+            ("split --help", ["split", "--help"]),
+            ("transcribe (transcript exists)", ["transcribe", "session17.m4a"]),
+            ("campaign (up to date)", ["campaign"]),
+        ]
+        # The SDK import every entry point used to pay on start-up, for reference
+        runs = [("import openai (reference)", "import openai")]
+        setup = COLD_START_SETUP.format(
+            sessions_directory=sessions_directory,
+            combined_path=campaign_summary.COMBINED_SESSIONS_PATH,
+            campaign_directory=campaign_summary.OUTPUT_DIRECTORY,
+        )
+        for label, argv in commands:
+            runs.append((label, COLD_START_SNIPPET.format(repo=repo, setup="" if "--help" in argv else setup, argv=argv)))
+
+        env = {**os.environ, "OPENAI_API_KEY": "fake-key", "DEEPSEEK_API_KEY": "fake-key"}
+        rows = []
+        for label, code in runs:
+            times = []
+            for _ in range(args.repeat):
+                start_time = time.time()
+                result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=work_dir, env=env)
+                times.append(time.time() - start_time)
+                if result.returncode != 0:
+                    raise RuntimeError(f"{label} failed: {result.stderr.strip() or result.stdout.strip()}")
+            loaded = "yes" if "OPENAI_LOADED=True" in result.stdout else "no" if "OPENAI_LOADED=False" in result.stdout else "-"
+            rows.append((label, sorted(times)[len(times) // 2], min(times), loaded))
+
+    print(f"\nFresh-process start-up, median of {args.repeat} runs")
+    print(f"{'command':<32} {'median (ms)':>12} {'best (ms)':>10} {'openai imported':>16}")
+    for label, median, best, loaded in rows:
+        print(f"{label:<32} {median * 1000:>12.0f} {best * 1000:>10.0f} {loaded:>16}")
+
+
+# Concurrent requests against a fake server that answers 429s: bare client vs api_scheduler
+def benchmark_scheduler(args):
+    from concurrent.futures import ThreadPoolExecutor
+    from openai import OpenAI
+    import api_scheduler
+
+    server = start_fake_server(latency=args.latency, rpm_limit=args.rpm_limit, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    client = OpenAI(api_key="fake-key", base_url=server.base_url, max_retries=0)
+    prompt = "O grupo entra na taverna e fala com o Idagar sobre a Ordem de Sangue. " * 20
+
+    def send():
+        return client.responses.create(model="gpt-5-mini", input=prompt)
+
+    rows = []
+    for mode in ("bare", "scheduler"):
+        scheduler = api_scheduler.APIScheduler(f"{mode} benchmark", requests_per_minute=args.rpm, max_concurrent=args.workers)
+
+        def run(_):
+            try:
+                scheduler.call(send) if mode == "scheduler" else send()
+                return True
+            except Exception:
+                return False
+
+        first_request = len(server.requests)
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            succeeded = sum(executor.map(run, range(args.requests)))
+        elapsed = time.time() - start_time
+        _, _, rate_limited = get_server_traffic(server, first_request)
+        rows.append((mode, succeeded, elapsed, rate_limited, scheduler.stats))
+    server.shutdown()
+
+    print(
+        f"\n{args.requests} requests on {args.workers} threads, fake server: rpm limit {args.rpm_limit or 'none'}, "
+        f"random 429 rate {args.rate_limit_rate:.0%}; scheduler limit {args.rpm} rpm"
+    )
+    print(f"{'mode':<10} {'ok':>5} {'failed':>7} {'429s':>5} {'retried':>8} {'throttled':>10} {'wall (s)':>9}")
+    for mode, succeeded, elapsed, rate_limited, stats in rows:
+        retried = stats["retried"] if mode == "scheduler" else 0
+        throttled = stats["throttled"] if mode == "scheduler" else 0
+        print(f"{mode:<10} {succeeded:>5} {args.requests - succeeded:>7} {rate_limited:>5} {retried:>8} {throttled:>10} {elapsed:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the session pipeline.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    transcription = subparsers.add_parser("transcription", help="Concurrent chunk transcription vs --jobs")
+    transcription.add_argument("--jobs", default="1,2,4,8", help="Comma-separated --jobs values")
+    transcription.add_argument("--chunks", type=int, default=8, help="Approximate number of chunks")
+    transcription.add_argument("--duration", type=int, default=240, help="Synthetic audio length in seconds")
+    transcription.add_argument("--latency", type=float, default=1.0, help="Fake API latency in seconds")
+    transcription.set_defaults(func=benchmark_transcription)
+
+    chunker = subparsers.add_parser("chunker", help="Peak memory of the streaming chunker")
+    chunker.add_argument("--hours", type=float, default=3, help="Synthetic recording length in hours")
+    chunker.add_argument("--chunk-seconds", type=int, default=600, help="Chunk window length in seconds")
+    chunker.add_argument("--compare-pydub", action="store_true", help="Also measure decoding with AudioSegment.from_file")
+    chunker.set_defaults(func=benchmark_chunker)
+
+    planner = subparsers.add_parser("planner", help="Silence-aware chunk boundary planning time")
+    planner.add_argument("--hours", type=float, default=4, help="Synthetic recording length in hours")
+    planner.add_argument("--chunks", type=int, default=4, help="Number of chunks to plan")
+    planner.set_defaults(func=benchmark_planner)
+
+    chunk_count = subparsers.add_parser("chunk-count", help="Analytic chunk-count planning vs a test encode")
+    chunk_count.add_argument("--hours", default="1,1.5,2,2.25,3,3.5,4", help="Comma-separated session lengths in hours")
+    chunk_count.add_argument("--check-seconds", type=int, default=600, help="Length of the real encode used to check the size model")
+    chunk_count.set_defaults(func=benchmark_chunk_count)
+
+    notes = subparsers.add_parser("notes", help="Session-notes context load time with and without the cache")
+    notes.add_argument("--count", type=int, default=500, help="Number of session notes in the synthetic vault")
+    notes.add_argument("--paragraphs", type=int, default=6, help="Paragraphs per note")
+    notes.set_defaults(func=benchmark_notes)
+
+    summary = subparsers.add_parser("summary", help="Summary latency of single-pass vs map-reduce on long transcripts")
+    summary.add_argument("--hours", default="2,4,6,8", help="Comma-separated session lengths in hours")
+    summary.add_argument("--latency", type=float, default=1.0, help="Fake API latency per request in seconds")
+    summary.add_argument("--latency-per-kchar", type=float, default=0.05, help="Extra fake latency per 1000 prompt characters")
+    summary.set_defaults(func=benchmark_summary)
+
+    stream = subparsers.add_parser("stream", help="Time to first output with and without streaming")
+    stream.add_argument("--latency", type=float, default=2.0, help="Fake API latency before the first token in seconds")
+    stream.add_argument("--generation-time", type=float, default=20.0, help="Fake seconds spent generating each answer")
+    stream.set_defaults(func=benchmark_stream)
+
+    llm_cache = subparsers.add_parser("llm-cache", help="Repeated LLM requests with and without the response cache")
+    llm_cache.add_argument("--requests", type=int, default=20, help="Number of requests per run")
+    llm_cache.add_argument("--distinct", type=int, default=5, help="Number of distinct prompts among them")
+    llm_cache.add_argument("--latency", type=float, default=0.5, help="Fake API latency per request in seconds")
+    llm_cache.set_defaults(func=benchmark_llm_cache)
+
+    whisper_daemon = subparsers.add_parser("whisper-daemon", help="Local Whisper job latency with a cold model vs the warm daemon")
+    whisper_daemon.add_argument("--model", default="tiny", help="Whisper model name")
+    whisper_daemon.add_argument("--jobs", type=int, default=3, help="Jobs per mode")
+    whisper_daemon.add_argument("--duration", type=int, default=30, help="Synthetic audio length per job in seconds")
+    whisper_daemon.add_argument("--port", type=int, default=8767, help="Port for the benchmark daemon")
+    whisper_daemon.set_defaults(func=benchmark_whisper_daemon)
+
+    whisper_workers = subparsers.add_parser("whisper-workers", help="Real-time factor of multi-process local Whisper vs workers")
+    whisper_workers.add_argument("--model", default="tiny", help="Whisper model name")
+    whisper_workers.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    whisper_workers.add_argument("--threads", type=int, default=None, help="torch threads per worker")
+    whisper_workers.add_argument("--minutes", type=float, default=10, help="Synthetic recording length in minutes")
+    whisper_workers.set_defaults(func=benchmark_whisper_workers)
+
+    context = subparsers.add_parser("context", help="Context tokens and recall of BM25 selection vs the last-10 slice")
+    context.add_argument("--count", type=int, default=60, help="Number of session notes in the synthetic vault")
+    context.add_argument("--budget", type=int, default=30000, help="Context token budget")
+    context.set_defaults(func=benchmark_context)
+
+    custom = subparsers.add_parser("custom-prompt", help="Prompt size and latency of custom_prompt.py, full transcripts vs retrieval")
+    custom.add_argument("--sessions", type=int, default=4)
+    custom.add_argument("--hours", type=float, default=4)
+    custom.add_argument("--latency", type=float, default=0.5)
+    custom.add_argument("--latency-per-kchar", type=float, default=0.02)
+    custom.set_defaults(func=benchmark_custom_prompt)
+
+    campaign = subparsers.add_parser("campaign-summary", help="Per-run prompt size of the campaign summary, full vs incremental")
+    campaign.add_argument("--sessions", type=int, default=30)
+    campaign.add_argument("--latency", type=float, default=0.2)
+    campaign.add_argument("--latency-per-kchar", type=float, default=0.01)
+    campaign.set_defaults(func=benchmark_campaign_summary)
+
+    e2e = subparsers.add_parser("e2e", help="End-to-end main_openai.py and main.py runs against the fake server, JSON output")
+    e2e.add_argument("--minutes", default="10,30,60", help="Comma-separated synthetic recording lengths")
+    e2e.add_argument("--pipelines", default="main_openai,main", help="Comma-separated: main_openai, main (needs local Whisper)")
+    e2e.add_argument("--jobs", type=int, default=4, help="main_openai.py transcription jobs")
+    e2e.add_argument("--summary-mode", default="single", choices=("single", "map-reduce"))
+    e2e.add_argument("--whisper-model", default="tiny", help="Local Whisper model for main.py")
+    e2e.add_argument("--latency", type=float, default=0.5)
+    e2e.add_argument("--latency-per-kchar", type=float, default=0.0)
+    e2e.add_argument("--generation-time", type=float, default=0.0)
+    e2e.add_argument("--jitter", type=float, default=0.0, help="Up to this many random extra seconds per request")
+    e2e.add_argument("--rpm-limit", type=int, default=0, help="Fake server requests per minute before 429s")
+    e2e.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered 429 at random")
+    e2e.add_argument("--seed", type=int, default=0)
+    e2e.add_argument("--output", help="Write the results as JSON to this file")
+    e2e.add_argument("--baseline", help="Earlier --output file to compare wall times against")
+    e2e.set_defaults(func=benchmark_e2e)
+
+    silence = subparsers.add_parser("silence", help="Transcription with and without cutting long silences first")
+    silence.add_argument("--minutes", type=float, default=60)
+    silence.add_argument("--break-seconds", type=int, default=120, help="Silence at the start of every 10 minutes")
+    silence.add_argument("--latency", type=float, default=0.5)
+    silence.add_argument("--jobs", type=int, default=2)
+    silence.set_defaults(func=benchmark_silence)
+
+    live = subparsers.add_parser("live", help="Transcript latency after a recording ends: watch mode vs transcribing afterwards")
+    live.add_argument("--minutes", type=float, default=60)
+    live.add_argument("--speed", type=float, default=20, help="How many times faster than real time the recording is written")
+    live.add_argument("--format", default="mp3", help="Recording format: mp3, wav, flac, ogg...")
+    live.add_argument("--latency", type=float, default=1.0)
+    live.add_argument("--latency-per-mb", type=float, default=3.0, help="Extra fake seconds per uploaded MB, so longer chunks take longer")
+    live.add_argument("--poll", type=float, default=0.5, help="Watch mode poll interval in seconds")
+    live.add_argument("--idle", type=float, default=3.0, help="Seconds without growth before the recording counts as stopped")
+    live.add_argument("--jobs", type=int, default=4, help="Jobs for the after-the-fact transcription")
+    live.set_defaults(func=benchmark_live)
+
+    join_split = subparsers.add_parser("join-split", help="Join and split recordings: re-encode vs stream copy")
+    join_split.add_argument("--parts", type=int, default=4)
+    join_split.add_argument("--minutes", type=float, default=30)
+    join_split.set_defaults(func=benchmark_join_split)
+
+    cold_start = subparsers.add_parser("cold-start", help="Fresh-process start-up time of each cli.py subcommand")
+    cold_start.add_argument("--repeat", type=int, default=5)
+    cold_start.set_defaults(func=benchmark_cold_start)
+
+    scheduler = subparsers.add_parser("scheduler", help="Requests through api_scheduler vs a bare client, against a server injecting 429s")
+    scheduler.add_argument("--requests", type=int, default=40)
+    scheduler.add_argument("--workers", type=int, default=8)
+    scheduler.add_argument("--latency", type=float, default=0.2)
+    scheduler.add_argument("--rpm-limit", type=int, default=120, help="Fake server requests per minute before 429s")
+    scheduler.add_argument("--rate-limit-rate", type=float, default=0.1, help="Fraction of requests answered 429 at random")
+    scheduler.add_argument("--rpm", type=int, default=120, help="Scheduler request limit per minute")
+    scheduler.add_argument("--seed", type=int, default=0)
+    scheduler.set_defaults(func=benchmark_scheduler)
+
+    tracing_parser = subparsers.add_parser("tracing", help="Per-span cost of the tracing layer, off vs on")
+    tracing_parser.add_argument("--spans", type=int, default=100000)
+    tracing_parser.set_defaults(func=benchmark_tracing)
+
+    segments = subparsers.add_parser("segments", help="Size and range-read time of the timestamped segment store")
+    segments.add_argument("--hours", type=float, default=3)
+    segments.add_argument("--range-minutes", type=lambda v: [int(n) for n in v.split("-")], default=[90, 120], help="e.g. 90-120")
+    segments.set_defaults(func=benchmark_segments)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,50 @@
+import argparse
+import hashlib
+import json
 import os
 import time
 from dotenv import load_dotenv
-from openai import OpenAI
-
-
-def generate_campaign_summary(deepseek_api_key):
-    base_deepseek_api_url = "https://api.deepseek.com"
-    deepseek_client = OpenAI(api_key=deepseek_api_key, base_url=base_deepseek_api_url)
-
-    # setup
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    combined_sessions_path = os.path.join(current_dir, "combined_sessions.md")
+from api_scheduler import print_scheduler_stats
+from llm import create_chat_text, print_cache_stats, write_output_file
+from session_notes import SESSION_SEPARATOR
+
+# The campaign summary is kept up to date incrementally: state.json stores the
+# last summary and a content hash of every session it covers, and each run
+# only folds the new or changed sessions into that summary, so the prompt
+# stays about one summary plus a session long however long the campaign gets.
+# A full rebuild from every session runs with --full, when a session was
+# removed, and every REBUILD_EVERY incremental updates to undo drift.
+
+STREAM_RESPONSE = True  # Print and save the summary as it is generated
+CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+COMBINED_SESSIONS_PATH = os.path.join(CURRENT_DIRECTORY, "combined_sessions.md")
+OUTPUT_DIRECTORY = os.path.join(CURRENT_DIRECTORY, "campaign_summary")
+STATE_FILE_NAME = "state.json"
+REBUILD_EVERY = 10  # Incremental updates between full rebuilds (0: never rebuild automatically)
+
+FULL_PROMPT = (
+    "Based on the following DnD session summaries, generate a comprehensive "
+    "campaign summary. Ensure the summary captures key plot points, character "
+    "developments, and significant events.\n\nSession Summaries:\n"
+)
+UPDATE_PROMPT = (
+    "Below is the current summary of a DnD campaign, followed by the notes of sessions that are new or were "
+    "revised since it was written. Rewrite the campaign summary so that it also covers these sessions: add "
+    "the new events, and for revised sessions replace what the summary says about them with the new notes. "
+    "Keep the same structure and level of detail, and keep everything else in the summary. Ensure the "
+    "summary captures key plot points, character developments, and significant events.\n\n"
+)
+
+
+def get_output_path(filename="output.txt"):
+    return os.path.join(OUTPUT_DIRECTORY, filename)
+
+
+# [(title, text)] of the sessions in combined_sessions.md, titled by their "# Session N" heading
+def load_combined_sessions(combined_sessions_path=None):
+    combined_sessions_path = combined_sessions_path or COMBINED_SESSIONS_PATH
     if not os.path.exists(combined_sessions_path):
-        raise FileNotFoundError(
-            f"Combined sessions file not found: {combined_sessions_path}"
-        )
+        raise FileNotFoundError(f"Combined sessions file not found: {combined_sessions_path}")
 
     with open(combined_sessions_path, "r", encoding="utf-8") as file:
         combined_sessions_content = file.read()
@@ -22,44 +52,115 @@ def generate_campaign_summary(deepseek_api_key):
     if not combined_sessions_content.strip():
         raise ValueError(f"Combined sessions file is empty: {combined_sessions_path}")
 
-    # create custom prompt using the precompiled combined sessions file
-    intro_prompt = (
-        "Based on the following DnD session summaries, generate a comprehensive "
-        "campaign summary. Ensure the summary captures key plot points, character "
-        "developments, and significant events.\n\nSession Summaries:\n"
-    )
-    prompt = intro_prompt + combined_sessions_content.strip()
-
-    # send request to DeepSeek API
-    print("Generating campaign summary from combined_sessions.md")
+    sessions = []
+    for text in combined_sessions_content.strip().split(SESSION_SEPARATOR):
+        text = text.strip()
+        if text:
+            sessions.append((text.split("\n", 1)[0].lstrip("# ").strip(), text))
+    return sessions
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# {"summary", "sessions": {title: hash}, "updates_since_rebuild"}, or None before the first run
+def load_state():
+    state_path = get_output_path(STATE_FILE_NAME)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(summary, sessions, updates_since_rebuild):
+    state = {
+        "summary": summary,
+        "sessions": {title: hash_text(text) for title, text in sessions},
+        "updates_since_rebuild": updates_since_rebuild,
+    }
+    write_output_file(get_output_path(STATE_FILE_NAME), json.dumps(state, ensure_ascii=False, indent=2))
+
+
+# (prompt, updates_since_rebuild) for this run; prompt is None when nothing changed
+def build_campaign_prompt(sessions, state, full=False, rebuild_every=REBUILD_EVERY):
+    hashes = {title: hash_text(text) for title, text in sessions}
+    if state and not full:
+        removed = [title for title in state["sessions"] if title not in hashes]
+        pending = [(title, text) for title, text in sessions if state["sessions"].get(title) != hashes[title]]
+        if not pending and not removed:
+            print(f"Campaign summary is up to date ({len(sessions)} sessions).")
+            return None, state["updates_since_rebuild"]
+        if removed:
+            print(f"Rebuilding campaign summary: {', '.join(removed)} no longer in combined_sessions.md")
+        elif rebuild_every and state["updates_since_rebuild"] >= rebuild_every:
+            print(f"Rebuilding campaign summary after {state['updates_since_rebuild']} incremental updates")
+        else:
+            new = [title for title, _ in pending if title not in state["sessions"]]
+            revised = [title for title, _ in pending if title in state["sessions"]]
+            print(f"Updating campaign summary with {len(new)} new and {len(revised)} revised session(s): {', '.join(title for title, _ in pending)}")
+            session_notes = SESSION_SEPARATOR.join(text for _, text in pending)
+            prompt = f"{UPDATE_PROMPT}Current Campaign Summary:\n{state['summary'].strip()}\n\nNew or Revised Sessions:\n{session_notes}"
+            return prompt, state["updates_since_rebuild"] + 1
+
+    print(f"Generating campaign summary from all {len(sessions)} sessions in combined_sessions.md")
+    return FULL_PROMPT + SESSION_SEPARATOR.join(text for _, text in sessions), 0
+
+
+def generate_campaign_summary(deepseek_api_key, output_path=None, stream=False, cache=True, full=False, rebuild_every=REBUILD_EVERY):
+    sessions = load_combined_sessions()
+    state = load_state()
+    prompt, updates_since_rebuild = build_campaign_prompt(sessions, state, full, rebuild_every)
+    if prompt is None:
+        if output_path:
+            write_output_file(output_path, state["summary"])
+        if stream:
+            print(state["summary"])
+        return state["summary"]
+
+    print(f"Prompt: {len(prompt):,} characters")
+
+    # Imported only when a request is needed: an up-to-date summary never loads the SDK
+    from openai import OpenAI
+
+    base_deepseek_api_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+    deepseek_client = OpenAI(api_key=deepseek_api_key, base_url=base_deepseek_api_url, max_retries=0)  # Retries: api_scheduler.py
 
     start_time = time.time()
-    response = deepseek_client.chat.completions.create(
-        model="deepseek-reasoner",
-        messages=[{"role": "user", "content": prompt}],
-        stream=False,
+    response_content = create_chat_text(
+        deepseek_client,
+        "deepseek-reasoner",
+        [{"role": "user", "content": prompt}],
+        output_path=output_path,
+        stream=stream,
+        echo=stream,
+        cache=cache,
     )
     end_time = time.time()
 
-    response_content = response.choices[0].message.content
     print(f"Request completed in {end_time - start_time:.2f} seconds.")
 
+    # Saved only once the answer is complete, so a failed run is simply retried
+    save_state(response_content, sessions, updates_since_rebuild)
     return response_content
 
 
 def save_response_to_file(response, filename="output.txt"):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    response_dir = os.path.join(current_dir, "campaign_summary")
-    os.makedirs(response_dir, exist_ok=True)
-
-    output_path = os.path.join(response_dir, "output.txt")
-    with open(output_path, "w", encoding="utf-8") as file:
-        file.write(response)
+    output_path = get_output_path(filename)
+    write_output_file(output_path, response)
 
     print(f"Response saved to: {output_path}")
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a campaign summary from combined_sessions.md.")
+    parser.add_argument("--no-cache", action="store_true", help="Always send the request, even if combined_sessions.md is unchanged")
+    parser.add_argument("--full", action="store_true", help="Rebuild the summary from every session instead of updating the last one")
+    parser.add_argument(
+        "--rebuild-every", type=int, default=REBUILD_EVERY, help=f"Incremental updates between automatic full rebuilds, 0 for never (default: {REBUILD_EVERY})"
+    )
+    args = parser.parse_args(argv)
+
     load_dotenv()
 
     try:
@@ -68,7 +169,20 @@ def main():
         if not deepseek_api_key:
             raise ValueError("DEEPSEEK_API_KEY is not set")
 
-        response = generate_campaign_summary(deepseek_api_key)
+        if STREAM_RESPONSE:
+            # printed and saved to campaign_summary/output.txt as it arrives
+            print("\n" + "=" * 50)
+            print("API RESPONSE:")
+            print("=" * 50)
+            generate_campaign_summary(
+                deepseek_api_key, output_path=get_output_path(), stream=True, cache=not args.no_cache, full=args.full, rebuild_every=args.rebuild_every
+            )
+            print(f"Response saved to: {get_output_path()}")
+            print_cache_stats()
+            print_scheduler_stats()
+            return
+
+        response = generate_campaign_summary(deepseek_api_key, cache=not args.no_cache, full=args.full, rebuild_every=args.rebuild_every)
 
         # print the response
         print("\n" + "=" * 50)
@@ -77,6 +191,8 @@ def main():
         print(response)
 
         save_response_to_file(response)
+        print_cache_stats()
+        print_scheduler_stats()
 
     except Exception as e:
         print(f"An error occurred: {e}")
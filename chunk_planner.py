@@ -0,0 +1,107 @@
+import math
+import numpy as np
+from audio_chunker import decode_audio_windows
+from tracing import span
+
+# Chunk planning. The chunk count comes straight from the constant MP3
+# bitrate (CBR output is bitrate * duration plus a small header), so no test
+# encode is needed. Instead of cutting at fixed offsets, every boundary
+# is moved to the quietest stretch within SEARCH_WINDOW_MS of its target, so
+# chunks end in pauses rather than mid-word. Only the search windows around
+# each boundary are decoded (mono, 8 kHz, all in one ffmpeg pass), never the
+# whole recording.
+
+ANALYSIS_SAMPLE_RATE = 8000  # Hz, plenty for speech energy
+FRAME_MS = 20  # RMS frame length
+PAUSE_MS = 400  # Energy is averaged over this span so a pause beats a single quiet frame
+SEARCH_WINDOW_MS = 15000  # How far a boundary may move from its target, each way
+MP3_CONTAINER_OVERHEAD = 4 * 1024  # ID3 tag, Xing/Info frame and encoder padding (measured ~0.5 KB)
+
+
+# "48k" -> 48000 bits per second
+def parse_bitrate(bitrate):
+    bitrate = str(bitrate).strip().lower()
+    if bitrate.endswith("k"):
+        return int(float(bitrate[:-1]) * 1000)
+    return int(bitrate)
+
+
+# Expected size in bytes of duration_ms of audio encoded at a constant bitrate
+def estimate_encoded_size(duration_ms, bitrate):
+    return int(parse_bitrate(bitrate) / 8 * duration_ms / 1000) + MP3_CONTAINER_OVERHEAD
+
+
+# Longest duration in ms that still encodes to at most max_size bytes
+def get_max_chunk_duration(bitrate, max_size):
+    max_duration = int((max_size - MP3_CONTAINER_OVERHEAD) * 8 * 1000 / parse_bitrate(bitrate))
+    if max_duration <= 0:
+        raise ValueError(f"Size limit of {max_size} bytes is too small for bitrate {bitrate}")
+    return max_duration
+
+
+# Fewest chunks that fit the size limit while leaving room to move each boundary
+# by up to search_ms in either direction; a recording that fits whole is not split
+def plan_chunk_count(duration_ms, bitrate, max_size, search_ms=SEARCH_WINDOW_MS):
+    max_duration = get_max_chunk_duration(bitrate, max_size)
+    if duration_ms <= max_duration:
+        return 1
+    usable_duration = max(max_duration - 2 * search_ms, max_duration // 2)
+    return max(1, math.ceil(duration_ms / usable_duration))
+
+
+# RMS energy of consecutive FRAME_MS frames of 16-bit PCM samples
+def frame_rms(samples, sample_rate=ANALYSIS_SAMPLE_RATE, frame_ms=FRAME_MS):
+    frame_size = sample_rate * frame_ms // 1000
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[: frame_count * frame_size].astype(np.float32).reshape(frame_count, frame_size)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+# Offset (ms, from window start) of the centre of the quietest PAUSE_MS stretch
+def find_quietest_offset(rms, frame_ms=FRAME_MS, pause_ms=PAUSE_MS):
+    pause_frames = max(1, min(len(rms), pause_ms // frame_ms))
+    smoothed = np.convolve(rms, np.ones(pause_frames, dtype=np.float32) / pause_frames, mode="valid")
+    quietest = int(np.argmin(smoothed))
+    return (quietest + pause_frames / 2) * frame_ms
+
+
+# Quietest point of each (low_ms, high_ms) window of the recording
+def find_quietest_points(audio_file, windows):
+    points = []
+    for (low_ms, high_ms), pcm in zip(windows, decode_audio_windows(audio_file, windows, sample_rate=ANALYSIS_SAMPLE_RATE)):
+        rms = frame_rms(np.frombuffer(pcm, dtype="<i2"))
+        if len(rms) == 0:
+            points.append((low_ms + high_ms) // 2)
+        else:
+            points.append(min(high_ms, low_ms + int(find_quietest_offset(rms))))
+    return points
+
+
+def plan_chunk_boundaries(audio_file, end_ms, num_chunks, max_chunk_ms, search_ms=SEARCH_WINDOW_MS, start_ms=0):
+    """Plan (start_ms, end_ms) chunk windows covering [start_ms, end_ms).
+
+    Boundaries aim at an even split into num_chunks and are then moved to the
+    quietest point within search_ms. The search window shrinks when needed so
+    no chunk ever exceeds max_chunk_ms: a size limit that holds for
+    max_chunk_ms of audio holds for every chunk. It stays within a quarter
+    of the nominal chunk too, so no chunk is shorter than half of one.
+    """
+    duration_ms = end_ms - start_ms
+    num_chunks = max(num_chunks, math.ceil(duration_ms / max_chunk_ms))
+    if num_chunks <= 1:
+        return [(start_ms, end_ms)]
+
+    nominal_ms = duration_ms / num_chunks
+    search_ms = int(min(search_ms, (max_chunk_ms - nominal_ms) / 2, nominal_ms / 4))  # Neighbouring cuts stay half a chunk apart
+    targets = [start_ms + round(i * nominal_ms) for i in range(1, num_chunks)]
+
+    with span("plan", start_ms=start_ms, end_ms=end_ms, chunks=num_chunks, search_ms=search_ms):
+        if search_ms <= 0:
+            cuts = targets
+        else:
+            cuts = find_quietest_points(audio_file, [(target_ms - search_ms, target_ms + search_ms) for target_ms in targets])
+
+    edges = [start_ms, *cuts, end_ms]
+    return [(edges[i], edges[i + 1]) for i in range(num_chunks)]
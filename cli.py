@@ -0,0 +1,209 @@
+import argparse
+import os
+import sys
+
+# Single entry point for every workflow:
+#   python cli.py transcribe "C:/path/to/session17.m4a" --jobs 4
+#   python cli.py transcribe "C:/path/to/session18.wav" --watch    (while recording)
+#   python cli.py summarize session17
+#   python cli.py markdown session17
+#   python cli.py ask --mode full
+#   python cli.py campaign --full
+#   python cli.py jobs
+#   python cli.py join part1.m4a part2.m4a part3.m4a -o session17.m4a
+#   python cli.py split "C:/path/to/session5.m4a" --parts 4
+# Only argparse is imported up front. Each subcommand imports the modules it
+# needs when it runs, and those modules create their API clients and read
+# their prompts on first use, so --help, a transcribe whose transcript already
+# exists and an up-to-date campaign summary never import the OpenAI SDK or
+# read the notes vault. `python benchmark.py cold-start` times each subcommand.
+
+FORWARDED_COMMANDS = ("ask", "campaign")  # Their own options are parsed by custom_prompt.py / campaign_summary.py
+SUMMARY_MODES = ("single", "map-reduce")  # main_openai.SUMMARY_MODES, repeated so --help does not import main_openai
+
+
+# argparse type for counts that must be at least 1 (--jobs, --parts)
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def print_api_stats():
+    from api_scheduler import print_scheduler_stats
+    from llm import print_cache_stats
+
+    print_cache_stats()
+    print_scheduler_stats()
+
+
+def run_transcribe(args):
+    import main_openai
+    from job_store import JobStore
+
+    main_openai.REMOVE_SILENCE = args.remove_silence
+    session_directory = main_openai.get_session_directory(args.audio_file)
+    transcript_path = os.path.join(session_directory, main_openai.TRANSCRIPT_FILE_NAME)
+    with JobStore(session_directory, args.audio_file, pipeline="main_openai") as job_store:
+        if args.force:
+            for prefix in ("decode", "chunk", "transcribe:", "transcript"):
+                job_store.clear_stages(prefix)
+        elif main_openai.load_current_transcript(args.audio_file, session_directory, job_store) is not None:
+            print(f"Transcript already exists: {transcript_path} (--force to transcribe again)")
+            return
+
+        from tracing import span
+
+        if args.watch:
+            if args.remove_silence:
+                raise ValueError("--watch cannot be combined with --remove-silence")
+            with span("transcribe", session=os.path.basename(session_directory), watch=True):
+                main_openai.watch_audio(args.audio_file, session_directory, job_store=job_store)
+            print_api_stats()
+            return
+
+        with span("transcribe", session=os.path.basename(session_directory), jobs=args.jobs):
+            main_openai.transcribe_audio(args.audio_file, session_directory, jobs=args.jobs, job_store=job_store)
+    print(f"Transcript saved to {transcript_path}")
+    print_api_stats()
+
+
+def run_summarize(args):
+    import main_openai
+    from job_store import JobStore
+
+    main_openai.USE_LLM_CACHE = not args.no_llm_cache
+    file_name, session_directory, transcript = main_openai.read_session_file(args.session, main_openai.TRANSCRIPT_FILE_NAME)
+    session_notes = main_openai.select_session_notes(main_openai.load_session_context(), transcript, args.context_budget)
+    with JobStore(session_directory) as job_store:
+        main_openai.summarize_session(transcript, file_name, session_directory, session_notes, job_store, mode=args.summary_mode, stream=args.stream, force=True)
+    print(f"Summary saved to {os.path.join(session_directory, main_openai.SUMMARY_FILE_NAME)}")
+    print_api_stats()
+
+
+def run_markdown(args):
+    import main_openai
+    from job_store import JobStore
+
+    main_openai.USE_LLM_CACHE = not args.no_llm_cache
+    file_name, session_directory, summary = main_openai.read_session_file(args.session, main_openai.SUMMARY_FILE_NAME)
+    # Notes are picked by the transcript, as in main_openai.py, so summary and Markdown see the same context
+    _, _, transcript = main_openai.read_session_file(args.session, main_openai.TRANSCRIPT_FILE_NAME)
+    session_notes = main_openai.select_session_notes(main_openai.load_session_context(), transcript, args.context_budget)
+    with JobStore(session_directory) as job_store:
+        main_openai.format_session(summary, file_name, session_directory, session_notes, job_store, stream=args.stream, force=True)
+    print(f"Markdown summary saved to {os.path.join(session_directory, main_openai.MARKDOWN_SUMMARY_FILE_NAME)}")
+    print_api_stats()
+
+
+def run_ask(args, extra_args):
+    import custom_prompt
+
+    custom_prompt.main(extra_args)
+
+
+def run_campaign(args, extra_args):
+    import campaign_summary
+
+    campaign_summary.main(extra_args)
+
+
+def run_jobs(args):
+    from job_store import SESSIONS_DIRECTORY, print_jobs
+
+    print_jobs(args.sessions_directory or SESSIONS_DIRECTORY, show_all=args.all)
+
+
+def run_join(args):
+    from join_audios import join_audios
+
+    join_audios(args.inputs, args.output, reencode=args.reencode)
+
+
+def run_split(args):
+    from split_audio import split
+
+    split(args.audio_file, args.output_dir, parts=args.parts, reencode=args.reencode)
+
+
+def add_summary_options(parser):
+    parser.add_argument("session", help="Session name (folder in sessions/) or the path of its recording")
+    parser.add_argument(
+        "--context-budget", type=int, default=None, metavar="TOKENS", help="Token budget for context notes (default: main_openai.CONTEXT_TOKEN_BUDGET)"
+    )
+    parser.add_argument("--stream", action="store_true", help="Write the output to disk as it is generated")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Always send the request, ignoring cached answers")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Transcribe, summarize and query D&D session recordings.",
+        epilog="Run 'python cli.py <command> --help' for the options of a command.",
+    )
+    parser.add_argument("--trace", help="Append per-stage spans (JSON lines) to this file (also DND_TRACE_FILE)")
+    parser.add_argument("--metrics", help="Write per-stage totals as a Prometheus textfile at exit (also DND_METRICS_FILE)")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    transcribe = subparsers.add_parser("transcribe", help="Transcribe a recording with the OpenAI API (skipped when its transcript exists)")
+    transcribe.add_argument("audio_file", help="Path to the session audio file (m4a, mp3, wav, ...)")
+    transcribe.add_argument("--jobs", type=positive_int, default=1, metavar="N", help="Number of chunks to transcribe concurrently (default: 1)")
+    transcribe.add_argument("--force", action="store_true", help="Transcribe again even if transcript.txt exists")
+    transcribe.add_argument("--remove-silence", action="store_true", help="Cut long quiet stretches before uploading (timestamps stay in recording time)")
+    transcribe.add_argument("--watch", action="store_true", help="Transcribe the recording while it is still being written, until it stops growing")
+    transcribe.set_defaults(func=run_transcribe)
+
+    summarize = subparsers.add_parser("summarize", help="Write summary.txt from a session transcript")
+    add_summary_options(summarize)
+    summarize.add_argument("--summary-mode", choices=SUMMARY_MODES, default="single", help="single or map-reduce (default: single)")
+    summarize.set_defaults(func=run_summarize)
+
+    markdown = subparsers.add_parser("markdown", help="Write summary.md from a session summary")
+    add_summary_options(markdown)
+    markdown.set_defaults(func=run_markdown)
+
+    ask = subparsers.add_parser("ask", add_help=False, help="Ask a question about one or many sessions (custom_prompt.py options)")
+    ask.set_defaults(func=run_ask)
+
+    campaign = subparsers.add_parser("campaign", add_help=False, help="Update the campaign summary (campaign_summary.py options)")
+    campaign.set_defaults(func=run_campaign)
+
+    jobs = subparsers.add_parser("jobs", help="List in-flight and failed session jobs (stages checkpointed in sessions/*/jobs.db)")
+    jobs.add_argument("--all", action="store_true", help="Also list sessions whose stages all finished")
+    jobs.add_argument("--sessions-directory", help="Folder holding the session folders (default: sessions/)")
+    jobs.set_defaults(func=run_jobs)
+
+    join = subparsers.add_parser("join", help="Join recordings in order, copying packets unless their formats differ")
+    join.add_argument("inputs", nargs="+", help="Recordings to join, at least two")
+    join.add_argument("-o", "--output", required=True, help="Joined file, e.g. session17.m4a")
+    join.add_argument("--reencode", action="store_true", help="Decode and re-encode even when the inputs could be copied")
+    join.set_defaults(func=run_join)
+
+    split = subparsers.add_parser("split", help="Split a recording into equal parts by copying packets")
+    split.add_argument("audio_file")
+    split.add_argument("--output-dir", default=".", help="Folder for part1_fixed.m4a, part2_fixed.m4a, ... (default: current folder)")
+    split.add_argument("--parts", type=positive_int, default=4, help="Number of parts (default: 4)")
+    split.add_argument("--reencode", action="store_true", help="Decode the parts to WAV instead")
+    split.set_defaults(func=run_split)
+
+    args, extra_args = parser.parse_known_args(argv)
+    if args.command not in FORWARDED_COMMANDS and extra_args:
+        parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
+
+    if args.trace or args.metrics:
+        from tracing import enable_tracing
+
+        enable_tracing(args.trace, args.metrics)
+
+    try:
+        if args.command in FORWARDED_COMMANDS:
+            args.func(args, extra_args)
+        else:
+            args.func(args)
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ AUDIO_FILE = "./session13.m4a"  # CHANGE THIS
 WHISPER_MODEL = "turbo"  # turbo for best results, small for faster results
 TRANSCRIPT_FILE_NAME = "transcript.txt"
 
+# Loaded once per runtime: re-running the cell keeps the model from the previous run
+# (unless WHISPER_MODEL changed), since a plain MODEL = None would reset it each time
+MODEL = globals().get("MODEL")
+MODEL_NAME = globals().get("MODEL_NAME")
+
 INITIAL_PROMPT = """
     This is a Dungeons & Dragons 5th Edition 2024 live play session. The DM narrates the story, and four players roleplay their characters.
     
@@ -31,8 +36,12 @@ INITIAL_PROMPT = """
 
 # Transcribe audio using Whisper
 def transcribe_audio():
+    global MODEL, MODEL_NAME
     print("Transcribing audio...")
-    model = whisper.load_model(WHISPER_MODEL)
+    if MODEL is None or MODEL_NAME != WHISPER_MODEL:
+        MODEL = whisper.load_model(WHISPER_MODEL)
+        MODEL_NAME = WHISPER_MODEL
+    model = MODEL
 
     start_time = time.time()
     result = model.transcribe(
@@ -0,0 +1,198 @@
+import hashlib
+import math
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter, namedtuple
+from session_notes import SESSION_SEPARATOR
+
+# Relevance-ranked context for the summary prompts. Every session note and
+# vault note is indexed with BM25 (local, no network), the transcript is the
+# query, and the best matching notes are added until the token budget is used
+# up. The most recent sessions are always included for continuity. Tokens are
+# counted with tiktoken when its encoding file is in TOKENIZER_DIRECTORY,
+# otherwise estimated from the character count. tiktoken is never allowed to
+# download the file on its own (it would on first use, from every entry
+# point): fetch it once with `python context_retrieval.py --download-tokenizer`.
+
+CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+TOKENIZER_DIRECTORY = os.getenv("TIKTOKEN_CACHE_DIR") or os.path.join(CURRENT_DIRECTORY, "tokenizer")
+TOKENIZER_ENCODING = "o200k_base"  # Encoding of the gpt-4o/gpt-5 model family
+TOKENIZER_URL = "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken"
+TOKENIZER_SHA256 = "446a9538cb6c348e3516120d7c08b09f57c36495e2acfffe59a5bf8b0cfb1a2d"
+CHARS_PER_TOKEN = 3.5  # Fallback estimate, on the safe side for Portuguese text
+RECENT_SESSIONS = 1  # Latest sessions always included, whatever their score
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = set(
+    """
+    a ao aos as com como da das de do dos e ela elas ele eles em entao era essa esse esta este eu foi ha isso
+    ja la lhe mais mas me meu minha muito na nao nas no nos nossa o os ou para pela pelo por porque pra que
+    se sem ser seu sua sim so tambem te tem ter tipo um uma umas uns vai vamos voce voces
+    an and are as at be but by for from has have he her his in is it its of on or she that the their them
+    they this to was we were what when which who will with you
+    """.split()
+)
+
+ContextNote = namedtuple("ContextNote", ["path", "text", "kind", "tokens"])
+ContextSelection = namedtuple("ContextSelection", ["notes", "scores", "tokens", "candidates"])
+
+_encoding = None
+_encoding_loaded = False
+
+
+# Path of the encoding file in TOKENIZER_DIRECTORY, named as tiktoken's cache names it
+def get_tokenizer_path():
+    return os.path.join(TOKENIZER_DIRECTORY, hashlib.sha1(TOKENIZER_URL.encode()).hexdigest())
+
+
+# True when the encoding file is present and intact, so tiktoken reads it instead of downloading
+def is_tokenizer_available():
+    path = get_tokenizer_path()
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest() == TOKENIZER_SHA256
+
+
+# tiktoken encoding, or None when tiktoken or its local encoding file is unavailable
+def get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if not is_tokenizer_available():
+            print(
+                f"No {TOKENIZER_ENCODING} tokenizer file in {TOKENIZER_DIRECTORY} "
+                "(python context_retrieval.py --download-tokenizer), estimating tokens from length"
+            )
+            return None
+        os.environ["TIKTOKEN_CACHE_DIR"] = TOKENIZER_DIRECTORY
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            print(f"tiktoken encoding {TOKENIZER_ENCODING} unavailable ({type(e).__name__}), estimating tokens from length")
+    return _encoding
+
+
+def get_tokenizer_name():
+    return TOKENIZER_ENCODING if get_encoding() else f"~{CHARS_PER_TOKEN} chars/token"
+
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# Lowercase, accent-free search terms: "Ordem de Sangue" -> ["ordem", "sangue"]
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [term for term in re.findall(r"\w+", text) if len(term) > 1 and term not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        """documents: list of term lists"""
+        self.k1 = k1
+        self.b = b
+        self.lengths = [len(terms) for terms in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0.0
+        self.postings = {}  # term -> [(document, term frequency)]
+        for document, terms in enumerate(documents):
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, []).append((document, frequency))
+
+        document_count = len(documents)
+        self.idf = {
+            term: math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5)) for term, postings in self.postings.items()
+        }
+
+    # BM25 score of every document for {term: weight}
+    def score(self, query):
+        scores = [0.0] * len(self.lengths)
+        for term, weight in query.items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term] * weight
+            for document, frequency in postings:
+                length_norm = self.k1 * (1 - self.b + self.b * self.lengths[document] / self.average_length)
+                scores[document] += idf * frequency * (self.k1 + 1) / (frequency + length_norm)
+        return scores
+
+
+# Query terms of a transcript, weighted sublinearly so chatter repeated for an
+# hour does not drown out a name mentioned a few times
+def build_query(text):
+    return {term: 1 + math.log(frequency) for term, frequency in Counter(tokenize(text)).items()}
+
+
+class ContextIndex:
+    def __init__(self, session_texts, vault_texts=()):
+        """session_texts: [(path, text)] in chronological order; vault_texts: [(path, text)]"""
+        self.notes = [ContextNote(path, text, "session", count_tokens(text)) for path, text in session_texts]
+        self.notes += [ContextNote(path, text, "vault", count_tokens(text)) for path, text in vault_texts]
+        self.bm25 = BM25Index([tokenize(note.text) for note in self.notes])
+
+    def select(self, query_text, token_budget, recent_sessions=RECENT_SESSIONS):
+        """Pick the notes most relevant to query_text that fit in token_budget.
+
+        Returns a ContextSelection with the chosen notes (sessions in
+        chronological order, then vault notes by relevance), their scores, and
+        the total token count including separators.
+        """
+        scores = self.bm25.score(build_query(query_text))
+        separator_tokens = count_tokens(SESSION_SEPARATOR)
+        session_numbers = [number for number, note in enumerate(self.notes) if note.kind == "session"]
+        recent = session_numbers[-recent_sessions:] if recent_sessions > 0 else []
+        ranked = sorted((number for number in range(len(self.notes)) if scores[number] > 0 and number not in recent), key=lambda n: -scores[n])
+
+        chosen = set()
+        used_tokens = 0
+        for number in [*reversed(recent), *ranked]:
+            note_tokens = self.notes[number].tokens + separator_tokens
+            if used_tokens + note_tokens <= token_budget:
+                chosen.add(number)
+                used_tokens += note_tokens
+
+        sessions = [number for number in session_numbers if number in chosen]
+        vault = [number for number in ranked if number in chosen and self.notes[number].kind == "vault"]
+        order = sessions + vault
+        return ContextSelection([self.notes[n] for n in order], [scores[n] for n in order], used_tokens, len(self.notes))
+
+
+# Prompt text for a selection, notes separated like combined_sessions.md
+def format_context(selection):
+    return "".join(note.text + SESSION_SEPARATOR for note in selection.notes)
+
+
+def print_selection(selection, token_budget):
+    print(
+        f"Context: {len(selection.notes)} of {selection.candidates} notes, {selection.tokens:,} of {token_budget:,} tokens "
+        f"(tokenizer: {get_tokenizer_name()})"
+    )
+    for note, score in zip(selection.notes, selection.scores):
+        title = note.text.split("\n", 1)[0].lstrip("# ")
+        print(f"  [{note.kind}] {title}: score {score:.1f}, {note.tokens:,} tokens")
+
+
+# One-time download of the encoding file into TOKENIZER_DIRECTORY (the only network access here)
+def download_tokenizer():
+    import tiktoken
+
+    os.environ["TIKTOKEN_CACHE_DIR"] = TOKENIZER_DIRECTORY
+    tiktoken.get_encoding(TOKENIZER_ENCODING)
+    print(f"Saved the {TOKENIZER_ENCODING} tokenizer to {get_tokenizer_path()}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["--download-tokenizer"]:
+        print("Usage: python context_retrieval.py --download-tokenizer")
+        sys.exit(1)
+    download_tokenizer()
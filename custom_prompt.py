@@ -1,50 +1,119 @@
+import argparse
 import os
 import time
 from dotenv import load_dotenv
-from openai import OpenAI
+from api_scheduler import print_scheduler_stats
+from context_retrieval import count_tokens
+from llm import create_chat_text, print_cache_stats
+from transcript_passages import PASSAGE_TOKEN_BUDGET, PassageIndex, format_passages
+
+STREAM_RESPONSE = True  # Print and save the answer as it is generated
+PROMPT_MODES = ("retrieval", "full")  # retrieval: only the transcript passages most relevant to the prompt
+SESSIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions")
+
+
+def get_session_directory(session_number):
+    return os.path.join(SESSIONS_DIRECTORY, f"session_{session_number}")
+
+
+# "16" -> ["16"], "12-14, 16" -> ["12", "13", "14", "16"]
+def parse_session_numbers(text):
+    session_numbers = []
+    for part in text.replace(" ", "").split(","):
+        if "-" in part:
+            first, last = part.split("-", 1)
+            if not first.isdigit() or not last.isdigit() or int(first) > int(last):
+                raise ValueError(f"Invalid session range: {part}")
+            session_numbers += [str(number) for number in range(int(first), int(last) + 1)]
+        elif part:
+            session_numbers.append(part)
+    if not session_numbers:
+        raise ValueError("No session number given")
+    return session_numbers
+
+
+# Whole transcripts of the sessions, one after the other
+def load_full_transcripts(session_numbers):
+    transcripts = []
+    for session_number in session_numbers:
+        transcript_path = os.path.join(get_session_directory(session_number), "transcript.txt")
+        if not os.path.exists(transcript_path):
+            raise FileNotFoundError(f"Transcript file not found: {transcript_path}")
+
+        with open(transcript_path, "r", encoding="utf-8") as file:
+            transcript = file.read()
+
+        if not transcript.strip():
+            raise ValueError(f"Transcript file is empty: {transcript_path}")
+        transcripts.append(transcript if len(session_numbers) == 1 else f"[Session {session_number}]\n{transcript}")
+    return "\n\n".join(transcripts)
+
+
+# Prompt content for a question: the whole transcripts, or only the best passages
+def build_custom_prompt_content(session_numbers, custom_prompt, mode="retrieval", token_budget=PASSAGE_TOKEN_BUDGET):
+    if mode == "full":
+        transcript = load_full_transcripts(session_numbers)
+        sessions = "dnd session transcript" if len(session_numbers) == 1 else "dnd session transcripts"
+        return f"{custom_prompt}\n\nAnswer the prompt according to the following {sessions}:\n{transcript}"
 
+    start_time = time.time()
+    index = PassageIndex([(session_number, get_session_directory(session_number)) for session_number in session_numbers])
+    passages, passage_tokens = index.search(custom_prompt, token_budget)
+    print(
+        f"Passages: {len(passages)} excerpt(s) from {len({passage.session for passage in passages})} of {len(session_numbers)} session(s), "
+        f"{passage_tokens:,} of {token_budget:,} tokens ({len(index.passages)} windows searched in {time.time() - start_time:.2f} seconds)"
+    )
+    if not passages:
+        print("No passage matches the prompt, sending it without transcript excerpts.")
+    return (
+        f"{custom_prompt}\n\nAnswer the prompt according to the following excerpts of dnd session transcripts "
+        f"(the parts most relevant to the prompt, labeled with session and time when known):\n{format_passages(passages)}"
+    )
 
-def send_custom_prompt_request(session_number, custom_prompt, deepseek_api_key):
-    base_deepseek_api_url = "https://api.deepseek.com"
-    deepseek_client = OpenAI(api_key=deepseek_api_key, base_url=base_deepseek_api_url)
-
-    # get transcript from session
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    session_directory = os.path.join(current_dir, f"sessions/session_{session_number}")
-    transcript_path = os.path.join(session_directory, "transcript.txt")
-
-    if not os.path.exists(transcript_path):
-        raise FileNotFoundError(f"Transcript file not found: {transcript_path}")
 
-    with open(transcript_path, "r", encoding="utf-8") as file:
-        transcript = file.read()
+def send_custom_prompt_request(
+    session_numbers, custom_prompt, deepseek_api_key, output_path=None, stream=False, cache=True, mode="retrieval", token_budget=PASSAGE_TOKEN_BUDGET
+):
+    from openai import OpenAI  # Imported here: the SDK import is the slowest part of starting up
 
-    if not transcript.strip():
-        raise ValueError(f"Transcript file is empty: {transcript_path}")
+    base_deepseek_api_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+    deepseek_client = OpenAI(api_key=deepseek_api_key, base_url=base_deepseek_api_url, max_retries=0)  # Retries: api_scheduler.py
 
-    print(f"Sending custom prompt request for session {session_number}...")
+    content = build_custom_prompt_content(session_numbers, custom_prompt, mode, token_budget)
+    print(f"Sending custom prompt request for session(s) {', '.join(session_numbers)} ({mode} mode, {count_tokens(content):,} prompt tokens)...")
 
     # Send request to DeepSeek API
     start_time = time.time()
-    response = deepseek_client.chat.completions.create(
-        model="deepseek-reasoner",
-        messages=[
+    response_content = create_chat_text(
+        deepseek_client,
+        "deepseek-reasoner",
+        [
             {
                 "role": "user",
-                "content": f"{custom_prompt}\n\nAnswer the prompt according to the following dnd session transcript:\n{transcript}",
+                "content": content,
             },
         ],
-        stream=False,
+        output_path=output_path,
+        stream=stream,
+        prefix=f"Custom Prompt:\n{custom_prompt}\n\nResponse:\n",
+        echo=stream,
+        cache=cache,
     )
-
-    response_content = response.choices[0].message.content
     end_time = time.time()
     print(f"Request completed in {end_time - start_time:.2f} seconds.")
 
     return response_content
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ask a custom question about a session transcript.")
+    parser.add_argument("--no-cache", action="store_true", help="Always send the request, ignoring a cached answer to the same question")
+    parser.add_argument(
+        "--mode", choices=PROMPT_MODES, default="retrieval", help="retrieval: send the most relevant transcript passages (default), full: whole transcripts"
+    )
+    parser.add_argument("--budget", type=int, default=PASSAGE_TOKEN_BUDGET, help=f"Token budget of retrieved passages (default: {PASSAGE_TOKEN_BUDGET})")
+    args = parser.parse_args(argv)
+
     load_dotenv()
 
     try:
@@ -54,7 +123,7 @@ def main():
             raise ValueError("DEEPSEEK_API_KEY is not set")
 
         # input
-        session_number = input("Enter session number: ").strip()
+        session_numbers = parse_session_numbers(input("Enter session number(s), e.g. 16 or 12-14,16: "))
         print("Enter your custom prompt (press Enter twice to finish):")
 
         custom_prompt_lines = []
@@ -70,28 +139,35 @@ def main():
             print("Error: Custom prompt cannot be empty")
             return
 
+        # the response is saved (streamed, if enabled) to custom_prompt/output.txt
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        output_path = os.path.join(current_dir, "custom_prompt", "output.txt")
+
+        if STREAM_RESPONSE:
+            print("\n" + "=" * 50)
+            print("API RESPONSE:")
+            print("=" * 50)
+
         response = send_custom_prompt_request(
-            session_number,
+            session_numbers,
             custom_prompt,
             deepseek_api_key,
+            output_path=output_path,
+            stream=STREAM_RESPONSE,
+            cache=not args.no_cache,
+            mode=args.mode,
+            token_budget=args.budget,
         )
 
-        print("\n" + "=" * 50)
-        print("API RESPONSE:")
-        print("=" * 50)
-        print(response)
-
-        # save the response
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        response_directory = os.path.join(current_dir, "custom_prompt")
-        os.makedirs(response_directory, exist_ok=True)
-
-        output_path = os.path.join(response_directory, "output.txt")
-        with open(output_path, "w", encoding="utf-8") as file:
-            file.write(f"Custom Prompt:\n{custom_prompt}\n\n")
-            file.write(f"Response:\n{response}")
+        if not STREAM_RESPONSE:
+            print("\n" + "=" * 50)
+            print("API RESPONSE:")
+            print("=" * 50)
+            print(response)
 
         print(f"Response saved to: {output_path}")
+        print_cache_stats()
+        print_scheduler_stats()
 
     except FileNotFoundError as e:
         print(f"Error: {e}")
@@ -0,0 +1,309 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the OpenAI API, used by benchmark.py to measure the
+# pipeline without network access or API costs.
+#   python fake_openai_server.py --port 8765 --latency 2 --latency-per-kchar 0.02 --generation-time 5
+# then point the clients at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+# (DEEPSEEK_BASE_URL for the DeepSeek scripts). --jitter adds a random delay to
+# every request, and --rpm-limit / --rate-limit-rate answer some requests with
+# 429 and a Retry-After header, like a real rate-limited account.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+FAKE_TRANSCRIPT = "O grupo entra na taverna e fala com o Idagar sobre a Ordem de Sangue."
+
+
+# Minimal verbose_json transcription payload: one segment per sentence, 5 seconds each
+def make_verbose_transcription(text):
+    sentences = [sentence.strip() + "." for sentence in text.split(".") if sentence.strip()]
+    segments = [
+        {
+            "id": number,
+            "seek": 0,
+            "start": number * 5.0,
+            "end": number * 5.0 + 5.0,
+            "text": f" {sentence}",
+            "tokens": [],
+            "temperature": 0.0,
+            "avg_logprob": -0.2,
+            "compression_ratio": 1.2,
+            "no_speech_prob": 0.01,
+        }
+        for number, sentence in enumerate(sentences)
+    ]
+    return {"task": "transcribe", "language": "portuguese", "duration": len(segments) * 5.0, "text": text, "segments": segments}
+
+
+def fake_completion(prompt):
+    return f"## Resumo\n\nResposta simulada para um pedido de {len(prompt)} caracteres."
+
+
+# Minimal Responses API payload
+def make_response(model, text, prompt=""):
+    return {
+        "usage": {
+            "input_tokens": len(prompt) // 4,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": len(text) // 4,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": len(prompt) // 4 + len(text) // 4,
+        },
+        "id": "resp_fake",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": "msg_fake",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+# Minimal Chat Completions payload
+def make_chat_completion(model, text, prompt=""):
+    return {
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4, "total_tokens": len(prompt) // 4 + len(text) // 4},
+        "id": "chatcmpl_fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+    }
+
+
+# Chat Completions stream chunk
+def make_chat_chunk(model, delta):
+    return {
+        "id": "chatcmpl_fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+    }
+
+
+# Word-sized stream deltas
+def split_deltas(text):
+    return [word + " " for word in text.split(" ")[:-1]] + [text.split(" ")[-1]]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Server-sent events spread over the server's generation_time, like tokens being generated
+    def send_stream(self, events, done=False):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        interval = self.server.generation_time / max(1, len(events))
+        for event_type, data in events:
+            message = f"event: {event_type}\n" if event_type else ""
+            self.wfile.write(f"{message}data: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(interval)
+        if done:
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    def send_rate_limited(self, retry_after):
+        body = json.dumps({"error": {"message": "Rate limit reached (fake server)", "type": "requests", "code": "rate_limit_exceeded"}}).encode("utf-8")
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        retry_after = self.server.check_rate_limit()
+        self.server.record_request(self.path, len(body), 429 if retry_after else 200)
+        if retry_after:
+            self.send_rate_limited(retry_after)
+            return
+
+        if self.path.endswith("/audio/transcriptions"):
+            self.server.wait(self.server.latency + self.server.latency_per_mb * length / (1024 * 1024))
+            if b'name="response_format"\r\n\r\nverbose_json' in body:
+                self.send_body(200, json.dumps(make_verbose_transcription(FAKE_TRANSCRIPT)), "application/json")
+            else:
+                self.send_body(200, FAKE_TRANSCRIPT, "text/plain")
+        elif self.path.endswith("/responses"):
+            request = json.loads(body)
+            prompt = str(request.get("input", ""))
+            self.server.wait_for_completion(prompt)
+            text = fake_completion(prompt)
+            if request.get("stream"):
+                events = [
+                    {"type": "response.output_text.delta", "item_id": "msg_fake", "output_index": 0, "content_index": 0, "delta": delta}
+                    for delta in split_deltas(text)
+                ]
+                events.append({"type": "response.completed", "response": make_response(request["model"], text, prompt)})
+                self.send_stream([(event["type"], event) for event in events])
+            else:
+                time.sleep(self.server.generation_time)
+                self.send_body(200, json.dumps(make_response(request["model"], text, prompt)), "application/json")
+        elif self.path.endswith("/chat/completions"):
+            request = json.loads(body)
+            prompt = "".join(str(message.get("content", "")) for message in request.get("messages", []))
+            self.server.wait_for_completion(prompt)
+            text = fake_completion(prompt)
+            if request.get("stream"):
+                chunks = [make_chat_chunk(request["model"], delta) for delta in split_deltas(text)]
+                if request.get("stream_options", {}).get("include_usage"):
+                    chunks.append({**make_chat_chunk(request["model"], ""), "choices": [], "usage": make_chat_completion(request["model"], text, prompt)["usage"]})
+                self.send_stream([(None, chunk) for chunk in chunks], done=True)
+            else:
+                time.sleep(self.server.generation_time)
+                self.send_body(200, json.dumps(make_chat_completion(request["model"], text, prompt)), "application/json")
+        else:
+            self.send_body(404, json.dumps({"error": {"message": f"Unknown endpoint: {self.path}"}}), "application/json")
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        latency=0.0,
+        verbose=False,
+        latency_per_kchar=0.0,
+        generation_time=0.0,
+        jitter=0.0,
+        rpm_limit=0,
+        rate_limit_rate=0.0,
+        seed=None,
+        latency_per_mb=0.0,
+    ):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.latency = latency
+        self.latency_per_kchar = latency_per_kchar  # Extra seconds per 1000 prompt characters, like a real model reading a long input
+        self.latency_per_mb = latency_per_mb  # Extra seconds per uploaded MB of audio, like a real model transcribing a longer chunk
+        self.generation_time = generation_time  # Seconds spent producing an LLM answer, spread over the deltas when streaming
+        self.jitter = jitter  # Up to this many extra seconds on every wait, uniformly random
+        self.rpm_limit = rpm_limit  # Accepted requests per rolling minute before answering 429 (0: no limit)
+        self.rate_limit_rate = rate_limit_rate  # Fraction of requests answered 429 at random, whatever the rate
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.requests = []
+        self.requests_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def wait(self, seconds):
+        with self.requests_lock:
+            seconds += self.random.uniform(0, self.jitter)
+        time.sleep(seconds)
+
+    def wait_for_completion(self, prompt):
+        self.wait(self.latency + self.latency_per_kchar * len(prompt) / 1000)
+
+    # Seconds the client should wait before retrying, or None when the request may proceed
+    def check_rate_limit(self):
+        now = time.time()
+        with self.requests_lock:
+            if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+                return 1
+            if self.rpm_limit:
+                accepted = [request["time"] for request in self.requests if request["status"] == 200 and request["time"] > now - 60]
+                if len(accepted) >= self.rpm_limit:
+                    return max(1, math.ceil(accepted[-self.rpm_limit] + 60 - now))
+        return None
+
+    def record_request(self, path, body_size, status=200):
+        with self.requests_lock:
+            self.requests.append({"path": path, "bytes": body_size, "time": time.time(), "status": status})
+
+
+# Start the server on a background thread (port 0 picks a free port)
+def start_fake_server(
+    port=0, latency=0.0, verbose=False, latency_per_kchar=0.0, generation_time=0.0, jitter=0.0, rpm_limit=0, rate_limit_rate=0.0, seed=None, latency_per_mb=0.0
+):
+    server = FakeOpenAIServer(
+        port=port,
+        latency=latency,
+        verbose=verbose,
+        latency_per_kchar=latency_per_kchar,
+        generation_time=generation_time,
+        jitter=jitter,
+        rpm_limit=rpm_limit,
+        rate_limit_rate=rate_limit_rate,
+        seed=seed,
+        latency_per_mb=latency_per_mb,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake OpenAI API server for benchmarks.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds to wait before each response")
+    parser.add_argument("--latency-per-kchar", type=float, default=0.0, help="Extra seconds per 1000 prompt characters for LLM requests")
+    parser.add_argument("--latency-per-mb", type=float, default=0.0, help="Extra seconds per uploaded MB for transcription requests")
+    parser.add_argument("--generation-time", type=float, default=0.0, help="Seconds spent generating each LLM answer (streamed gradually)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many random extra seconds per request")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Requests per rolling minute before answering 429 (default: no limit)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered 429 at random")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter and random 429s")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        port=args.port,
+        latency=args.latency,
+        verbose=True,
+        latency_per_kchar=args.latency_per_kchar,
+        generation_time=args.generation_time,
+        jitter=args.jitter,
+        rpm_limit=args.rpm_limit,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+        latency_per_mb=args.latency_per_mb,
+    )
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Checkpointed pipeline stages of one session, kept in sessions/<name>/jobs.db
+# (SQLite). Every stage row holds the hash of the stage's inputs, its status
+# (running, done, failed) and its output (JSON). A stage is reused on the next
+# run only while it is done and its input hash still matches, so a restart
+# picks up at the first stage that never finished, or whose inputs (the
+# recording, a prompt, a model, the selected notes, an upstream output)
+# changed. Stages of main_openai.py:
+#   decode             duration and, with --remove-silence, the speech spans
+#   chunk              planned chunk boundaries
+#   transcribe:<a>-<b> text and segments of the chunk [a, b) ms
+#   transcript         transcript.txt complete
+#   summarize          summary.txt
+#   markdown           summary.md
+# main.py records transcript, summarize and markdown. `python job_store.py`
+# (or `python cli.py jobs`) lists in-flight and failed jobs of every session.
+
+CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SESSIONS_DIRECTORY = os.path.join(CURRENT_DIRECTORY, "sessions")
+JOB_DATABASE_FILE_NAME = "jobs.db"
+FINGERPRINT_BYTES = 1024 * 1024  # Read from each end of a recording to identify it
+STAGE_ORDER = ("decode", "chunk", "transcribe", "transcript", "summarize", "markdown")  # For listing; transcribe:* rows sort by start
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS stages (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    host TEXT,
+    pid INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    started_at REAL,
+    finished_at REAL
+);
+"""
+
+
+# Hash of a stage's inputs: any JSON values (text, settings, upstream hashes)
+def hash_inputs(*inputs):
+    return hashlib.sha256(json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# Cheap content identity of a file: its size and a hash of its first and last
+# FINGERPRINT_BYTES, so a copied or moved recording keeps its stages; None when missing
+def fingerprint_file(path):
+    if not os.path.exists(path):
+        return None
+    size = os.path.getsize(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        digest.update(file.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            file.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            digest.update(file.read())
+    return [size, digest.hexdigest()]
+
+
+# Whether a process of this host is still running (False when it exited or never existed)
+def is_process_alive(pid):
+    if os.name == "nt":
+        import ctypes
+
+        # os.kill(pid, 0) would terminate the process on Windows, so ask for its exit code instead
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    def __init__(self, session_directory, audio_file=None, pipeline=None):
+        os.makedirs(session_directory, exist_ok=True)
+        self.session_directory = session_directory
+        self.path = os.path.join(session_directory, JOB_DATABASE_FILE_NAME)
+        self.lock = threading.Lock()  # Chunks are checkpointed from several upload threads
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+        if audio_file:
+            self.set_info(audio_file=os.path.abspath(audio_file))
+        if pipeline:
+            self.set_info(pipeline=pipeline)
+
+    def set_info(self, **values):
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO job (key, value) VALUES (?, ?)", [(key, str(value)) for key, value in values.items()])
+
+    # {"status", "input_hash"} of a stage, or None when it never ran
+    def get_stage(self, name):
+        with self.lock:
+            row = self.connection.execute("SELECT status, input_hash FROM stages WHERE name = ?", (name,)).fetchone()
+        return None if row is None else {"status": row[0], "input_hash": row[1]}
+
+    # Output of a stage that finished with these inputs, or None when it has to run
+    def get_output(self, name, input_hash):
+        with self.lock:
+            row = self.connection.execute("SELECT status, input_hash, output FROM stages WHERE name = ?", (name,)).fetchone()
+        if row is None or row[0] != "done" or row[1] != input_hash:
+            return None
+        return json.loads(row[2])
+
+    def start(self, name, input_hash):
+        with self.lock:
+            self.connection.execute(
+                """INSERT INTO stages (name, status, input_hash, host, pid, attempts, started_at) VALUES (?, 'running', ?, ?, ?, 1, ?)
+                ON CONFLICT(name) DO UPDATE SET status = 'running', input_hash = excluded.input_hash, output = NULL, error = NULL,
+                host = excluded.host, pid = excluded.pid, attempts = attempts + 1, started_at = excluded.started_at, finished_at = NULL""",
+                (name, input_hash, socket.gethostname(), os.getpid(), time.time()),
+            )
+
+    # Mark a stage done; also records outputs made outside the store (e.g. an existing transcript)
+    def finish(self, name, input_hash, output):
+        with self.lock:
+            self.connection.execute(
+                """INSERT INTO stages (name, status, input_hash, output, host, pid, finished_at) VALUES (?, 'done', ?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET status = 'done', input_hash = excluded.input_hash, output = excluded.output, error = NULL,
+                finished_at = excluded.finished_at""",
+                (name, input_hash, json.dumps(output, ensure_ascii=False), socket.gethostname(), os.getpid(), time.time()),
+            )
+
+    def fail(self, name, error):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE stages SET status = 'failed', error = ?, finished_at = ? WHERE name = ?", (f"{type(error).__name__}: {error}", time.time(), name)
+            )
+
+    # Reuse the stage's output when current (and reuse is True); otherwise run compute()
+    # (returning the output, JSON values) as the stage, recording its outcome. Returns (output, reused)
+    def run_stage(self, name, input_hash, compute, reuse=True):
+        output = self.get_output(name, input_hash) if reuse else None
+        if output is not None:
+            return output, True
+        self.start(name, input_hash)
+        try:
+            output = compute()
+        except BaseException as e:  # Ctrl+C too: the stage did not finish
+            self.fail(name, e)
+            raise
+        self.finish(name, input_hash, output)
+        return output, False
+
+    # Run a stage that writes one session file unless the file exists and the stage is
+    # current (same inputs as when it was written); returns the file's text
+    def run_file_stage(self, name, input_hash, output_path, write, force=False):
+        def compute():
+            write()
+            return {"path": os.path.basename(output_path)}
+
+        _, reused = self.run_stage(name, input_hash, compute, reuse=not force and os.path.exists(output_path))
+        if reused:
+            print(f"{os.path.basename(output_path)} is current (same inputs as the last run), skipping {name}.")
+        with open(output_path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    # Drop rows whose name starts with prefix (e.g. the chunks of an outdated plan)
+    def clear_stages(self, prefix):
+        with self.lock:
+            self.connection.execute("DELETE FROM stages WHERE name LIKE ? ESCAPE '\\'", (prefix.replace("_", "\\_").replace("%", "\\%") + "%",))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    # `with JobStore(...) as job_store:` closes the database even when a stage fails
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Rows of a session's job database as dicts, in pipeline order; a running stage
+# whose process on this host is gone is reported as interrupted
+def read_job(database_path):
+    connection = sqlite3.connect(database_path, timeout=30)
+    try:
+        info = dict(connection.execute("SELECT key, value FROM job").fetchall())
+        rows = connection.execute("SELECT name, status, error, host, pid, attempts, started_at, finished_at FROM stages").fetchall()
+        plan = connection.execute("SELECT output FROM stages WHERE name = 'chunk' AND status = 'done'").fetchone()
+    finally:
+        connection.close()
+    if plan:
+        info["planned_chunks"] = len(json.loads(plan[0]))
+
+    stages = []
+    for name, status, error, host, pid, attempts, started_at, finished_at in rows:
+        if status == "running" and host == socket.gethostname() and not is_process_alive(pid):
+            status = "interrupted"
+        stages.append(
+            {"name": name, "status": status, "error": error, "pid": pid, "attempts": attempts, "started_at": started_at, "finished_at": finished_at}
+        )
+
+    def order(stage):
+        base, _, window = stage["name"].partition(":")
+        start_ms = int(window.split("-")[0]) if window else 0
+        return (STAGE_ORDER.index(base) if base in STAGE_ORDER else len(STAGE_ORDER), start_ms)
+
+    stages.sort(key=order)
+    return info, stages
+
+
+# Overall state of a job: failed, interrupted, running or done (a stale stage only shows once it re-runs)
+def get_job_status(stages):
+    statuses = {stage["status"] for stage in stages}
+    for status in ("failed", "interrupted", "running"):
+        if status in statuses:
+            return status
+    return "done"
+
+
+# (session name, info, stages, status) of every session folder with a job database
+def list_jobs(sessions_directory=SESSIONS_DIRECTORY):
+    jobs = []
+    if not os.path.isdir(sessions_directory):
+        return jobs
+    for name in sorted(os.listdir(sessions_directory)):
+        database_path = os.path.join(sessions_directory, name, JOB_DATABASE_FILE_NAME)
+        if os.path.exists(database_path):
+            info, stages = read_job(database_path)
+            jobs.append((name, info, stages, get_job_status(stages)))
+    return jobs
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp else "-"
+
+
+def print_jobs(sessions_directory=SESSIONS_DIRECTORY, show_all=False):
+    jobs = list_jobs(sessions_directory)
+    shown = [job for job in jobs if show_all or job[3] != "done"]
+    print(f"{len(jobs)} session job(s) in {sessions_directory}, {len(shown)} {'listed' if show_all else 'in flight or failed'}.")
+    for name, info, stages, status in shown:
+        chunks = [stage for stage in stages if stage["name"].startswith("transcribe:")]
+        chunks_done = sum(1 for stage in chunks if stage["status"] == "done")
+        last_update = max((stage["finished_at"] or stage["started_at"] or 0 for stage in stages), default=0)
+        pending = [stage for stage in stages if stage["status"] != "done"]
+        current = pending[0]["name"] if pending else stages[-1]["name"] if stages else "-"
+        print(f"\n{name} [{status}] {info.get('pipeline', '')} {info.get('audio_file', '')}".rstrip())
+        chunk_count = max(len(chunks), info.get("planned_chunks", 0))  # Oversized chunks are split in two while encoding
+        progress = f", chunks transcribed: {chunks_done}/{chunk_count}" if chunk_count else ""
+        print(f"  stage: {current}{progress}, last update: {format_time(last_update)}")
+        for stage in pending:
+            detail = f" (pid {stage['pid']})" if stage["status"] == "running" else f": {stage['error']}" if stage["error"] else ""
+            print(f"  {stage['status']:<12} {stage['name']}, attempt {stage['attempts']}, started {format_time(stage['started_at'])}{detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List in-flight and failed session pipeline jobs.")
+    parser.add_argument("--sessions-directory", default=SESSIONS_DIRECTORY, help="Folder holding the session folders (default: sessions/)")
+    parser.add_argument("--all", action="store_true", help="Also list jobs whose stages all finished")
+    args = parser.parse_args(argv)
+    print_jobs(args.sessions_directory, show_all=args.all)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,26 @@
-from pydub import AudioSegment
+import argparse
+from audio_chunker import join_audio_files
 
 
-def join_audios(file1_path, file2_path, output_path):
-    audio1 = AudioSegment.from_file(file1_path, format="m4a")
-    audio2 = AudioSegment.from_file(file2_path, format="m4a")
+def join_audios(input_paths, output_path, reencode=False):
+    if len(input_paths) < 2:
+        raise ValueError(f"At least two recordings are needed to join, got {len(input_paths)}")
+    # Packets are copied as they are when every part has the same codec; ffmpeg only decodes on a mismatch
+    copied = join_audio_files(input_paths, output_path, reencode=reencode)
+    print(f"Combined {len(input_paths)} files ({'stream copy' if copied else 're-encoded'}) saved to {output_path}")
 
-    combined_audio = audio1 + audio2
 
-    combined_audio.export(output_path, format="mp4")
-    print(f"Combined audio saved to {output_path}")
+# python join_audios.py part1.m4a part2.m4a [part3.m4a ...] -o output.m4a (same options as `cli.py join`)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Join recordings in order, copying packets unless their formats differ.")
+    parser.add_argument("inputs", nargs="+", help="Recordings to join, at least two")
+    parser.add_argument("-o", "--output", required=True, help="Joined file, e.g. session17.m4a")
+    parser.add_argument("--reencode", action="store_true", help="Decode and re-encode even when the inputs could be copied")
+    args = parser.parse_args(argv)
+    if len(args.inputs) < 2:
+        parser.error("at least two recordings are needed to join")
+    join_audios(args.inputs, args.output, reencode=args.reencode)
 
 
 if __name__ == "__main__":
-    file1 = "part1_fixed.m4a"
-    file2 = "part2_fixed.m4a"
-    output = "output_audio.m4a"
-    join_audios(file1, file2, output)
+    main()
@@ -1,41 +1,14 @@
-import os
 import pyperclip
+from session_notes import SESSION_SEPARATOR, get_session_number, get_session_texts, write_combined_sessions
 
 SESSION_NOTES_DIRECTORY = "C:/Users/LENOVO/Desktop/dnd/worlds/Finvora/Finvora/Sessions"
 
 
-def get_session_number(file):
-    file_name = os.path.splitext(file)[0]
-    session_number = float(file_name.split(" ")[1].strip())
-    if session_number.is_integer():
-        session_number = int(session_number)
-    return session_number
-
-
-def get_markdown_file_paths():
-    files = {}
-    for file in os.listdir(SESSION_NOTES_DIRECTORY):
-        if file.lower().startswith("session") and file.endswith(".md"):
-            session_number = get_session_number(file)
-            files[session_number] = os.path.join(SESSION_NOTES_DIRECTORY, file)
-    file_paths = [files[key] for key in sorted(files.keys())]
-    return file_paths
-
-
-def get_text_from_file(file):
-    title = os.path.splitext(os.path.basename(file))[0]
-    content = f"# {title}\n\n"
-    with open(file, "r", encoding="utf-8") as file:
-        content += file.read()
-    return content
-
-
 def main():
-    # Gen text
-    files = get_markdown_file_paths()
-    text = ""
-    for file in files:
-        text += get_text_from_file(file) + f"\n\n{'='*40}\n\n"
+    # Gen text (unchanged notes come from the cache)
+    session_texts = get_session_texts(SESSION_NOTES_DIRECTORY)
+    files = [file for file, _ in session_texts]
+    text = "".join(session_text + SESSION_SEPARATOR for _, session_text in session_texts)
 
     # Config
     copy = True
@@ -51,9 +24,10 @@ def main():
 
     # Save to output file
     output_file = "combined_sessions.md"
-    with open(output_file, "w", encoding="utf-8") as file:
-        file.write(text.strip())
-    print(f"Combined text saved to '{output_file}'")
+    if write_combined_sessions(text, output_file):
+        print(f"Combined text saved to '{output_file}'")
+    else:
+        print(f"'{output_file}' is already up to date")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import math
+import os
+import shutil
+import time
+from audio_chunker import AudioChunk, decode_audio_windows, export_audio_window, get_audio_duration
+from chunk_planner import ANALYSIS_SAMPLE_RATE, SEARCH_WINDOW_MS, find_quietest_points, plan_chunk_boundaries
+from segment_store import SEGMENTS_FILE_NAME, write_segments
+from tracing import span
+
+# Watch mode: transcribe a recording while it is still being written. The
+# file is polled, and as soon as WINDOW_MS more audio (plus room to look for a
+# pause) can be decoded, that window is cut at its quietest point, encoded and
+# handed to the caller's transcribe_window(number, chunk). Its text is
+# appended to transcript.txt.partial right away. When the file has not grown
+# for IDLE_SECONDS (or on Ctrl+C) the recording counts as stopped: only the
+# tail after the last window is left, then transcript.txt and transcript.seg
+# are written and summarization can start.
+#
+# The recording has to be readable while it grows: WAV, MP3, FLAC, OGG, MKV
+# or ADTS AAC work. M4A/MP4 recorders write the index at the very end, so
+# such files can only be read once recording stops (everything is then left
+# for the tail).
+
+WINDOW_MS = 5 * 60 * 1000  # Audio transcribed per window while recording
+POLL_SECONDS = 10.0  # Time between checks for new audio
+IDLE_SECONDS = 60.0  # The recording counts as stopped once the file stops growing this long
+PROBE_MS = 1000  # Audio decoded to check that a stretch of the file is written
+TRANSCRIPT_FILE_NAME = "transcript.txt"
+
+
+# True when the second of audio before end_ms can already be decoded from the (growing) file
+def is_audio_available(audio_file, end_ms):
+    try:
+        pcm = decode_audio_windows(audio_file, [(max(0, end_ms - PROBE_MS), end_ms)], sample_rate=ANALYSIS_SAMPLE_RATE)[0]
+    except RuntimeError:
+        return False  # Header or index not written yet
+    return len(pcm) >= PROBE_MS * ANALYSIS_SAMPLE_RATE // 1000 * 2 * 0.95
+
+
+# End of the audio written so far. The container's duration is exact once the
+# recorder has finished, but a file that is still being written may claim more
+# (a WAV size or MP3 Xing header written up front), so then the last decodable
+# second is searched for, doubling from start_ms and then bisecting
+def find_recorded_end(audio_file, start_ms):
+    end_ms = get_audio_duration(audio_file)
+    if end_ms <= start_ms or is_audio_available(audio_file, end_ms):
+        return end_ms
+    low_ms, step_ms = start_ms, WINDOW_MS
+    while is_audio_available(audio_file, low_ms + step_ms):
+        low_ms += step_ms
+        step_ms *= 2
+    high_ms = low_ms + step_ms
+    while high_ms - low_ms > PROBE_MS:
+        middle_ms = (low_ms + high_ms) // 2
+        if is_audio_available(audio_file, middle_ms):
+            low_ms = middle_ms
+        else:
+            high_ms = middle_ms
+    return low_ms
+
+
+# Encode [start_ms, end_ms) of the recording; None if the file does not hold all of it yet
+def export_window(audio_file, chunks_dir, number, start_ms, end_ms, bitrate, extension, extra_args):
+    chunk_file = os.path.join(chunks_dir, f"window_{number}.{extension}")
+    try:
+        with span("encode", chunk=number, start_ms=start_ms, end_ms=end_ms, bitrate=bitrate) as current:
+            export_audio_window(audio_file, chunk_file, start_ms, end_ms, bitrate=bitrate, extra_args=extra_args)
+            current.set(bytes=os.path.getsize(chunk_file))
+        complete = get_audio_duration(chunk_file) >= end_ms - start_ms - PROBE_MS
+    except (RuntimeError, ValueError):
+        complete = False
+    if not complete:
+        if os.path.exists(chunk_file):
+            os.remove(chunk_file)
+        return None
+    return AudioChunk(chunk_file, start_ms, end_ms)
+
+
+def watch_recording(
+    audio_file,
+    session_directory,
+    transcribe_window,
+    bitrate=None,
+    extension="mp3",
+    extra_args=(),
+    window_ms=None,
+    poll_seconds=None,
+    idle_seconds=None,
+):
+    """Transcribe audio_file window by window while it is being recorded,
+    until it stops growing. transcribe_window(number, AudioChunk) returns
+    (text, segments in recording time) and may delete the chunk file.
+    Returns the full transcript, also saved to transcript.txt."""
+    window_ms = WINDOW_MS if window_ms is None else window_ms
+    poll_seconds = POLL_SECONDS if poll_seconds is None else poll_seconds
+    idle_seconds = IDLE_SECONDS if idle_seconds is None else idle_seconds
+    os.makedirs(session_directory, exist_ok=True)
+    chunks_dir = os.path.join(session_directory, "chunks")
+    os.makedirs(chunks_dir, exist_ok=True)
+    transcript_path = os.path.join(session_directory, TRANSCRIPT_FILE_NAME)
+    partial_path = f"{transcript_path}.partial"
+    open(partial_path, "w", encoding="utf-8").close()
+
+    transcripts = []
+    segments = []
+    start_ms = 0
+    number = 0
+
+    def transcribe(chunk):
+        nonlocal number
+        text, chunk_segments = transcribe_window(number + 1, chunk)
+        number += 1
+        transcripts.append(text)
+        segments.extend(chunk_segments)
+        with open(partial_path, "a", encoding="utf-8") as file:
+            file.write(("\n\n" if number > 1 else "") + text)
+        print(f"Window {number}: {chunk.start_ms / 1000:.0f}s - {chunk.end_ms / 1000:.0f}s transcribed, appended to {partial_path}")
+
+    print(f"Watching {audio_file} (window {window_ms / 1000:.0f}s, stops after {idle_seconds:.0f}s without growth, Ctrl+C to stop now)...")
+    last_size = None
+    last_growth = time.time()
+    try:
+        while True:
+            size = os.path.getsize(audio_file) if os.path.exists(audio_file) else None
+            if size != last_size:
+                last_size = size
+                last_growth = time.time()
+            elif size is not None and time.time() - last_growth >= idle_seconds:
+                print(f"{audio_file} has not grown for {idle_seconds:.0f}s, recording stopped.")
+                break
+
+            # Cut the next window at the quietest point around its target end, once that much is written
+            target_ms = start_ms + window_ms
+            if size is not None and is_audio_available(audio_file, target_ms + SEARCH_WINDOW_MS):
+                cut_ms = find_quietest_points(audio_file, [(target_ms - SEARCH_WINDOW_MS, target_ms + SEARCH_WINDOW_MS)])[0]
+                chunk = export_window(audio_file, chunks_dir, number + 1, start_ms, cut_ms, bitrate, extension, extra_args)
+                if chunk is not None:
+                    transcribe(chunk)
+                    start_ms = cut_ms
+                    continue  # More may already be written, check again without waiting
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("Stopped watching, transcribing the rest of the recording...")
+
+    # Tail: whatever was recorded after the last window, in windows of the same size
+    stop_time = time.time()
+    end_ms = find_recorded_end(audio_file, start_ms)
+    if end_ms - start_ms > PROBE_MS // 2:
+        tail_windows = plan_chunk_boundaries(audio_file, end_ms, math.ceil((end_ms - start_ms) / window_ms), window_ms + SEARCH_WINDOW_MS, start_ms=start_ms)
+        for window_start, window_end in tail_windows:
+            chunk = export_window(audio_file, chunks_dir, number + 1, window_start, window_end, bitrate, extension, extra_args)
+            if chunk is None:
+                raise RuntimeError(f"Could not read {window_start / 1000:.0f}s - {window_end / 1000:.0f}s of {audio_file}")
+            transcribe(chunk)
+    print(f"Tail transcribed {time.time() - stop_time:.2f} seconds after the recording stopped ({number} windows in total).")
+
+    write_segments(os.path.join(session_directory, SEGMENTS_FILE_NAME), segments)
+    os.replace(partial_path, transcript_path)
+    shutil.rmtree(chunks_dir)
+    return "\n\n".join(transcripts)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from api_scheduler import get_scheduler
+from context_retrieval import count_tokens
+from tracing import span
+from transcription_cache import load_cached_text, save_cached_text
+
+# Shared LLM call helpers for the OpenAI Responses API and the (DeepSeek)
+# Chat Completions API. Output files are always written through
+# "<file>.partial" and renamed into place once complete, so a finished file is
+# never half-written. With stream=True the text is appended to the .partial
+# file as it arrives: the first words show up within seconds, and if the
+# connection drops the .partial file keeps everything received so far.
+#
+# Complete answers are cached on disk, keyed by endpoint, model and a hash of
+# the full prompt, so re-running a stage with unchanged inputs costs nothing.
+# Entries are evicted least recently used first once the cache outgrows
+# MAX_CACHE_SIZE; pass cache=False to always send the request. Requests go
+# through api_scheduler.py (rate limits, retries); a stream holds its
+# concurrency slot until it is read to the end, and is only retried until it
+# starts, after that a failure keeps the .partial file.
+
+PARTIAL_SUFFIX = ".partial"
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache/llm")
+MAX_CACHE_SIZE = 50 * 1024 * 1024  # 50 MB
+
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_stats_lock = threading.Lock()
+
+
+def get_partial_path(output_path):
+    return f"{output_path}{PARTIAL_SUFFIX}"
+
+
+# Write prefix + text to output_path atomically
+def write_output_file(output_path, text, prefix=""):
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    partial_path = get_partial_path(output_path)
+    with open(partial_path, "w", encoding="utf-8") as file:
+        file.write(prefix + text)
+    os.replace(partial_path, output_path)
+
+
+# Consume text deltas, appending each to output_path's .partial file (and to
+# stdout with echo=True); the file is renamed into place when the stream ends
+def write_stream(deltas, output_path=None, prefix="", echo=False, start_time=None):
+    start_time = start_time or time.time()
+    first_output_time = None
+    parts = []
+    file = None
+    if output_path:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        file = open(get_partial_path(output_path), "w", encoding="utf-8")
+        file.write(prefix)
+    try:
+        for delta in deltas:
+            if not delta:
+                continue
+            if first_output_time is None:
+                first_output_time = time.time() - start_time
+            parts.append(delta)
+            if file:
+                file.write(delta)
+                file.flush()
+            if echo:
+                sys.stdout.write(delta)
+                sys.stdout.flush()
+    except BaseException:
+        if file:
+            file.close()
+            print(f"\nStream interrupted, partial output kept in {get_partial_path(output_path)}")
+        raise
+    if echo:
+        print()
+    if file:
+        file.close()
+        os.replace(get_partial_path(output_path), output_path)
+    if first_output_time is not None:
+        print(f"First output after {first_output_time:.2f} seconds.")
+    return "".join(parts)
+
+
+# Text of a Responses API response
+def get_output_text(response):
+    return "".join(item.text for output in response.output if output.type == "message" for item in output.content if item.type == "output_text")
+
+
+# {"input_tokens", "output_tokens"} of a Responses or Chat Completions usage object
+def get_usage(usage):
+    if usage is None:
+        return {}
+    input_tokens = getattr(usage, "input_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    return {
+        "input_tokens": input_tokens if input_tokens is not None else getattr(usage, "prompt_tokens", None),
+        "output_tokens": output_tokens if output_tokens is not None else getattr(usage, "completion_tokens", None),
+    }
+
+
+# Text deltas of a Responses API stream; the final usage is stored in `usage`
+def iter_response_deltas(events, usage=None):
+    for event in events:
+        if event.type == "response.output_text.delta":
+            yield event.delta
+        elif event.type == "response.completed" and usage is not None:
+            usage.update(get_usage(event.response.usage))
+        elif event.type in ("error", "response.failed"):
+            raise RuntimeError(f"Response stream failed: {getattr(event, 'message', None) or event.type}")
+
+
+def iter_chat_deltas(chunks, usage=None):
+    for chunk in chunks:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content
+        if getattr(chunk, "usage", None) and usage is not None:
+            usage.update(get_usage(chunk.usage))
+
+
+# Cache key of a request: the endpoint, model and full prompt decide the answer
+def get_response_cache_key(client, api, model, request):
+    key_data = {"base_url": str(client.base_url), "api": api, "model": model, "request": request}
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def count_cache_result(name):
+    with _cache_stats_lock:
+        _cache_stats[name] += 1
+
+
+# (hits, misses) of the response cache in this process
+def get_cache_stats():
+    with _cache_stats_lock:
+        return _cache_stats["hits"], _cache_stats["misses"]
+
+
+def print_cache_stats():
+    hits, misses = get_cache_stats()
+    if hits or misses:
+        print(f"LLM response cache: {hits} hit(s), {misses} miss(es) ({hits / (hits + misses):.0%} hit rate)")
+
+
+# Answer from the cache if present, else from send(current span); either way saved to output_path
+def get_cached_text(key, send, output_path, prefix, echo, cache, api, model, stream):
+    with span("llm", api=api, model=model, stream=stream, cached=False) as current:
+        if cache:
+            text = load_cached_text(key, CACHE_DIRECTORY)
+            if text is not None:
+                count_cache_result("hits")
+                current.set(cached=True)
+                print("Response loaded from LLM cache.")
+                if output_path:
+                    write_output_file(output_path, text, prefix)
+                if echo:
+                    print(text)
+                return text
+            count_cache_result("misses")
+
+        text = send(current)
+        if cache and text:
+            save_cached_text(key, text, CACHE_DIRECTORY, MAX_CACHE_SIZE)
+        return text
+
+
+def create_response_text(client, model, prompt, output_path=None, stream=False, prefix="", echo=False, cache=True):
+    """Send a Responses API request and return the output text, saving it to
+    output_path (after prefix) if given."""
+
+    def send(current):
+        start_time = time.time()
+        scheduler = get_scheduler(client)
+        if stream:
+            usage = {}
+            text = scheduler.call(
+                lambda: client.responses.create(model=model, input=prompt, stream=True),
+                count_tokens(prompt),
+                current,
+                consume=lambda events: write_stream(iter_response_deltas(events, usage), output_path, prefix, echo, start_time),
+            )
+            current.set(**usage)
+            return text
+
+        response = scheduler.call(lambda: client.responses.create(model=model, input=prompt, stream=False), count_tokens(prompt), current)
+        current.set(**get_usage(response.usage))
+        text = get_output_text(response)
+        if output_path:
+            write_output_file(output_path, text, prefix)
+        return text
+
+    key = get_response_cache_key(client, "responses", model, prompt)
+    return get_cached_text(key, send, output_path, prefix, echo, cache, "responses", model, stream)
+
+
+def create_chat_text(client, model, messages, output_path=None, stream=False, prefix="", echo=False, cache=True):
+    """Send a Chat Completions request and return the answer text, saving it to
+    output_path (after prefix) if given."""
+
+    def send(current):
+        start_time = time.time()
+        scheduler = get_scheduler(client)
+        prompt_tokens = count_tokens("".join(str(message.get("content", "")) for message in messages))
+        if stream:
+            usage = {}
+            text = scheduler.call(
+                lambda: client.chat.completions.create(model=model, messages=messages, stream=True, stream_options={"include_usage": True}),
+                prompt_tokens,
+                current,
+                consume=lambda chunks: write_stream(iter_chat_deltas(chunks, usage), output_path, prefix, echo, start_time),
+            )
+            current.set(**usage)
+            return text
+
+        completion = scheduler.call(lambda: client.chat.completions.create(model=model, messages=messages, stream=False), prompt_tokens, current)
+        current.set(**get_usage(completion.usage))
+        text = completion.choices[0].message.content
+        if output_path:
+            write_output_file(output_path, text, prefix)
+        return text
+
+    key = get_response_cache_key(client, "chat", model, messages)
+    return get_cached_text(key, send, output_path, prefix, echo, cache, "chat", model, stream)
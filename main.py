@@ -1,34 +1,15 @@
 import os
 import time
-import whisper
 from dotenv import load_dotenv
-from openai import OpenAI
-
-
-def get_session_number(file):
-    file_name = os.path.splitext(file)[0]
-    session_number = float(file_name.split(" ")[1].strip())
-    if session_number.is_integer():
-        session_number = int(session_number)
-    return session_number
-
-
-def get_markdown_file_paths(notes_directory):
-    files = {}
-    for file in os.listdir(notes_directory):
-        if file.lower().startswith("session") and file.endswith(".md"):
-            session_number = get_session_number(file)
-            files[session_number] = file
-    file_paths = [os.path.join(notes_directory, files[key]) for key in sorted(files.keys())]
-    return file_paths
-
-
-def get_text_from_file(file):
-    title = os.path.splitext(os.path.basename(file))[0]
-    content = f"# {title}\n\n"
-    with open(file, "r", encoding="utf-8") as f:
-        content += f.read()
-    return content
+from api_scheduler import print_scheduler_stats
+from job_store import JobStore, fingerprint_file, hash_inputs
+from live_transcription import watch_recording
+from llm import create_chat_text, print_cache_stats
+from segment_store import SEGMENTS_FILE_NAME, normalize_segments, write_segments
+from session_notes import load_session_notes, write_combined_sessions
+from tracing import span
+from whisper_daemon import transcribe as whisper_transcribe
+from whisper_pool import transcribe_parallel
 
 
 # Configuration
@@ -40,31 +21,20 @@ SESSION_NUMBER = "16"
 FILE_FORMAT = "m4a"
 AUDIO_FILE = f"C:/Users/LENOVO/Desktop/dnd/worlds/Finvora/assets/session {SESSION_NUMBER} audio.{FILE_FORMAT}"
 
-SESSION_NOTES_DIRECTORY = "C:/Users/LENOVO/Desktop/dnd/worlds/Finvora/Finvora/Sessions"
-SESSION_NOTES_FILES = get_markdown_file_paths(SESSION_NOTES_DIRECTORY)
-ALL_SESSION_NOTES = ""
-for notes_file in SESSION_NOTES_FILES:
-    ALL_SESSION_NOTES += get_text_from_file(notes_file) + f"\n\n{'='*40}\n\n"
-
-# save to file
-with open("combined_sessions.md", "w", encoding="utf-8") as file:
-    file.write(ALL_SESSION_NOTES.strip())
+SESSION_NOTES_DIRECTORY = os.getenv("SESSION_NOTES_DIRECTORY", "C:/Users/LENOVO/Desktop/dnd/worlds/Finvora/Finvora/Sessions")
 
 WHISPER_MODEL = "turbo"  # turbo for best results, small for faster results
+WHISPER_WORKERS = 1  # >1 transcribes windows of the recording on that many processes (CPU only), one model each
+WHISPER_THREADS = None  # torch threads per worker process (None: torch default); workers * threads <= cores
+WATCH_RECORDING = False  # Transcribe AUDIO_FILE while it is still being recorded (WAV, MP3, FLAC, OGG...), see live_transcription.py
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY is not set")
-
-BASE_DEEPSEEK_API_URL = "https://api.deepseek.com"
-DEEPSEEK_CLIENT = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=BASE_DEEPSEEK_API_URL)
+BASE_DEEPSEEK_API_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+DEEPSEEK_MODEL = "deepseek-reasoner"
+STREAM_RESPONSES = True  # Write summaries to disk as they are generated
+USE_LLM_CACHE = True  # Reuse cached answers for identical requests
 
-with open(os.path.join(CURRENT_DIRECTORY, "prompts/transcription.txt"), "r", encoding="utf-8") as file:
-    TRANSCRIPTION_PROMPT = file.read()
-with open(os.path.join(CURRENT_DIRECTORY, "prompts/summary.txt"), "r", encoding="utf-8") as file:
-    SUMMARY_PROMPT = file.read()
-with open(os.path.join(CURRENT_DIRECTORY, "prompts/markdown.txt"), "r", encoding="utf-8") as file:
-    MARKDOWN_PROMPT = file.read()
+PROMPTS_DIRECTORY = os.path.join(CURRENT_DIRECTORY, "prompts")
 
 SESSION_DIRECTORY = os.path.join(CURRENT_DIRECTORY, f"sessions/session_{SESSION_NUMBER}")
 
@@ -72,18 +42,61 @@ TRANSCRIPT_FILE_NAME = "transcript.txt"
 SUMMARY_FILE_NAME = "summary.txt"
 MARKDOWN_SUMMARY_FILE_NAME = "summary.md"
 
+# Loaded on first use, so importing this module (or a run that fails early) stays cheap
+_all_session_notes = None
+_deepseek_client = None
+_prompts = {}
+
+
+# Notes of every session, also saved to combined_sessions.md (skipped when unchanged)
+def get_all_session_notes():
+    global _all_session_notes
+    if _all_session_notes is None:
+        _all_session_notes = load_session_notes(SESSION_NOTES_DIRECTORY)
+        write_combined_sessions(_all_session_notes)
+    return _all_session_notes
+
+
+def get_deepseek_client():
+    global _deepseek_client
+    if _deepseek_client is None:
+        from openai import OpenAI
+
+        if not DEEPSEEK_API_KEY:
+            raise ValueError("DEEPSEEK_API_KEY is not set")
+        _deepseek_client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=BASE_DEEPSEEK_API_URL, max_retries=0)  # Retries: api_scheduler.py
+    return _deepseek_client
+
+
+# Prompt file prompts/<name>.txt, read once per process
+def get_prompt(name):
+    if name not in _prompts:
+        with open(os.path.join(PROMPTS_DIRECTORY, f"{name}.txt"), "r", encoding="utf-8") as file:
+            _prompts[name] = file.read()
+    return _prompts[name]
 
-# Transcribe audio using Whisper
+
+# Transcribe audio using Whisper (on the warm whisper_daemon.py worker if one is running)
 def transcribe_audio():
     print("Transcribing audio...")
-    model = whisper.load_model(WHISPER_MODEL)
 
     start_time = time.time()
-    result = model.transcribe(
-        audio=AUDIO_FILE,
-        verbose=True,
-        initial_prompt=TRANSCRIPTION_PROMPT,
-    )
+    if WHISPER_WORKERS > 1:
+        result = transcribe_parallel(
+            AUDIO_FILE,
+            WHISPER_MODEL,
+            WHISPER_WORKERS,
+            WHISPER_THREADS,
+            initial_prompt=get_prompt("transcription"),
+            fp16=False,
+        )
+    else:
+        result = whisper_transcribe(
+            AUDIO_FILE,
+            WHISPER_MODEL,
+            verbose=True,
+            initial_prompt=get_prompt("transcription"),
+        )
     end_time = time.time()
     print(f"Transcription completed in { end_time - start_time:.2f} seconds.")
 
@@ -92,32 +105,45 @@ def transcribe_audio():
     with open(transcript_path, "w", encoding="utf-8") as file:
         file.write(result["text"])
 
+    # Timestamped segments for range lookups (python segment_store.py ... --from 90m --to 120m)
+    write_segments(os.path.join(SESSION_DIRECTORY, SEGMENTS_FILE_NAME), normalize_segments(result["segments"]))
+
     return result["text"]
 
 
+# Transcribe AUDIO_FILE window by window while it is being recorded, until it stops growing
+def watch_audio():
+    print("Transcribing the recording as it is written...")
+
+    def transcribe_window(number, chunk):
+        result = whisper_transcribe(chunk.path, WHISPER_MODEL, initial_prompt=get_prompt("transcription"))
+        os.remove(chunk.path)
+        return result["text"].strip(), normalize_segments(result["segments"], chunk.start_ms / 1000)
+
+    # 16 kHz mono WAV is what Whisper resamples to anyway, so the windows lose nothing
+    return watch_recording(AUDIO_FILE, SESSION_DIRECTORY, transcribe_window, extension="wav", extra_args=("-ac", "1", "-ar", "16000"))
+
+
 # Summarize the transcript
 def summarize_text(text_transcript):
     print("Summarizing text...")
 
     start_time = time.time()
-    response = DEEPSEEK_CLIENT.chat.completions.create(
-        model="deepseek-reasoner",
-        messages=[
+    summarized_text = create_chat_text(
+        get_deepseek_client(),
+        DEEPSEEK_MODEL,
+        [
             {
                 "role": "user",
-                "content": f"{SUMMARY_PROMPT}\n\nFor context, here are notes from all previous sessions in chronological order:\n{ALL_SESSION_NOTES}\n\nHere is the session transcript to summarize:\n{text_transcript}",
+                "content": f"{get_prompt('summary')}\n\nFor context, here are notes from all previous sessions in chronological order:\n{get_all_session_notes()}\n\nHere is the session transcript to summarize:\n{text_transcript}",
             },
         ],
-        stream=False,
+        output_path=os.path.join(SESSION_DIRECTORY, SUMMARY_FILE_NAME),
+        stream=STREAM_RESPONSES,
+        cache=USE_LLM_CACHE,
     )
-    summarized_text = response.choices[0].message.content
     end_time = time.time()
     print(f"Summarization completed in { end_time - start_time:.2f} seconds.")
-
-    os.makedirs(SESSION_DIRECTORY, exist_ok=True)
-    summarized_path = os.path.join(SESSION_DIRECTORY, SUMMARY_FILE_NAME)
-    with open(summarized_path, "w", encoding="utf-8") as file:
-        file.write(summarized_text)
     return summarized_text
 
 
@@ -126,42 +152,81 @@ def generate_markdown_summary(text):
     print("Generating Markdown text...")
 
     start_time = time.time()
-    response = DEEPSEEK_CLIENT.chat.completions.create(
-        model="deepseek-reasoner",
-        messages=[
+    markdown_text = create_chat_text(
+        get_deepseek_client(),
+        DEEPSEEK_MODEL,
+        [
             {
                 "role": "user",
-                "content": f"{MARKDOWN_PROMPT}\n\nFor context, here are notes from all previous sessions in chronological order:\n{ALL_SESSION_NOTES}\n\nHere is the session summary to format in Markdown:\n{text}",
+                "content": f"{get_prompt('markdown')}\n\nFor context, here are notes from all previous sessions in chronological order:\n{get_all_session_notes()}\n\nHere is the session summary to format in Markdown:\n{text}",
             },
         ],
-        stream=False,
+        output_path=os.path.join(SESSION_DIRECTORY, MARKDOWN_SUMMARY_FILE_NAME),
+        stream=STREAM_RESPONSES,
+        cache=USE_LLM_CACHE,
     )
-    markdown_text = response.choices[0].message.content
     end_time = time.time()
     print(f"Markdown generation completed in { end_time - start_time:.2f} seconds.")
-
-    os.makedirs(SESSION_DIRECTORY, exist_ok=True)
-    markdown_path = os.path.join(SESSION_DIRECTORY, MARKDOWN_SUMMARY_FILE_NAME)
-    with open(markdown_path, "w", encoding="utf-8") as file:
-        file.write(markdown_text)
     return markdown_text
 
 
-# Main pipeline
-def main():
-    transcript = None
-    transcript_path = os.path.join(SESSION_DIRECTORY, TRANSCRIPT_FILE_NAME)
-    if os.path.exists(transcript_path):
-        with open(transcript_path, "r", encoding="utf-8") as file:
-            transcript = file.read()
-    if not transcript:
-        transcript = transcribe_audio()
+# Input hash of the transcript stage (see job_store.py): the recording, model and prompt
+def get_transcript_hash():
+    return hash_inputs("transcript", fingerprint_file(AUDIO_FILE), WHISPER_MODEL, get_prompt("transcription"))
+
 
-    summary = summarize_text(transcript)
-    markdown_summary = generate_markdown_summary(summary)
+# Main pipeline, resuming at the first stage that is not current (stages checkpointed in SESSION_DIRECTORY/jobs.db)
+def main():
+    with JobStore(SESSION_DIRECTORY, AUDIO_FILE, pipeline="main") as job_store:
+        transcript = None
+        transcript_path = os.path.join(SESSION_DIRECTORY, TRANSCRIPT_FILE_NAME)
+        if os.path.exists(transcript_path):
+            with open(transcript_path, "r", encoding="utf-8") as file:
+                transcript = file.read()
+
+        # Keep the transcript unless the recording, model or prompt changed since it was made
+        stage = job_store.get_stage("transcript")
+        if transcript and os.path.exists(AUDIO_FILE):
+            if stage is None:
+                job_store.finish("transcript", get_transcript_hash(), {"path": TRANSCRIPT_FILE_NAME})  # Made before the job store existed
+            elif stage["status"] != "done" or stage["input_hash"] != get_transcript_hash():
+                print("The transcript is out of date or its last run did not finish, transcribing again.")
+                transcript = None
+
+        if not transcript:
+
+            def transcribe():
+                nonlocal transcript
+                if WATCH_RECORDING:
+                    with span("transcribe", session=SESSION_NUMBER, model=WHISPER_MODEL, watch=True):
+                        transcript = watch_audio()
+                else:
+                    with span("transcribe", session=SESSION_NUMBER, model=WHISPER_MODEL, workers=WHISPER_WORKERS):
+                        transcript = transcribe_audio()
+                return {"path": TRANSCRIPT_FILE_NAME}
+
+            job_store.run_stage("transcript", get_transcript_hash(), transcribe, reuse=False)
+            if WATCH_RECORDING:
+                job_store.finish("transcript", get_transcript_hash(), {"path": TRANSCRIPT_FILE_NAME})  # Hash of the finished recording
+
+        def summarize():
+            with span("summarize", session=SESSION_NUMBER):
+                summarize_text(transcript)
+
+        summary_hash = hash_inputs("summarize", transcript, get_prompt("summary"), DEEPSEEK_MODEL, get_all_session_notes())
+        summary = job_store.run_file_stage("summarize", summary_hash, os.path.join(SESSION_DIRECTORY, SUMMARY_FILE_NAME), summarize)
+
+        def format_markdown():
+            with span("markdown", session=SESSION_NUMBER):
+                generate_markdown_summary(summary)
+
+        markdown_hash = hash_inputs("markdown", summary, get_prompt("markdown"), DEEPSEEK_MODEL, get_all_session_notes())
+        job_store.run_file_stage("markdown", markdown_hash, os.path.join(SESSION_DIRECTORY, MARKDOWN_SUMMARY_FILE_NAME), format_markdown)
 
     markdown_summary_path = os.path.join(SESSION_DIRECTORY, MARKDOWN_SUMMARY_FILE_NAME)
     print(f"Summary for Session {SESSION_NUMBER} saved to {markdown_summary_path}")
+    print_cache_stats()
+    print_scheduler_stats()
 
 
 if __name__ == "__main__":
@@ -1,36 +1,27 @@
+import argparse
+import glob
+import json
+import math
 import os
+import re
 import shutil
-import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from openai import OpenAI
-from pydub import AudioSegment
-
-
-def get_session_number(file):
-    file_name = os.path.splitext(file)[0]
-    session_number = float(file_name.split(" ")[1].strip())
-    if session_number.is_integer():
-        session_number = int(session_number)
-    return session_number
-
-
-def get_markdown_file_paths(notes_directory):
-    files = {}
-    for file in os.listdir(notes_directory):
-        if file.lower().startswith("session") and file.endswith(".md"):
-            session_number = get_session_number(file)
-            files[session_number] = file
-    file_paths = [os.path.join(notes_directory, files[key]) for key in sorted(files.keys())]
-    return file_paths
-
-
-def get_text_from_file(file):
-    title = os.path.splitext(os.path.basename(file))[0]
-    content = f"# {title}\n\n"
-    with open(file, "r", encoding="utf-8") as f:
-        content += f.read()
-    return content
+from api_scheduler import get_scheduler, print_scheduler_stats
+from audio_chunker import get_audio_duration, iter_audio_chunks
+from chunk_planner import MP3_CONTAINER_OVERHEAD, estimate_encoded_size, get_max_chunk_duration, plan_chunk_boundaries, plan_chunk_count
+from context_retrieval import ContextIndex, count_tokens, format_context, print_selection
+from job_store import JobStore, fingerprint_file, hash_inputs
+from live_transcription import watch_recording
+from llm import create_response_text, print_cache_stats
+from pipeline import run_pipeline
+from segment_store import SEGMENTS_FILE_NAME, normalize_segments, write_segments
+from session_notes import get_session_texts, get_vault_texts
+from tracing import enable_tracing, span
+from transcription_cache import get_cache_key, load_cached_text, save_cached_text
+from voice_activity import MIN_SILENCE_MS, NOISE_FLOOR_PERCENTILE, PADDING_MS, SPEECH_MAP_FILE_NAME, VAD_MARGIN_DB, SpeechMap, detect_speech, plan_condensed_boundaries
 
 
 # Configuration
@@ -38,126 +29,318 @@ load_dotenv()
 
 CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 
-SESSION_NOTES_DIRECTORY = "C:/Users/LENOVO/Desktop/dnd/worlds/Finvora/Finvora/Sessions"
+SESSION_NOTES_DIRECTORY = os.getenv("SESSION_NOTES_DIRECTORY", "C:/Users/LENOVO/Desktop/dnd/worlds/Finvora/Finvora/Sessions")
+VAULT_DIRECTORY = os.path.dirname(SESSION_NOTES_DIRECTORY)  # Other notes (NPCs, places...) searched for context
+CONTEXT_TOKEN_BUDGET = 30000  # Tokens of notes sent along with each summary prompt
 
-# OpenAI configuration
+# OpenAI configuration (the client is created on first use, see get_openai_client)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set")
 
 OPENAI_TRANSCRIPTION_MODEL = "whisper-1"
-OPENAI_CLIENT = OpenAI(api_key=OPENAI_API_KEY)
+SEGMENT_TIMESTAMP_MODELS = ("whisper-1",)  # Models that return segment timestamps (verbose_json)
+TRANSCRIPTION_LANGUAGE = "pt"  # Portuguese as primary language
 
 SUMMARY_MODEL = "gpt-5-mini"
+USE_LLM_CACHE = True  # Reuse cached answers for identical summary requests (--no-llm-cache to disable)
 
-with open(os.path.join(CURRENT_DIRECTORY, "prompts/transcription.txt"), "r", encoding="utf-8") as file:
-    TRANSCRIPTION_PROMPT = file.read()
-with open(os.path.join(CURRENT_DIRECTORY, "prompts/summary.txt"), "r", encoding="utf-8") as file:
-    SUMMARY_PROMPT = file.read()
-with open(os.path.join(CURRENT_DIRECTORY, "prompts/markdown.txt"), "r", encoding="utf-8") as file:
-    MARKDOWN_PROMPT = file.read()
+PROMPTS_DIRECTORY = os.path.join(CURRENT_DIRECTORY, "prompts")
+SESSIONS_DIRECTORY = os.path.join(CURRENT_DIRECTORY, "sessions")
 
 TRANSCRIPT_FILE_NAME = "transcript.txt"
 SUMMARY_FILE_NAME = "summary.txt"
 MARKDOWN_SUMMARY_FILE_NAME = "summary.md"
+SUMMARY_PARTS_FILE_NAME = "summary_parts.txt"
 
-SESSION_DIRECTORY = ""  # Will be set based on audio file path
-ALL_SESSION_NOTES = ""  # Will be loaded from session notes directory
+AUDIO_FILE_EXTENSIONS = (".m4a", ".mp3", ".wav", ".ogg", ".flac", ".aac", ".webm", ".mp4")
 
 # OpenAI API limits
 OPENAI_MAX_FILE_SIZE = 25 * 1024 * 1024  # 25 MB in bytes
 CHUNK_BITRATE = "48k"  # MP3 bitrate for audio chunks
+REMOVE_SILENCE = False  # Cut long quiet stretches before encoding chunks (--remove-silence), see voice_activity.py
 
+# Map-reduce summarization (--summary-mode map-reduce)
+SUMMARY_MODES = ("single", "map-reduce")
+SUMMARY_PIECE_TOKENS = 12000  # Most transcript tokens per map piece
+SUMMARY_MAP_WORKERS = 8  # Pieces summarized concurrently
 
-# Split audio file into chunks if it exceeds the size limit
-def split_audio_into_chunks(audio_file):
-    """Split audio files into chunks under 25MB."""
-    file_size = os.path.getsize(audio_file)
+# Per-chunk transcription cache, evicted least recently used first
+TRANSCRIPTION_CACHE_DIRECTORY = os.path.join(CURRENT_DIRECTORY, ".cache/transcriptions")
+TRANSCRIPTION_CACHE_MAX_SIZE = 100 * 1024 * 1024  # 100 MB
 
-    print(f"Audio file size ({file_size / (1024*1024):.2f} MB). Processing into chunks...")
+_openai_client = None
+_openai_client_lock = threading.Lock()
+_prompts = {}
 
-    # Load audio file
-    audio = AudioSegment.from_file(audio_file)
-    audio_duration = len(audio)  # Duration in milliseconds
 
-    # Create chunks directory
-    chunks_dir = os.path.join(SESSION_DIRECTORY, "chunks")
-    os.makedirs(chunks_dir, exist_ok=True)
+# OpenAI client, created on first use: importing the SDK takes longer than a cached run,
+# so --help and runs that reuse an existing transcript never pay for it
+def get_openai_client():
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            from openai import OpenAI
 
-    # Export a test chunk to estimate final compressed size
-    print("Calculating optimal chunk count based on compressed size...")
-    test_chunk = audio[:60000]  # First 60 seconds
-    test_file = os.path.join(chunks_dir, "test_chunk.mp3")
-    test_chunk.export(test_file, format="mp3", bitrate=CHUNK_BITRATE)
-    test_size = os.path.getsize(test_file)
-    os.remove(test_file)
+            if not OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY is not set")
+            _openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)  # Retries and rate limits: api_scheduler.py
+        return _openai_client
 
-    # Estimate full audio size after compression
-    estimated_full_size = (test_size / 60000) * audio_duration
 
-    # Calculate number of chunks needed (with safety margin)
-    num_chunks = int((estimated_full_size / OPENAI_MAX_FILE_SIZE) * 1.2) + 1
-    chunk_duration = audio_duration // num_chunks
+# Prompt file prompts/<name>.txt, read once per process
+def get_prompt(name):
+    if name not in _prompts:
+        with open(os.path.join(PROMPTS_DIRECTORY, f"{name}.txt"), "r", encoding="utf-8") as file:
+            _prompts[name] = file.read()
+    return _prompts[name]
 
-    print(f"Splitting into {num_chunks} chunks...")
 
-    # Split and save chunks
-    chunk_files = []
-    for i in range(num_chunks):
-        start_time = i * chunk_duration
-        end_time = (i + 1) * chunk_duration if i < num_chunks - 1 else audio_duration
+# Chunk windows over [start_ms, end_ms) under the size limit, each boundary moved to the
+# nearest pause, or with a speech_map to the nearest removed silence (condensed timeline)
+def plan_windows(audio_file, end_ms, chunk_count, speech_map=None, start_ms=0):
+    max_chunk_duration = get_max_chunk_duration(CHUNK_BITRATE, OPENAI_MAX_FILE_SIZE)
+    if speech_map is None:
+        return plan_chunk_boundaries(audio_file, end_ms, chunk_count, max_chunk_duration, start_ms=start_ms)
+    return plan_condensed_boundaries(speech_map, end_ms, chunk_count, max_chunk_duration, start_ms=start_ms)
 
-        chunk = audio[start_time:end_time]
-        chunk_file = os.path.join(chunks_dir, f"chunk_{i+1}.mp3")
-        chunk.export(chunk_file, format="mp3", bitrate=CHUNK_BITRATE)
-        chunk_files.append(chunk_file)
 
-        chunk_size = os.path.getsize(chunk_file)
-        print(f"  Chunk {i+1}/{num_chunks}: {chunk_size / (1024*1024):.2f} MB")
+# Plan the chunks of a recording of audio_duration ms (condensed with a speech_map)
+def plan_audio_chunks(audio_file, audio_duration, speech_map=None):
+    print(f"Audio file size ({os.path.getsize(audio_file) / (1024*1024):.2f} MB). Processing into chunks...")
 
-    return chunk_files
+    # Plan chunk count from the constant bitrate; no test encode needed
+    num_chunks = plan_chunk_count(audio_duration, CHUNK_BITRATE, OPENAI_MAX_FILE_SIZE)
+    boundaries = plan_windows(audio_file, audio_duration, num_chunks, speech_map)
+    planned_size = max(estimate_encoded_size(end_ms - start_ms, CHUNK_BITRATE) for start_ms, end_ms in boundaries)
+    print(f"Planned {len(boundaries)} chunks at {CHUNK_BITRATE} (largest ~{planned_size / (1024*1024):.2f} MB)")
+    return boundaries
 
 
-# Transcribe audio using OpenAI API
-def transcribe_audio(audio_file):
-    print("Transcribing audio using OpenAI API...")
-
-    if not os.path.exists(audio_file):
-        raise FileNotFoundError(f"Audio file not found: {audio_file}")
-
-    # Split audio if needed
-    chunk_files = split_audio_into_chunks(audio_file)
-
-    # Transcribe each chunk
-    all_transcripts = []
-    for i, chunk_file in enumerate(chunk_files, 1):
-        print(f"Transcribing chunk {i}/{len(chunk_files)}...")
+# Split audio file into chunks if it exceeds the size limit
+def split_audio_into_chunks(audio_file, session_directory, speech_map=None, boundaries=None, skip_window=None):
+    """Split audio files into chunks under 25MB, yielding each AudioChunk as soon as it is encoded.
+
+    With a speech_map only its speech spans are encoded, and chunk times are on its condensed timeline.
+    boundaries reuses an earlier plan; windows for which skip_window(start_ms, end_ms) is true are
+    yielded without encoding, with path None."""
+    # Read the duration from the container; audio is only decoded window by window
+    if boundaries is None:
+        audio_duration = get_audio_duration(audio_file) if speech_map is None else speech_map.condensed_ms  # Duration in milliseconds
+        boundaries = plan_audio_chunks(audio_file, audio_duration, speech_map)
+
+    # Create chunks directory, dropping leftovers from an interrupted run
+    chunks_dir = os.path.join(session_directory, "chunks")
+    if os.path.exists(chunks_dir):
+        shutil.rmtree(chunks_dir)
+    os.makedirs(chunks_dir, exist_ok=True)
 
-        with open(chunk_file, "rb") as file:
-            start_time = time.time()
-            response = OPENAI_CLIENT.audio.transcriptions.create(
+    # Re-split any chunk that still comes out over the limit, re-encoding only that window
+    def split_window(start_ms, end_ms):
+        print(f"  Chunk {start_ms / 1000:.1f}s - {end_ms / 1000:.1f}s exceeded the size limit, splitting it in two...")
+        return plan_windows(audio_file, end_ms, 2, speech_map, start_ms=start_ms)
+
+    # Encode chunks one window at a time
+    chunk_sizes = []
+    chunks = iter_audio_chunks(
+        audio_file,
+        chunks_dir,
+        boundaries,
+        bitrate=CHUNK_BITRATE,
+        max_size=OPENAI_MAX_FILE_SIZE,
+        split_window=split_window,
+        speech_map=speech_map,
+        skip_window=skip_window,
+    )
+    for i, chunk in enumerate(chunks, 1):
+        if chunk.path is None:
+            print(f"  Chunk {i}: {chunk.start_ms / 1000:.1f}s - {chunk.end_ms / 1000:.1f}s, already transcribed")
+            yield chunk
+            continue
+        chunk_size = os.path.getsize(chunk.path)
+        chunk_sizes.append(chunk_size)
+        print(f"  Chunk {i}: {chunk.start_ms / 1000:.1f}s - {chunk.end_ms / 1000:.1f}s, {chunk_size / (1024*1024):.2f} MB")
+        yield chunk
+
+    largest = f"largest {max(chunk_sizes) / (1024*1024):.2f} MB" if chunk_sizes else "none left to encode"
+    print(f"Planned {len(boundaries)} chunks, produced {len(chunk_sizes)} ({largest})")
+
+
+# Transcribe a single chunk using OpenAI API, reusing a cached transcript when available.
+# Returns (text, segments in recording time, seconds, cached)
+def transcribe_chunk(chunk_number, chunk):
+    # Only whisper-1 returns segment timestamps; other models get one segment per chunk
+    response_format = "verbose_json" if OPENAI_TRANSCRIPTION_MODEL in SEGMENT_TIMESTAMP_MODELS else "text"
+    offset_seconds = chunk.start_ms / 1000
+    chunk_segment = [{"start": 0.0, "end": (chunk.end_ms - chunk.start_ms) / 1000, "text": ""}]
+
+    cache_key = get_cache_key(chunk.path, OPENAI_TRANSCRIPTION_MODEL, get_prompt("transcription"), TRANSCRIPTION_LANGUAGE, response_format)
+    cached_transcript = load_cached_text(cache_key, TRANSCRIPTION_CACHE_DIRECTORY)
+    if cached_transcript is not None:
+        print(f"Chunk {chunk_number} loaded from transcription cache.")
+        os.remove(chunk.path)
+        if response_format == "verbose_json":
+            cached = json.loads(cached_transcript)
+            return cached["text"], normalize_segments(cached["segments"], offset_seconds), 0.0, True
+        chunk_segment[0]["text"] = cached_transcript
+        return cached_transcript, normalize_segments(chunk_segment, offset_seconds), 0.0, True
+
+    print(f"Transcribing chunk {chunk_number}...")
+
+    # The file is reopened for every attempt, so a retried upload sends the whole chunk again
+    client = get_openai_client()
+
+    def send():
+        with open(chunk.path, "rb") as file:
+            return client.audio.transcriptions.create(
                 model=OPENAI_TRANSCRIPTION_MODEL,
                 file=file,
-                prompt=TRANSCRIPTION_PROMPT,
-                language="pt",  # Portuguese as primary language
-                response_format="text",
+                prompt=get_prompt("transcription"),
+                language=TRANSCRIPTION_LANGUAGE,
+                response_format=response_format,
                 temperature=0,  # Deterministic output
             )
-            end_time = time.time()
 
-        transcript_text = response
-        all_transcripts.append(transcript_text)
-        print(f"Chunk {i} transcription completed in {end_time - start_time:.2f} seconds.")
+    chunk_size = os.path.getsize(chunk.path)
+    with span("upload", chunk=chunk_number, start_ms=chunk.start_ms, bytes=chunk_size, model=OPENAI_TRANSCRIPTION_MODEL) as current:
+        start_time = time.time()
+        response = get_scheduler(client).call(send, trace_span=current)
+        end_time = time.time()
+        current.set(audio_seconds=getattr(response, "duration", None))
+
+    if response_format == "verbose_json":
+        transcript = response.text
+        segments = normalize_segments(response.segments or [])
+        cache_value = json.dumps({"text": transcript, "segments": segments}, ensure_ascii=False)
+    else:
+        transcript = response
+        chunk_segment[0]["text"] = transcript
+        segments = normalize_segments(chunk_segment)
+        cache_value = transcript
+
+    save_cached_text(cache_key, cache_value, TRANSCRIPTION_CACHE_DIRECTORY, TRANSCRIPTION_CACHE_MAX_SIZE)
+    os.remove(chunk.path)  # Uploaded chunks are not needed anymore, keep disk use flat
+    print(f"Chunk {chunk_number} transcription completed in {end_time - start_time:.2f} seconds.")
+    return transcript, normalize_segments(segments, offset_seconds), end_time - start_time, False
+
+
+# Find the speech in a recording and report what cutting the rest saves; the map is saved with the session
+def plan_silence_removal(audio_file, session_directory):
+    start_time = time.time()
+    speech_map = detect_speech(audio_file, get_audio_duration(audio_file))
+    removed_bytes = max(0, estimate_encoded_size(speech_map.removed_ms, CHUNK_BITRATE) - MP3_CONTAINER_OVERHEAD)
+    print(
+        f"Silence removal: {speech_map.removed_ms / 1000:.0f} of {speech_map.duration_ms / 1000:.0f} seconds cut "
+        f"({speech_map.removed_ms / max(1, speech_map.duration_ms):.0%}, ~{removed_bytes / (1024*1024):.2f} MB less to upload at {CHUNK_BITRATE}), "
+        f"{len(speech_map.spans)} speech spans kept, analysed in {time.time() - start_time:.2f} seconds"
+    )
+    os.makedirs(session_directory, exist_ok=True)
+    speech_map.save(os.path.join(session_directory, SPEECH_MAP_FILE_NAME))
+    return speech_map
+
+
+# Input hashes of the transcription stages of a recording (see job_store.py); each includes the one before it
+def get_transcription_hashes(audio_file, remove_silence):
+    vad_settings = [VAD_MARGIN_DB, NOISE_FLOOR_PERCENTILE, MIN_SILENCE_MS, PADDING_MS] if remove_silence else None
+    decode_hash = hash_inputs("decode", fingerprint_file(audio_file), vad_settings)
+    chunk_hash = hash_inputs("chunk", decode_hash, CHUNK_BITRATE, OPENAI_MAX_FILE_SIZE)
+    transcribe_hash = hash_inputs("transcribe", chunk_hash, OPENAI_TRANSCRIPTION_MODEL, get_prompt("transcription"), TRANSCRIPTION_LANGUAGE)
+    return {"decode": decode_hash, "chunk": chunk_hash, "transcribe": transcribe_hash, "transcript": hash_inputs("transcript", transcribe_hash)}
+
+
+# Transcribe audio using OpenAI API, checkpointing every stage in the session's job store
+def transcribe_audio(audio_file, session_directory, jobs=1, remove_silence=None, job_store=None):
+    print("Transcribing audio using OpenAI API...")
+
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"Audio file not found: {audio_file}")
+    if jobs < 1:
+        raise ValueError(f"Number of transcription jobs must be at least 1, got {jobs}")
+
+    remove_silence = REMOVE_SILENCE if remove_silence is None else remove_silence
+    job_store = job_store or JobStore(session_directory, audio_file, pipeline="main_openai")
+    hashes = get_transcription_hashes(audio_file, remove_silence)
+    transcript = None
+
+    def transcribe():
+        nonlocal transcript
+        transcript, chunk_count = transcribe_stages(audio_file, session_directory, jobs, remove_silence, job_store, hashes)
+        return {"path": TRANSCRIPT_FILE_NAME, "chunks": chunk_count}
+
+    job_store.run_stage("transcript", hashes["transcript"], transcribe, reuse=False)
+    return transcript
+
+
+# Decode, chunk and transcribe stages of transcribe_audio; each one is skipped when
+# the job store holds its output for the same inputs. Returns (transcript, chunk count)
+def transcribe_stages(audio_file, session_directory, jobs, remove_silence, job_store, hashes):
+    # Optionally cut long silences first; chunk and segment times are then on the condensed timeline
+    def decode():
+        if not remove_silence:
+            return {"duration_ms": get_audio_duration(audio_file), "speech_spans": None}
+        speech_map = plan_silence_removal(audio_file, session_directory)
+        return {"duration_ms": speech_map.duration_ms, "speech_spans": speech_map.spans}
+
+    decoded, reused = job_store.run_stage("decode", hashes["decode"], decode)
+    speech_map = None if decoded["speech_spans"] is None else SpeechMap(decoded["speech_spans"], decoded["duration_ms"])
+    speech_map_path = os.path.join(session_directory, SPEECH_MAP_FILE_NAME)
+    if speech_map is not None and reused:
+        print(f"Silence removal: reusing the speech map of the last run ({speech_map.removed_ms / 1000:.0f} seconds cut)")
+        speech_map.save(speech_map_path)
+    elif speech_map is None and os.path.exists(speech_map_path):
+        os.remove(speech_map_path)  # Left by an earlier run with silence removal, no longer true
+
+    audio_duration = decoded["duration_ms"] if speech_map is None else speech_map.condensed_ms
+    boundaries, reused = job_store.run_stage("chunk", hashes["chunk"], lambda: plan_audio_chunks(audio_file, audio_duration, speech_map))
+    boundaries = [tuple(window) for window in boundaries]
+    if reused:
+        print(f"Reusing the plan of {len(boundaries)} chunks from the last run")
+    else:
+        job_store.clear_stages("transcribe:")  # Chunks of an older plan
+
+    # Every chunk is a stage of its own: after a crash only unfinished chunks are encoded and uploaded again
+    def chunk_stage(start_ms, end_ms):
+        return f"transcribe:{start_ms}-{end_ms}"
+
+    def is_transcribed(start_ms, end_ms):
+        return job_store.get_output(chunk_stage(start_ms, end_ms), hashes["transcribe"]) is not None
+
+    def transcribe_checkpointed(chunk_number, chunk):
+        def transcribe():
+            text, segments, elapsed, cached = transcribe_chunk(chunk_number, chunk)
+            return {"text": text, "segments": segments, "seconds": elapsed, "cached": cached}
+
+        output, reused = job_store.run_stage(chunk_stage(chunk.start_ms, chunk.end_ms), hashes["transcribe"], transcribe)
+        if reused:
+            print(f"Chunk {chunk_number} loaded from the job store.")
+        return output["text"], output["segments"], 0.0 if reused else output["seconds"], reused or output["cached"]
+
+    # Encode and upload in parallel: chunk k is transcribed while chunk k+1 is encoding,
+    # with at most `jobs` encoded chunks waiting on disk
+    chunks = split_audio_into_chunks(audio_file, session_directory, speech_map=speech_map, boundaries=boundaries, skip_window=is_transcribed)
+    results, stats = run_pipeline(chunks, transcribe_checkpointed, workers=jobs, queue_size=jobs)
+    total_chunks = len(results)
+
+    all_transcripts = [transcript_text for transcript_text, _, _, _ in results]
+    chunk_seconds = sum(elapsed for _, _, elapsed, _ in results)
+    cached_chunks = sum(1 for _, _, _, cached in results if cached)
+    print(
+        f"Transcribed {total_chunks} chunks ({cached_chunks} from cache or the job store) with {jobs} job(s) in {stats.wall_seconds:.2f} seconds "
+        f"(sum of chunk times: {chunk_seconds:.2f} seconds)."
+    )
+    print(
+        f"Pipeline utilization: encode {stats.produce_utilization:.0%} busy ({stats.produce_blocked:.1f}s waiting on uploads), "
+        f"upload {stats.consume_utilization:.0%} busy across {jobs} job(s) ({stats.consume_idle:.1f}s waiting on encoding). "
+        f"Bottleneck: {'encode' if stats.bottleneck == 'produce' else 'upload'}."
+    )
 
     # Combine all transcripts
     combined_transcript = "\n\n".join(all_transcripts)
-    print(f"All transcriptions completed. Total chunks: {len(chunk_files)}")
+    print(f"All transcriptions completed. Total chunks: {total_chunks}")
 
-    os.makedirs(SESSION_DIRECTORY, exist_ok=True)
+    os.makedirs(session_directory, exist_ok=True)
 
     # Save individual chunk transcripts if multiple chunks
-    if len(chunk_files) > 1:
-        segments_path = os.path.join(SESSION_DIRECTORY, "transcript_segments.txt")
+    if total_chunks > 1:
+        segments_path = os.path.join(session_directory, "transcript_segments.txt")
         with open(segments_path, "w", encoding="utf-8") as file:
             for i, transcript in enumerate(all_transcripts, 1):
                 file.write(f"=== Chunk {i} ===\n\n")
@@ -165,118 +348,431 @@ def transcribe_audio(audio_file):
                 file.write("\n\n")
         print(f"Individual chunk transcripts saved to {segments_path}")
 
+    # Save timestamped segments, in original recording time across chunks (mapped back over removed silences)
+    segments_store_path = os.path.join(session_directory, SEGMENTS_FILE_NAME)
+    all_segments = [segment for _, segments, _, _ in results for segment in segments]
+    if speech_map is not None:
+        all_segments = speech_map.remap_segments(all_segments)
+    write_segments(segments_store_path, all_segments)
+    print(f"Timestamped segments saved to {segments_store_path}")
+
     # Save combined transcript
-    transcript_path = os.path.join(SESSION_DIRECTORY, TRANSCRIPT_FILE_NAME)
+    transcript_path = os.path.join(session_directory, TRANSCRIPT_FILE_NAME)
     with open(transcript_path, "w", encoding="utf-8") as file:
         file.write(combined_transcript)
 
     # Clean up temporary chunks directory
-    chunks_dir = os.path.join(SESSION_DIRECTORY, "chunks")
+    chunks_dir = os.path.join(session_directory, "chunks")
     if os.path.exists(chunks_dir):
         shutil.rmtree(chunks_dir)
         print(f"Cleaned up temporary chunks directory")
 
-    return combined_transcript
+    return combined_transcript, total_chunks
+
+
+# Transcribe a recording while it is still being written (--watch), window by window, see live_transcription.py
+def watch_audio(audio_file, session_directory, job_store=None):
+    print("Transcribing the recording as it is written using OpenAI API...")
+
+    def transcribe_window(number, chunk):
+        text, segments, _, _ = transcribe_chunk(number, chunk)
+        return text, segments
+
+    # The recording's input hash is only known once it stops growing
+    job_store = job_store or JobStore(session_directory, audio_file, pipeline="main_openai")
+    job_store.start("transcript", "recording")
+    try:
+        transcript = watch_recording(audio_file, session_directory, transcribe_window, bitrate=CHUNK_BITRATE)
+    except BaseException as e:
+        job_store.fail("transcript", e)
+        raise
+    job_store.finish("transcript", get_transcription_hashes(audio_file, False)["transcript"], {"path": TRANSCRIPT_FILE_NAME, "watched": True})
+    print(f"Transcript saved to {os.path.join(session_directory, TRANSCRIPT_FILE_NAME)}")
+    return transcript
+
+
+# Split text into pieces of at most max_tokens, between paragraphs where possible
+# (chunk transcripts are separate paragraphs), then between sentences, then words
+def split_transcript(text_transcript, max_tokens=SUMMARY_PIECE_TOKENS):
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text_transcript.strip()):
+        if count_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            if count_tokens(sentence) <= max_tokens:
+                units.append(sentence)
+                continue
+            words = sentence.split()
+            step = max(1, len(words) * max_tokens // (2 * count_tokens(sentence)))
+            units += [" ".join(words[i : i + step]) for i in range(0, len(words), step)]
+
+    # Aim for evenly sized pieces rather than several full ones and a short tail
+    unit_tokens = [count_tokens(unit) for unit in units]
+    target_tokens = sum(unit_tokens) / max(1, math.ceil(sum(unit_tokens) / max_tokens))
+    pieces = []
+    piece, piece_tokens = [], 0
+    for unit, tokens in zip(units, unit_tokens):
+        if piece and (piece_tokens + tokens > max_tokens or piece_tokens >= target_tokens):
+            pieces.append("\n\n".join(piece))
+            piece, piece_tokens = [], 0
+        piece.append(unit)
+        piece_tokens += tokens
+    if piece:
+        pieces.append("\n\n".join(piece))
+    return pieces
+
+
+# Summarize one piece of a split transcript (map step)
+def summarize_piece(piece_number, piece_count, piece, file_name):
+    prompt = f"{get_prompt('summary')}\n\n{get_prompt('summary_map')}\n\nHere is part {piece_number} of {piece_count} of the transcript of session {file_name}:\n{piece}"
+    start_time = time.time()
+    partial_summary = create_response_text(get_openai_client(), SUMMARY_MODEL, prompt, cache=USE_LLM_CACHE)
+    print(f"  Part {piece_number}/{piece_count} summarized in {time.time() - start_time:.2f} seconds ({count_tokens(prompt):,} prompt tokens).")
+    return partial_summary
 
 
-# Summarize the transcript
-def summarize_text(text_transcript, file_name):
-    print("Summarizing text...")
+# Summarize the transcript, in one request or by map-reduce over transcript pieces
+def summarize_text(text_transcript, file_name, session_directory, session_notes, mode="single", stream=False):
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode: {mode} (expected one of {', '.join(SUMMARY_MODES)})")
 
+    pieces = split_transcript(text_transcript) if mode == "map-reduce" else [text_transcript]
+    if mode == "map-reduce" and len(pieces) == 1:
+        print(f"Transcript fits in one piece of {SUMMARY_PIECE_TOKENS:,} tokens, summarizing in a single pass.")
     start_time = time.time()
-    response = OPENAI_CLIENT.responses.create(
-        model=SUMMARY_MODEL,
-        input=(
-            f"{SUMMARY_PROMPT}\n\nFor context, here are notes from the previous 10 sessions in chronological order:\n"
-            f"{ALL_SESSION_NOTES}\n\nHere is the session transcript to summarize of session {file_name}:\n{text_transcript}"
-        ),
-    )
-    summarized_text = "".join(item.text for output in response.output if output.type == "message" for item in output.content if item.type == "output_text")
+
+    if len(pieces) == 1:
+        print("Summarizing text...")
+        prompt = (
+            f"{get_prompt('summary')}\n\nFor context, here are the previous session notes (chronological) and campaign notes most relevant to this session:\n"
+            f"{session_notes}\n\nHere is the session transcript to summarize of session {file_name}:\n{text_transcript}"
+        )
+    else:
+        # Map: summarize every piece concurrently; context notes are only sent once, to the reduce step
+        print(f"Summarizing text in {len(pieces)} parts with up to {SUMMARY_MAP_WORKERS} concurrent requests...")
+        with ThreadPoolExecutor(max_workers=min(SUMMARY_MAP_WORKERS, len(pieces))) as executor:
+            partial_summaries = list(
+                executor.map(lambda numbered: summarize_piece(numbered[0], len(pieces), numbered[1], file_name), enumerate(pieces, 1))
+            )
+        print(f"Map step completed in {time.time() - start_time:.2f} seconds.")
+
+        os.makedirs(session_directory, exist_ok=True)
+        parts_text = "".join(f"=== Part {i} of {len(pieces)} ===\n\n{partial}\n\n" for i, partial in enumerate(partial_summaries, 1))
+        with open(os.path.join(session_directory, SUMMARY_PARTS_FILE_NAME), "w", encoding="utf-8") as file:
+            file.write(parts_text)
+
+        # Reduce: merge the partial summaries under the usual summary rules
+        prompt = (
+            f"{get_prompt('summary')}\n\nFor context, here are the previous session notes (chronological) and campaign notes most relevant to this session:\n"
+            f"{session_notes}\n\nThe transcript of session {file_name} was too long for one pass, so its {len(pieces)} consecutive parts were "
+            f"summarized separately. Merge these partial summaries into the final session summary, in chronological order and "
+            f"following the rules above, without dropping any names or events:\n{parts_text}"
+        )
+
+    print(f"Summary prompt: {count_tokens(prompt):,} tokens ({count_tokens(session_notes):,} of context)")
+    summarized_path = os.path.join(session_directory, SUMMARY_FILE_NAME)
+    summarized_text = create_response_text(get_openai_client(), SUMMARY_MODEL, prompt, output_path=summarized_path, stream=stream, cache=USE_LLM_CACHE)
     end_time = time.time()
     print(f"Summarization completed in {end_time - start_time:.2f} seconds.")
-
-    os.makedirs(SESSION_DIRECTORY, exist_ok=True)
-    summarized_path = os.path.join(SESSION_DIRECTORY, SUMMARY_FILE_NAME)
-    with open(summarized_path, "w", encoding="utf-8") as file:
-        file.write(summarized_text)
     return summarized_text
 
 
 # Generate Markdown summary
-def generate_markdown_summary(text, file_name):
+def generate_markdown_summary(text, file_name, session_directory, session_notes, stream=False):
     print("Generating Markdown text...")
 
-    start_time = time.time()
-    response = OPENAI_CLIENT.responses.create(
-        model=SUMMARY_MODEL,
-        input=(
-            f"{MARKDOWN_PROMPT}\n\nFor context, here are notes from the previous 10 sessions in chronological order:\n"
-            f"{ALL_SESSION_NOTES}\n\nHere is the session summary to format in Markdown of session {file_name}:\n{text}"
-        ),
+    prompt = (
+        f"{get_prompt('markdown')}\n\nFor context, here are the previous session notes (chronological) and campaign notes most relevant to this session:\n"
+        f"{session_notes}\n\nHere is the session summary to format in Markdown of session {file_name}:\n{text}"
     )
-    markdown_text = "".join(item.text for output in response.output if output.type == "message" for item in output.content if item.type == "output_text")
+    print(f"Markdown prompt: {count_tokens(prompt):,} tokens ({count_tokens(session_notes):,} of context)")
+
+    start_time = time.time()
+    markdown_path = os.path.join(session_directory, MARKDOWN_SUMMARY_FILE_NAME)
+    markdown_text = create_response_text(get_openai_client(), SUMMARY_MODEL, prompt, output_path=markdown_path, stream=stream, cache=USE_LLM_CACHE)
     end_time = time.time()
     print(f"Markdown generation completed in {end_time - start_time:.2f} seconds.")
-
-    os.makedirs(SESSION_DIRECTORY, exist_ok=True)
-    markdown_path = os.path.join(SESSION_DIRECTORY, MARKDOWN_SUMMARY_FILE_NAME)
-    with open(markdown_path, "w", encoding="utf-8") as file:
-        file.write(markdown_text)
     return markdown_text
 
 
-# Main pipeline
-def main():
-    # Check if audio file path is provided
-    if len(sys.argv) < 2:
-        print("Usage: python main_openai.py <audio_file_path> [--transcript]")
-        print("Example: python main_openai.py 'C:/path/to/my_audio.m4a'")
-        print("Options:")
-        print("  --transcript  Only transcribe audio, skip summary and markdown generation")
-        sys.exit(1)
-
-    # Parse arguments
-    transcript_only = "--transcript" in sys.argv
-    audio_file = sys.argv[1] if sys.argv[1] != "--transcript" else sys.argv[2]
-
-    # Get filename without extension for folder name
+# Session folder for an audio file: session17.m4a -> sessions/session17
+def get_session_directory(audio_file):
     file_name = os.path.splitext(os.path.basename(audio_file))[0]
+    return os.path.join(SESSIONS_DIRECTORY, file_name)
+
+
+# (session name, session folder, text) of one of a session's files, by session name or recording path.
+# A name is used as given (session_1.1 is a folder, not session_1 plus an extension)
+def read_session_file(session, file_name):
+    session_directory = os.path.join(SESSIONS_DIRECTORY, os.path.basename(os.path.normpath(session)))
+    if not os.path.isdir(session_directory):
+        session_directory = get_session_directory(session)
+    path = os.path.join(session_directory, file_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{file_name} not found: {path}")
+    with open(path, "r", encoding="utf-8") as file:
+        text = file.read()
+    if not text.strip():
+        raise ValueError(f"{file_name} is empty: {path}")
+    return os.path.basename(session_directory), session_directory, text
+
+
+# Index every session note and vault note for context retrieval
+def load_session_context():
+    session_texts = get_session_texts(SESSION_NOTES_DIRECTORY)
+    vault_texts = get_vault_texts(VAULT_DIRECTORY, exclude_directory=SESSION_NOTES_DIRECTORY) if os.path.isdir(VAULT_DIRECTORY) else []
+    return ContextIndex(session_texts, vault_texts)
+
+
+# Notes most relevant to the transcript that fit in the context token budget
+def select_session_notes(context_index, transcript, token_budget=None):
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    selection = context_index.select(transcript, token_budget)
+    print_selection(selection, token_budget)
+    return format_context(selection)
+
+
+# transcript.txt of a session if it is current, else None. It is current when the job store
+# recorded it for this recording and transcription settings, or when it predates the job store
+# (it is then recorded as is); without the recording there is nothing to compare, so it is kept
+def load_current_transcript(audio_file, session_directory, job_store):
+    transcript_path = os.path.join(session_directory, TRANSCRIPT_FILE_NAME)
+    if not os.path.exists(transcript_path):
+        return None
+    with open(transcript_path, "r", encoding="utf-8") as file:
+        transcript = file.read()
+    if not transcript or not os.path.exists(audio_file):
+        return transcript or None
+
+    transcript_hash = get_transcription_hashes(audio_file, REMOVE_SILENCE)["transcript"]
+    stage = job_store.get_stage("transcript")
+    if stage is None:
+        job_store.finish("transcript", transcript_hash, {"path": TRANSCRIPT_FILE_NAME})
+    elif stage["status"] != "done":
+        print(f"The last transcription did not finish ({stage['status']}), transcribing again.")
+        return None
+    elif stage["input_hash"] != transcript_hash:
+        print("The recording or the transcription settings changed since transcript.txt was made, transcribing again.")
+        return None
+    return transcript
+
+
+# summary.txt of a session, written unless it is current
+def summarize_session(transcript, file_name, session_directory, session_notes, job_store, mode="single", stream=False, force=False):
+    map_prompt = get_prompt("summary_map") if mode == "map-reduce" else None
+    summary_hash = hash_inputs("summarize", transcript, get_prompt("summary"), map_prompt, SUMMARY_MODEL, mode, session_notes)
+
+    def write():
+        with span("summarize", session=file_name, mode=mode):
+            summarize_text(transcript, file_name, session_directory, session_notes, mode=mode, stream=stream)
+
+    return job_store.run_file_stage("summarize", summary_hash, os.path.join(session_directory, SUMMARY_FILE_NAME), write, force=force)
+
+
+# summary.md of a session, written unless it is current
+def format_session(summary, file_name, session_directory, session_notes, job_store, stream=False, force=False):
+    markdown_hash = hash_inputs("markdown", summary, get_prompt("markdown"), SUMMARY_MODEL, session_notes)
+
+    def write():
+        with span("markdown", session=file_name):
+            generate_markdown_summary(summary, file_name, session_directory, session_notes, stream=stream)
+
+    return job_store.run_file_stage("markdown", markdown_hash, os.path.join(session_directory, MARKDOWN_SUMMARY_FILE_NAME), write, force=force)
+
+
+# Transcribe, summarize and format one session, resuming at the first stage that is not current
+def process_session(audio_file, context_index, transcript_only=False, jobs=1, context_budget=None, summary_mode="single", stream=False, watch=False):
+    file_name = os.path.splitext(os.path.basename(audio_file))[0]
+    session_directory = get_session_directory(audio_file)
+    with JobStore(session_directory, audio_file, pipeline="main_openai") as job_store:
+        # Process audio file
+        transcript = load_current_transcript(audio_file, session_directory, job_store)
+        transcript_path = os.path.join(session_directory, TRANSCRIPT_FILE_NAME)
+        if not transcript and watch:
+            with span("transcribe", session=file_name, watch=True):
+                transcript = watch_audio(audio_file, session_directory, job_store=job_store)
+        elif not transcript:
+            with span("transcribe", session=file_name, jobs=jobs):
+                transcript = transcribe_audio(audio_file, session_directory, jobs=jobs, job_store=job_store)
+
+        if transcript_only:
+            print(f"Transcription completed. Transcript saved to {transcript_path}")
+            print("Skipping summary and markdown generation (--transcript flag enabled)")
+            return transcript_path
+
+        # Pick notes by the transcript; the Markdown pass reuses them so both see the same context
+        session_notes = select_session_notes(context_index, transcript, context_budget)
+        summary = summarize_session(transcript, file_name, session_directory, session_notes, job_store, mode=summary_mode, stream=stream)
+        format_session(summary, file_name, session_directory, session_notes, job_store, stream=stream)
+
+    markdown_summary_path = os.path.join(session_directory, MARKDOWN_SUMMARY_FILE_NAME)
+    print(f"Summary saved to {markdown_summary_path}")
+    return markdown_summary_path
+
+
+# Audio files matched by a directory or glob pattern, in name order
+def find_audio_files(path_or_pattern):
+    if os.path.isdir(path_or_pattern):
+        paths = [os.path.join(path_or_pattern, name) for name in os.listdir(path_or_pattern)]
+    else:
+        paths = glob.glob(path_or_pattern)
+    return sorted(path for path in paths if os.path.isfile(path) and path.lower().endswith(AUDIO_FILE_EXTENSIONS))
+
+
+# A session is current when its final output is newer than the recording and the prompts
+def is_session_current(audio_file, transcript_only=False):
+    output_name = TRANSCRIPT_FILE_NAME if transcript_only else MARKDOWN_SUMMARY_FILE_NAME
+    output_path = os.path.join(get_session_directory(audio_file), output_name)
+    if not os.path.exists(output_path):
+        return False
+
+    inputs = [audio_file, os.path.join(PROMPTS_DIRECTORY, "transcription.txt")]
+    if not transcript_only:
+        inputs += [os.path.join(PROMPTS_DIRECTORY, "summary.txt"), os.path.join(PROMPTS_DIRECTORY, "markdown.txt")]
+    output_mtime = os.path.getmtime(output_path)
+    return all(os.path.getmtime(path) <= output_mtime for path in inputs)
+
+
+# Process every recording matched by a directory or glob across a pool of session workers
+def process_batch(path_or_pattern, workers=1, transcript_only=False, jobs=1, context_budget=None, summary_mode="single", stream=False):
+    if workers < 1:
+        raise ValueError(f"Number of session workers must be at least 1, got {workers}")
+    audio_files = find_audio_files(path_or_pattern)
+    if not audio_files:
+        raise FileNotFoundError(f"No audio files found for: {path_or_pattern}")
+
+    pending_files = [audio_file for audio_file in audio_files if not is_session_current(audio_file, transcript_only)]
+    print(f"Found {len(audio_files)} recordings, {len(audio_files) - len(pending_files)} already up to date, {len(pending_files)} to process.")
+    if not pending_files:
+        return
 
-    # Setup session directory and configuration
-    global SESSION_DIRECTORY, ALL_SESSION_NOTES
-    SESSION_DIRECTORY = os.path.join(CURRENT_DIRECTORY, f"sessions/{file_name}")
+    # The notes index and the OpenAI client are loaded once and shared by every session
+    context_index = None if transcript_only else load_session_context()
+
+    def run_session(audio_file):
+        try:
+            process_session(
+                audio_file,
+                context_index,
+                transcript_only=transcript_only,
+                jobs=jobs,
+                context_budget=context_budget,
+                summary_mode=summary_mode,
+                stream=stream,
+            )
+            return audio_file, get_audio_duration(audio_file), None
+        except Exception as e:
+            print(f"Error processing {audio_file}: {e}")
+            return audio_file, 0, e
 
-    # Load session notes and create combined_sessions.md (last 10 sessions only)
-    SESSION_NOTES_FILES = get_markdown_file_paths(SESSION_NOTES_DIRECTORY)
-    # Take only the last 10 sessions to reduce context consumption
-    SESSION_NOTES_FILES = SESSION_NOTES_FILES[-10:]
-    ALL_SESSION_NOTES = ""
-    for notes_file in SESSION_NOTES_FILES:
-        ALL_SESSION_NOTES += get_text_from_file(notes_file) + f"\n\n{'='*40}\n\n"
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=min(workers, len(pending_files))) as executor:
+        results = list(executor.map(run_session, pending_files))
+    elapsed = time.time() - start_time
 
-    # Save to file
-    with open("combined_sessions.md", "w", encoding="utf-8") as file:
-        file.write(ALL_SESSION_NOTES.strip())
+    succeeded = [(audio_file, duration) for audio_file, duration, error in results if error is None]
+    failed = [(audio_file, error) for audio_file, _, error in results if error is not None]
+    audio_minutes = sum(duration for _, duration in succeeded) / 60000
+    print(f"\nBatch completed in {elapsed / 60:.1f} minutes: {len(succeeded)} processed, {len(failed)} failed.")
+    print(f"Throughput: {len(succeeded) / (elapsed / 3600):.2f} sessions/hour, {audio_minutes / (elapsed / 60):.2f} audio minutes/minute")
+    for audio_file, error in failed:
+        print(f"  Failed: {audio_file} ({error})")
 
-    # Process audio file
-    transcript = None
-    transcript_path = os.path.join(SESSION_DIRECTORY, TRANSCRIPT_FILE_NAME)
-    if os.path.exists(transcript_path):
-        with open(transcript_path, "r", encoding="utf-8") as file:
-            transcript = file.read()
-    if not transcript:
-        transcript = transcribe_audio(audio_file)
-
-    if transcript_only:
-        print(f"Transcription completed. Transcript saved to {transcript_path}")
-        print("Skipping summary and markdown generation (--transcript flag enabled)")
-        return
 
-    summary = summarize_text(transcript, file_name)
-    markdown_summary = generate_markdown_summary(summary, file_name)
+# argparse type for counts that must be at least 1 (--jobs, --workers)
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
-    markdown_summary_path = os.path.join(SESSION_DIRECTORY, MARKDOWN_SUMMARY_FILE_NAME)
-    print(f"Summary saved to {markdown_summary_path}")
+
+# Main pipeline
+def main(argv=None):
+    global USE_LLM_CACHE, REMOVE_SILENCE
+
+    parser = argparse.ArgumentParser(
+        description="Transcribe and summarize a D&D session recording.",
+        epilog="Example: python main_openai.py 'C:/path/to/my_audio.m4a' --jobs 4",
+    )
+    parser.add_argument("audio_file", help="Path to the session audio file (m4a, mp3, wav, ...), or a directory/glob with --batch")
+    parser.add_argument(
+        "--transcript",
+        action="store_true",
+        help="Only transcribe audio, skip summary and markdown generation",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=1,
+        metavar="N",
+        help="Number of chunks to transcribe concurrently (default: 1)",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Process every recording in a directory or matching a glob, skipping sessions whose outputs are current",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=2,
+        metavar="N",
+        help="Number of sessions processed concurrently in --batch mode (default: 2)",
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=CONTEXT_TOKEN_BUDGET,
+        metavar="TOKENS",
+        help=f"Token budget for the session and vault notes sent as context (default: {CONTEXT_TOKEN_BUDGET})",
+    )
+    parser.add_argument(
+        "--summary-mode",
+        choices=SUMMARY_MODES,
+        default="single",
+        help="single: one request with the whole transcript; map-reduce: summarize transcript parts concurrently, then merge them (default: single)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream summary.txt and summary.md to disk as they are generated (a dropped connection leaves a .partial file)",
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always send summary requests, ignoring cached answers (the chunk transcription cache still applies)",
+    )
+    parser.add_argument(
+        "--remove-silence",
+        action="store_true",
+        help="Cut quiet stretches longer than a few seconds before uploading; timestamps are mapped back to the recording",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Transcribe the recording while it is still being written (WAV, MP3, FLAC, OGG...), then summarize once it stops growing",
+    )
+    parser.add_argument("--trace", help="Append per-stage spans (JSON lines) to this file (also DND_TRACE_FILE)")
+    parser.add_argument("--metrics", help="Write per-stage totals as a Prometheus textfile at exit (also DND_METRICS_FILE)")
+    args = parser.parse_args(argv)
+    if args.watch and (args.batch or args.remove_silence):
+        parser.error("--watch cannot be combined with --batch or --remove-silence")
+    USE_LLM_CACHE = not args.no_llm_cache
+    REMOVE_SILENCE = args.remove_silence
+    enable_tracing(args.trace, args.metrics)
+
+    options = dict(
+        transcript_only=args.transcript, jobs=args.jobs, context_budget=args.context_budget, summary_mode=args.summary_mode, stream=args.stream
+    )
+    if args.batch:
+        process_batch(args.audio_file, workers=args.workers, **options)
+    else:
+        context_index = None if args.transcript else load_session_context()
+        process_session(args.audio_file, context_index, watch=args.watch, **options)
+    print_cache_stats()
+    print_scheduler_stats()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+
+# Two-stage producer/consumer pipeline. One thread pulls items from a producer
+# iterator (e.g. encoding audio chunks) into a bounded queue while `workers`
+# threads consume them (e.g. uploading for transcription), so the two stages
+# overlap. The bounded queue keeps at most queue_size produced-but-unconsumed
+# items around at any time.
+
+POLL_INTERVAL = 0.1  # Seconds between checks for failures in the other stage
+
+
+class PipelineStats:
+    def __init__(self, workers):
+        self.workers = workers
+        self.wall_seconds = 0.0
+        self.produce_busy = 0.0  # Time spent producing items
+        self.produce_blocked = 0.0  # Time the producer waited on a full queue
+        self.consume_busy = 0.0  # Time spent consuming, summed over workers
+        self.consume_idle = 0.0  # Time workers waited on an empty queue, summed
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + seconds)
+
+    @property
+    def produce_utilization(self):
+        return self.produce_busy / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def consume_utilization(self):
+        return self.consume_busy / (self.wall_seconds * self.workers) if self.wall_seconds else 0.0
+
+    @property
+    def bottleneck(self):
+        return "produce" if self.produce_utilization >= self.consume_utilization else "consume"
+
+
+def run_pipeline(items, consume, workers=1, queue_size=None):
+    """Consume every item of the `items` iterator with consume(number, item) on
+    `workers` threads while the iterator keeps producing.
+
+    Returns (results, stats): results in production order, and a PipelineStats
+    with per-stage busy/wait times. The first exception raised by either stage
+    stops the pipeline and is re-raised.
+    """
+    if workers < 1:
+        raise ValueError(f"Number of pipeline workers must be at least 1, got {workers}")
+
+    stats = PipelineStats(workers)
+    item_queue = queue.Queue(maxsize=queue_size or workers)
+    produced = threading.Event()
+    stopped = threading.Event()
+    results = {}
+    errors = []
+
+    def fail(error):
+        errors.append(error)
+        stopped.set()
+
+    def produce():
+        try:
+            iterator = iter(items)
+            number = 0
+            while not stopped.is_set():
+                start_time = time.time()
+                item = next(iterator, StopIteration)
+                stats.add("produce_busy", time.time() - start_time)
+                if item is StopIteration:
+                    break
+
+                number += 1
+                start_time = time.time()
+                while not stopped.is_set():
+                    try:
+                        item_queue.put((number, item), timeout=POLL_INTERVAL)
+                        break
+                    except queue.Full:
+                        pass
+                stats.add("produce_blocked", time.time() - start_time)
+        except Exception as e:
+            fail(e)
+        finally:
+            produced.set()
+
+    def consume_items():
+        while not stopped.is_set():
+            start_time = time.time()
+            try:
+                number, item = item_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                stats.add("consume_idle", time.time() - start_time)
+                if produced.is_set() and item_queue.empty():
+                    return
+                continue
+            stats.add("consume_idle", time.time() - start_time)
+
+            start_time = time.time()
+            try:
+                results[number] = consume(number, item)
+            except Exception as e:
+                fail(e)
+                return
+            finally:
+                stats.add("consume_busy", time.time() - start_time)
+
+    start_time = time.time()
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [threading.Thread(target=consume_items, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats.wall_seconds = time.time() - start_time
+
+    if errors:
+        raise errors[0]
+    return [results[number] for number in sorted(results)], stats
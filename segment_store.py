@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import re
+import struct
+import zlib
+
+# Timestamped transcript segments, stored next to transcript.txt. Segments
+# (start and end in seconds of the original recording, plus text) are grouped
+# into blocks of BLOCK_SECONDS, each block is zlib-compressed JSONL, and an
+# index of block time ranges sits at the front of the file. A range read such
+# as "minutes 90-120" reads the index and decompresses only the blocks that
+# overlap the range.
+#
+# Layout: MAGIC, 8-byte little-endian index length, JSON index
+# {"blocks": [[start, end, offset, length, count], ...]}, then the blocks.
+#   python segment_store.py sessions/session17/transcript.seg --from 90m --to 120m
+
+MAGIC = b"DNDSEG1\n"
+BLOCK_SECONDS = 300  # Audio time covered by one compressed block
+SEGMENTS_FILE_NAME = "transcript.seg"
+
+
+# {"start", "end", "text"} dicts with plain floats, from Whisper or OpenAI segments
+def normalize_segments(segments, offset_seconds=0.0):
+    normalized = []
+    for segment in segments:
+        get = segment.get if isinstance(segment, dict) else lambda name: getattr(segment, name)
+        text = get("text").strip()
+        if text:
+            start = round(float(get("start")) + offset_seconds, 3)
+            end = round(float(get("end")) + offset_seconds, 3)
+            normalized.append({"start": start, "end": end, "text": text})
+    return normalized
+
+
+def write_segments(path, segments, block_seconds=BLOCK_SECONDS):
+    segments = sorted(segments, key=lambda segment: segment["start"])
+    blocks = []
+    for segment in segments:
+        if not blocks or segment["start"] >= blocks[-1][0]["start"] + block_seconds:
+            blocks.append([])
+        blocks[-1].append(segment)
+
+    index = []
+    data = []
+    offset = 0
+    for block in blocks:
+        lines = "".join(json.dumps(segment, ensure_ascii=False) + "\n" for segment in block)
+        compressed = zlib.compress(lines.encode("utf-8"), 9)
+        index.append([block[0]["start"], max(segment["end"] for segment in block), offset, len(compressed), len(block)])
+        data.append(compressed)
+        offset += len(compressed)
+    index_data = json.dumps({"blocks": index}).encode("utf-8")
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(index_data)))
+        file.write(index_data)
+        for block in data:
+            file.write(block)
+    os.replace(temp_path, path)
+
+
+def read_index(file):
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"Not a segment store: {file.name}")
+    (index_length,) = struct.unpack("<Q", file.read(8))
+    index = json.loads(file.read(index_length))
+    return index["blocks"], len(MAGIC) + 8 + index_length
+
+
+def read_segments(path, start=None, end=None):
+    """Segments overlapping [start, end) seconds (whole transcript if None),
+    decompressing only the blocks that overlap the range."""
+    start = float("-inf") if start is None else start
+    end = float("inf") if end is None else end
+    segments = []
+    with open(path, "rb") as file:
+        blocks, data_start = read_index(file)
+        for block_start, block_end, offset, length, _ in blocks:
+            if block_end <= start or block_start >= end:
+                continue
+            file.seek(data_start + offset)
+            for line in zlib.decompress(file.read(length)).decode("utf-8").splitlines():
+                segment = json.loads(line)
+                if segment["end"] > start and segment["start"] < end:
+                    segments.append(segment)
+    return segments
+
+
+def read_text(path, start=None, end=None):
+    return " ".join(segment["text"] for segment in read_segments(path, start, end))
+
+
+# "90m", "1h30m", "5400", "1:30:00" or "90:00" -> seconds
+def parse_time(value):
+    value = value.strip().lower()
+    if ":" in value:
+        seconds = 0.0
+        for part in value.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    match = re.fullmatch(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s?)?", value)
+    if not value or not match:
+        raise ValueError(f"Invalid time: {value}")
+    hours, minutes, seconds = (float(part) if part else 0.0 for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a time range of a timestamped segment transcript.")
+    parser.add_argument("segments_file", help=f"Path to a {SEGMENTS_FILE_NAME} file")
+    parser.add_argument("--from", dest="start", type=parse_time, default=None, help="Range start, e.g. 90m, 1h30m, 1:30:00")
+    parser.add_argument("--to", dest="end", type=parse_time, default=None, help="Range end (exclusive)")
+    args = parser.parse_args()
+
+    for segment in read_segments(args.segments_file, args.start, args.end):
+        print(f"[{format_time(segment['start'])} - {format_time(segment['end'])}] {segment['text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import pickle
+import struct
+
+# Session notes context shared by every entry point. Notes are read from the
+# Obsidian vault through a cache keyed by each file's mtime and size, so a run
+# only re-reads the notes that changed since the last one, and
+# combined_sessions.md is only rewritten when its content changes.
+#
+# The cache is one file per notes directory: an 8-byte header with the index
+# length, a pickled index {path: (mtime_ns, size, offset, length)}, then the
+# UTF-8 texts back to back. Loading the last few sessions only reads their
+# slices, not every note. The rest of the vault (NPCs, places, factions...) is
+# loaded through the same cache for context retrieval.
+
+CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIRECTORY = os.path.join(CURRENT_DIRECTORY, ".cache")
+SESSION_SEPARATOR = f"\n\n{'='*40}\n\n"
+
+
+def get_session_number(file):
+    file_name = os.path.splitext(file)[0]
+    session_number = float(file_name.split(" ")[1].strip())
+    if session_number.is_integer():
+        session_number = int(session_number)
+    return session_number
+
+
+def get_markdown_file_paths(notes_directory):
+    return [path for path, _ in scan_session_notes(notes_directory)]
+
+
+# [(path, stat)] of session notes in session order; on Windows scandir gets the
+# stat results from the directory listing itself, without opening every file
+def scan_session_notes(notes_directory):
+    files = {}
+    for entry in os.scandir(notes_directory):
+        if entry.name.lower().startswith("session") and entry.name.endswith(".md"):
+            session_number = get_session_number(entry.name)
+            files[session_number] = (os.path.join(notes_directory, entry.name), entry.stat())
+    return [files[key] for key in sorted(files.keys())]
+
+
+# [(path, stat)] of every other note in the vault, skipping hidden folders
+# (.obsidian, .trash) and exclude_directory (usually the session notes)
+def scan_vault_notes(vault_directory, exclude_directory=None):
+    exclude_directory = os.path.normcase(os.path.abspath(exclude_directory)) if exclude_directory else None
+    notes = []
+    pending = [vault_directory]
+    while pending:
+        directory = pending.pop()
+        for entry in os.scandir(directory):
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                if os.path.normcase(os.path.abspath(entry.path)) != exclude_directory:
+                    pending.append(entry.path)
+            elif entry.name.endswith(".md"):
+                notes.append((entry.path, entry.stat()))
+    return sorted(notes)
+
+
+def get_text_from_file(file):
+    title = os.path.splitext(os.path.basename(file))[0]
+    content = f"# {title}\n\n"
+    with open(file, "r", encoding="utf-8") as f:
+        content += f.read()
+    return content
+
+
+def get_cache_path(notes_directory, cache_directory=CACHE_DIRECTORY, name="session_notes"):
+    directory_hash = hashlib.sha256(os.path.abspath(notes_directory).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_directory, f"{name}_{directory_hash}.cache")
+
+
+def read_cache_index(file):
+    header = file.read(8)
+    if len(header) < 8:
+        return {}, 8
+    (index_length,) = struct.unpack("<Q", header)
+    return pickle.loads(file.read(index_length)), 8 + index_length
+
+
+def write_notes_cache(cache_path, entries):
+    """entries: [(path, mtime_ns, size, text_bytes)]"""
+    index = {}
+    offset = 0
+    for path, mtime_ns, size, text in entries:
+        index[path] = (mtime_ns, size, offset, len(text))
+        offset += len(text)
+    index_data = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = f"{cache_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(struct.pack("<Q", len(index_data)))
+        file.write(index_data)
+        for _, _, _, text in entries:
+            file.write(text)
+    os.replace(temp_path, cache_path)
+
+
+def read_cached_texts(scanned, cache_path, label, wanted=None):
+    """Return {path: text_bytes} for the `wanted` paths (default: all) of the
+    scanned [(path, stat)] notes.
+
+    Text comes from the cache unless the file's mtime or size changed; the
+    cache is rewritten only when something was added, changed or removed.
+    """
+    file_paths = [path for path, _ in scanned]
+    stats = dict(scanned)
+    wanted = file_paths if wanted is None else wanted
+
+    try:
+        cache_file = open(cache_path, "rb")
+    except FileNotFoundError:
+        cache_file = None
+    try:
+        index, data_start = read_cache_index(cache_file) if cache_file else ({}, 8)
+
+        def read_cached(path):
+            _, _, offset, length = index[path]
+            cache_file.seek(data_start + offset)
+            return cache_file.read(length)
+
+        changed = [
+            path for path in file_paths if path not in index or index[path][:2] != (stats[path].st_mtime_ns, stats[path].st_size)
+        ]
+        if not changed and len(index) == len(file_paths):
+            return {path: read_cached(path) for path in wanted}
+
+        changed_paths = set(changed)
+        entries = []
+        for path in file_paths:
+            text = get_text_from_file(path).encode("utf-8") if path in changed_paths else read_cached(path)
+            entries.append((path, stats[path].st_mtime_ns, stats[path].st_size, text))
+    finally:
+        if cache_file:
+            cache_file.close()
+
+    write_notes_cache(cache_path, entries)
+    print(f"{label}: {len(changed)} of {len(file_paths)} re-read")
+    texts = {path: text for path, _, _, text in entries}
+    return {path: texts[path] for path in wanted}
+
+
+# [(path, text)] of the session notes in chronological order (only the last
+# `last` sessions if given)
+def get_session_texts(notes_directory, last=None, cache_directory=CACHE_DIRECTORY):
+    scanned = scan_session_notes(notes_directory)
+    wanted = [path for path, _ in scanned]
+    if last is not None:
+        wanted = wanted[-last:] if last > 0 else []
+    texts = read_cached_texts(scanned, get_cache_path(notes_directory, cache_directory), f"Session notes in {notes_directory}", wanted)
+    return [(path, texts[path].decode("utf-8")) for path in wanted]
+
+
+# [(path, text)] of every non-session note in the vault
+def get_vault_texts(vault_directory, exclude_directory=None, cache_directory=CACHE_DIRECTORY):
+    scanned = scan_vault_notes(vault_directory, exclude_directory)
+    cache_path = get_cache_path(vault_directory, cache_directory, name="vault_notes")
+    texts = read_cached_texts(scanned, cache_path, f"Vault notes in {vault_directory}")
+    return [(path, texts[path].decode("utf-8")) for path, _ in scanned]
+
+
+# Combined notes of the last `last` sessions (all sessions if None)
+def load_session_notes(notes_directory, last=None, cache_directory=CACHE_DIRECTORY):
+    session_texts = get_session_texts(notes_directory, last=last, cache_directory=cache_directory)
+    return "".join(text + SESSION_SEPARATOR for _, text in session_texts)
+
+
+# Write combined notes to output_path unless it already holds exactly that text. The file is
+# written in text mode (CRLF on Windows) through a temporary file, so it is never left half-written
+def write_combined_sessions(session_notes, output_path="combined_sessions.md"):
+    content = session_notes.strip()
+    expected_size = len(content.encode("utf-8")) + content.count("\n") * (len(os.linesep) - 1)
+    if os.path.exists(output_path) and os.path.getsize(output_path) == expected_size:
+        with open(output_path, "r", encoding="utf-8") as file:
+            if file.read() == content:
+                return False
+
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_path, output_path)
+    return True
@@ -1,21 +1,22 @@
-from pydub import AudioSegment
+import os
+from audio_chunker import fixed_boundaries, get_audio_duration, iter_audio_chunks, split_audio_copy
 
 
-def split(audio_path):
-    audio = AudioSegment.from_file(audio_path, format="m4a")
+def split(audio_path, output_dir=".", parts=4, reencode=False):
+    if parts < 1:
+        raise ValueError(f"Number of parts must be at least 1, got {parts}")
+    audio_duration = get_audio_duration(audio_path)
+    boundaries = fixed_boundaries(audio_duration, parts)
 
-    forth_time = len(audio) // 4
-
-    first = audio[:forth_time]
-    second = audio[forth_time : 2 * forth_time]
-    third = audio[2 * forth_time : 3 * forth_time]
-    forth = audio[3 * forth_time :]
-
-    first.export("part1_fixed.wav", format="wav")
-    second.export("part2_fixed.wav", format="wav")
-    third.export("part3_fixed.wav", format="wav")
-    forth.export("part4_fixed.wav", format="wav")
-    print(f"Audio split into 4 parts")
+    if reencode:
+        # Decode each part to WAV straight from the source instead of decoding the whole file
+        chunks = list(iter_audio_chunks(audio_path, output_dir, boundaries, extension="wav", name_format="part{number}_fixed"))
+    else:
+        # Copy the compressed packets into parts in the source's format, nothing is decoded
+        chunks = split_audio_copy(audio_path, output_dir, boundaries, name_format="part{number}_fixed")
+    for chunk in chunks:
+        print(f"  Saved {os.path.basename(chunk.path)} ({chunk.start_ms / 1000:.1f}s - {chunk.end_ms / 1000:.1f}s)")
+    print(f"Audio split into {len(chunks)} parts")
 
 
 if __name__ == "__main__":
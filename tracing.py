@@ -0,0 +1,178 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+
+# Per-stage tracing for the pipeline (decode, plan, encode, upload,
+# transcribe, summarize, markdown, llm). Code wraps a stage in
+#   with span("upload", chunk=3, bytes=size) as current:
+#       ...
+#       current.set(retries=1, input_tokens=1200)
+# and, when tracing is on, every finished span is appended as one JSON line to
+# the trace file, and per-stage totals (time, calls, errors, bytes, tokens,
+# retries) are written as a Prometheus textfile when the process exits, for
+# node_exporter's textfile collector. Tracing is off unless enable_tracing()
+# is called or DND_TRACE_FILE / DND_METRICS_FILE are set; span() then returns
+# a shared no-op object, so instrumented code costs one function call.
+
+TRACE_FILE = os.getenv("DND_TRACE_FILE")
+METRICS_FILE = os.getenv("DND_METRICS_FILE")
+METRIC_PREFIX = "dnd"
+COUNTED_ATTRIBUTES = ("bytes", "input_tokens", "output_tokens", "retries", "throttle_seconds", "cached")  # Summed per stage in the metrics
+
+_enabled = False
+_trace_id = uuid.uuid4().hex[:16]
+_trace_file = None
+_metrics_path = None
+_totals = {}  # span name -> {"seconds", "calls", "errors", attribute...}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = None
+        self.start_time = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent_id = stack[-1].span_id if stack else None
+        stack.append(self)
+        self.start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.time() - self.start_time
+        _local.stack.pop()
+        record_span(self, duration, f"{exc_type.__name__}: {exc}" if exc_type else None)
+        return False
+
+
+# Context manager timing one stage; attributes are JSON values
+def span(name, **attributes):
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, attributes)
+
+
+def is_tracing_enabled():
+    return _enabled
+
+
+def enable_tracing(trace_path=None, metrics_path=None):
+    """Start writing spans to trace_path (JSON lines, appended) and metrics to
+    metrics_path (Prometheus textfile, rewritten at exit); either may be None."""
+    global _enabled, _trace_file, _metrics_path
+    with _lock:
+        if trace_path and _trace_file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            _trace_file = open(trace_path, "a", encoding="utf-8")
+        if metrics_path:
+            _metrics_path = metrics_path
+        if not _enabled and (_trace_file or _metrics_path):
+            _enabled = True
+            atexit.register(close_tracing)
+
+
+def record_span(current, duration, error):
+    record = {
+        "trace": _trace_id,
+        "span": current.span_id,
+        "parent": current.parent_id,
+        "name": current.name,
+        "start": round(current.start_time, 6),
+        "duration": round(duration, 6),
+        "thread": threading.current_thread().name,
+        "status": "error" if error else "ok",
+        "attributes": current.attributes,
+    }
+    if error:
+        record["error"] = error
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    with _lock:
+        totals = _totals.setdefault(current.name, {"seconds": 0.0, "calls": 0, "errors": 0})
+        totals["seconds"] += duration
+        totals["calls"] += 1
+        totals["errors"] += 1 if error else 0
+        for name in COUNTED_ATTRIBUTES:
+            value = current.attributes.get(name)
+            if isinstance(value, (int, float)):  # bool counts as 0/1
+                totals[name] = totals.get(name, 0) + value
+        if _trace_file:
+            _trace_file.write(line)
+            _trace_file.flush()
+
+
+# Per-stage totals of this process as Prometheus text exposition format
+def format_metrics():
+    with _lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+    metrics = [
+        ("span_seconds_total", "Seconds spent in each pipeline stage", "seconds"),
+        ("span_calls_total", "Finished spans of each pipeline stage", "calls"),
+        ("span_errors_total", "Spans of each pipeline stage that raised", "errors"),
+    ]
+    metrics += [(f"{name}_total", f"Sum of the {name} attribute of each pipeline stage", name) for name in COUNTED_ATTRIBUTES]
+
+    lines = []
+    for metric, description, key in metrics:
+        samples = [(name, values[key]) for name, values in sorted(totals.items()) if key in values]
+        if not samples:
+            continue
+        lines.append(f"# HELP {METRIC_PREFIX}_{metric} {description}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} counter")
+        lines += [f'{METRIC_PREFIX}_{metric}{{span="{name}"}} {value:g}' for name, value in samples]
+    lines.append(f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds When these metrics were written")
+    lines.append(f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+    lines.append(f"{METRIC_PREFIX}_last_run_timestamp_seconds {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+
+# Write the metrics textfile atomically, so the collector never reads half a file
+def write_metrics(metrics_path=None):
+    metrics_path = metrics_path or _metrics_path
+    if not metrics_path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+    temp_path = f"{metrics_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(format_metrics())
+    os.replace(temp_path, metrics_path)
+
+
+def close_tracing():
+    global _trace_file
+    write_metrics()
+    with _lock:
+        if _trace_file:
+            _trace_file.close()
+            _trace_file = None
+
+
+if TRACE_FILE or METRICS_FILE:
+    enable_tracing(TRACE_FILE, METRICS_FILE)
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import pickle
+from collections import namedtuple
+from context_retrieval import BM25Index, build_query, count_tokens, tokenize
+from segment_store import SEGMENTS_FILE_NAME, format_time, read_segments
+
+# Passage search over session transcripts, used by custom_prompt.py to send
+# only the parts of one or many transcripts that matter for a question. Each
+# transcript is cut into overlapping windows of PASSAGE_WORDS words (with start
+# and end times when the session has a transcript.seg), and the windows and
+# their search terms are cached per transcript, keyed by its mtime and size.
+# A question is scored against the windows of every requested session at once
+# with BM25, and the best windows are taken until the token budget is used up.
+
+CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIRECTORY = os.path.join(CURRENT_DIRECTORY, ".cache/passages")
+TRANSCRIPT_FILE_NAME = "transcript.txt"
+PASSAGE_WORDS = 200
+PASSAGE_STRIDE_WORDS = 100  # Windows overlap by half, so an answer never straddles two windows
+PASSAGE_TOKEN_BUDGET = 8000
+
+# first_word: offset of the window in the transcript; start/end: seconds, or None without timestamps
+Passage = namedtuple("Passage", ["session", "first_word", "start", "end", "words"])
+
+
+# [(word, start, end)] of a session transcript, timed from transcript.seg when present
+def read_transcript_words(session_directory):
+    segments_path = os.path.join(session_directory, SEGMENTS_FILE_NAME)
+    if os.path.exists(segments_path):
+        return [(word, segment["start"], segment["end"]) for segment in read_segments(segments_path) for word in segment["text"].split()]
+
+    transcript_path = os.path.join(session_directory, TRANSCRIPT_FILE_NAME)
+    with open(transcript_path, "r", encoding="utf-8") as file:
+        return [(word, None, None) for word in file.read().split()]
+
+
+# Overlapping windows of a transcript: [(first_word, start, end, words)]
+def split_passages(words, passage_words=PASSAGE_WORDS, stride_words=PASSAGE_STRIDE_WORDS):
+    passages = []
+    for first_word in range(0, max(len(words) - passage_words + stride_words, 1), stride_words):
+        window = words[first_word : first_word + passage_words]
+        if window:
+            passages.append((first_word, window[0][1], window[-1][2], [word for word, _, _ in window]))
+    return passages
+
+
+def get_cache_path(session_directory, cache_directory):
+    directory_hash = hashlib.sha256(os.path.abspath(session_directory).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_directory, f"{directory_hash}.cache")
+
+
+# (passages, terms) of one session transcript, from the cache unless the transcript changed
+def load_passages(session_directory, cache_directory=None):
+    cache_directory = cache_directory or CACHE_DIRECTORY
+    transcript_path = os.path.join(session_directory, TRANSCRIPT_FILE_NAME)
+    if not os.path.exists(transcript_path):
+        raise FileNotFoundError(f"Transcript file not found: {transcript_path}")
+
+    # Both files feed the windows, so both must be unchanged
+    segments_path = os.path.join(session_directory, SEGMENTS_FILE_NAME)
+    sources = [transcript_path] + ([segments_path] if os.path.exists(segments_path) else [])
+    key = (PASSAGE_WORDS, PASSAGE_STRIDE_WORDS, [(os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in sources])
+
+    cache_path = get_cache_path(session_directory, cache_directory)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as file:
+                cached = pickle.load(file)
+            if cached["key"] == key:
+                return cached["passages"], cached["terms"]
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+            pass  # Unreadable cache, rebuild it
+
+    passages = split_passages(read_transcript_words(session_directory))
+    terms = [tokenize(" ".join(words)) for _, _, _, words in passages]
+    if not terms:
+        raise ValueError(f"Transcript file is empty: {transcript_path}")
+
+    os.makedirs(cache_directory, exist_ok=True)
+    temp_path = f"{cache_path}.tmp"
+    with open(temp_path, "wb") as file:
+        pickle.dump({"key": key, "passages": passages, "terms": terms}, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, cache_path)
+    return passages, terms
+
+
+class PassageIndex:
+    def __init__(self, session_directories, cache_directory=None):
+        """session_directories: [(session name, directory)] in the order excerpts are shown"""
+        self.passages = []
+        terms = []
+        for session, directory in session_directories:
+            session_passages, session_terms = load_passages(directory, cache_directory)
+            self.passages += [Passage(session, *passage) for passage in session_passages]
+            terms += session_terms
+        self.bm25 = BM25Index(terms)
+
+    def search(self, question, token_budget=PASSAGE_TOKEN_BUDGET):
+        """Best windows for question within token_budget, merged where they
+        overlap and ordered by session and position. Returns (passages, tokens)."""
+        scores = self.bm25.score(build_query(question))
+        ranked = sorted((number for number in range(len(self.passages)) if scores[number] > 0), key=lambda n: -scores[n])
+
+        chosen = []
+        used_tokens = 0
+        for number in ranked:
+            passage_tokens = count_tokens(" ".join(self.passages[number].words))
+            if used_tokens + passage_tokens <= token_budget:
+                chosen.append(number)
+                used_tokens += passage_tokens
+        return merge_passages([self.passages[number] for number in sorted(chosen)]), used_tokens
+
+
+# Join windows of the same session that overlap or touch into one excerpt
+def merge_passages(passages):
+    merged = []
+    for passage in passages:
+        previous = merged[-1] if merged else None
+        if previous and previous.session == passage.session and passage.first_word <= previous.first_word + len(previous.words):
+            overlap = previous.first_word + len(previous.words) - passage.first_word
+            merged[-1] = previous._replace(end=passage.end, words=previous.words + passage.words[overlap:])
+        else:
+            merged.append(passage)
+    return merged
+
+
+def format_passages(passages):
+    excerpts = []
+    for passage in passages:
+        label = f"Session {passage.session}"
+        if passage.start is not None:
+            label += f", {format_time(passage.start)} - {format_time(passage.end)}"
+        excerpts.append(f"[{label}]\n{' '.join(passage.words)}")
+    return "\n\n".join(excerpts)
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+
+# Content-addressed cache of chunk transcriptions. The key covers the encoded
+# chunk audio and every request parameter that changes the result, so a re-run
+# only uploads chunks whose audio or settings changed. Entries are plain text
+# files; the least recently used ones are evicted once the cache outgrows
+# max_size. The same text entries back the LLM response cache in llm.py.
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache/transcriptions")
+DEFAULT_MAX_CACHE_SIZE = 100 * 1024 * 1024  # 100 MB
+
+_cache_lock = threading.Lock()
+
+
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def get_cache_key(chunk_file, model, prompt, language, response_format="text"):
+    key_data = {
+        "audio": hash_file(chunk_file),
+        "model": model,
+        "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "language": language,
+    }
+    if response_format != "text":  # Plain-text entries keep their original keys
+        key_data["response_format"] = response_format
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_cache_path(key, cache_directory=DEFAULT_CACHE_DIRECTORY):
+    return os.path.join(cache_directory, f"{key}.txt")
+
+
+def load_cached_text(key, cache_directory=DEFAULT_CACHE_DIRECTORY):
+    cache_path = get_cache_path(key, cache_directory)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as file:
+            text = file.read()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(cache_path)  # Mark as recently used for eviction
+    except FileNotFoundError:
+        pass  # Evicted by another thread since the read; the text is still valid
+    return text
+
+
+def save_cached_text(key, text, cache_directory=DEFAULT_CACHE_DIRECTORY, max_size=DEFAULT_MAX_CACHE_SIZE):
+    os.makedirs(cache_directory, exist_ok=True)
+    cache_path = get_cache_path(key, cache_directory)
+    temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temp_path, cache_path)
+    evict_cache(cache_directory, max_size)
+
+
+# Delete least recently used entries until the cache fits in max_size bytes
+def evict_cache(cache_directory=DEFAULT_CACHE_DIRECTORY, max_size=DEFAULT_MAX_CACHE_SIZE):
+    with _cache_lock:
+        entries = []
+        for entry in os.scandir(cache_directory):
+            if entry.is_file() and entry.name.endswith(".txt"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
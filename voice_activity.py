@@ -0,0 +1,175 @@
+import bisect
+import json
+import math
+import os
+import subprocess
+import numpy as np
+from chunk_planner import ANALYSIS_SAMPLE_RATE, FRAME_MS, SEARCH_WINDOW_MS, frame_rms
+from tracing import span
+
+# Voice-activity pre-pass for transcription. The recording is decoded once
+# (mono, 8 kHz, streamed through ffmpeg, never held in memory) and every
+# FRAME_MS frame whose energy is VAD_MARGIN_DB above the noise floor counts as
+# speech. Quiet stretches longer than MIN_SILENCE_MS (breaks, rules lookups)
+# are cut, keeping PADDING_MS of each side, and only the remaining speech
+# spans are encoded into chunks, so the cut seconds are never uploaded.
+#
+# The SpeechMap records the kept spans in original recording time. Chunks and
+# Whisper segments are timed on the condensed (cut) timeline, and
+# to_original() maps any such time back to the recording, so transcript.seg
+# stays in recording time. The map is saved as speech_map.json next to the
+# transcript: {"duration_ms": ..., "spans": [[start_ms, end_ms], ...]}.
+
+VAD_MARGIN_DB = 12.0  # Speech is at least this far above the noise floor
+NOISE_FLOOR_PERCENTILE = 10  # The quietest 10% of frames estimate the room noise
+MIN_SILENCE_MS = 3000  # Shorter pauses are part of the conversation and kept
+PADDING_MS = 300  # Audio kept on each side of speech, so words are not clipped
+READ_BLOCK_FRAMES = 3000  # Frames decoded per read (one minute at 20 ms frames)
+SPEECH_MAP_FILE_NAME = "speech_map.json"
+
+
+class SpeechMap:
+    def __init__(self, spans, duration_ms):
+        """spans: [(start_ms, end_ms)] kept, in recording time, sorted and not overlapping"""
+        self.spans = [(int(start_ms), int(end_ms)) for start_ms, end_ms in spans]
+        self.duration_ms = int(duration_ms)
+        self.condensed_starts = []
+        position = 0
+        for start_ms, end_ms in self.spans:
+            self.condensed_starts.append(position)
+            position += end_ms - start_ms
+        self.condensed_ms = position
+
+    @property
+    def removed_ms(self):
+        return self.duration_ms - self.condensed_ms
+
+    # Recording time of a time on the condensed timeline; a time at a cut maps to the
+    # end of the span before it when at_end, to the start of the next one otherwise
+    def to_original(self, condensed_ms, at_end=False):
+        if not self.spans:
+            return condensed_ms
+        if at_end:
+            index = bisect.bisect_left(self.condensed_starts, condensed_ms) - 1
+        else:
+            index = bisect.bisect_right(self.condensed_starts, condensed_ms) - 1
+        index = min(max(index, 0), len(self.spans) - 1)
+        start_ms, end_ms = self.spans[index]
+        return min(end_ms, start_ms + max(0, condensed_ms - self.condensed_starts[index]))
+
+    # Recording-time spans that make up [start_ms, end_ms) of the condensed timeline
+    def original_spans(self, start_ms, end_ms):
+        spans = []
+        for (span_start, span_end), condensed_start in zip(self.spans, self.condensed_starts):
+            low = max(start_ms, condensed_start)
+            high = min(end_ms, condensed_start + span_end - span_start)
+            if low < high:
+                spans.append((span_start + low - condensed_start, span_start + high - condensed_start))
+        return spans
+
+    # Condensed times where a cut was made (between two kept spans)
+    def cut_points(self):
+        return self.condensed_starts[1:]
+
+    # {"start", "end", "text"} segments timed on the condensed timeline -> recording time
+    def remap_segments(self, segments):
+        remapped = []
+        for segment in segments:
+            start = self.to_original(segment["start"] * 1000) / 1000
+            end = self.to_original(segment["end"] * 1000, at_end=True) / 1000
+            remapped.append({**segment, "start": round(start, 3), "end": round(max(start, end), 3)})
+        return remapped
+
+    def save(self, path):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"duration_ms": self.duration_ms, "spans": self.spans}, file)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data["spans"], data["duration_ms"])
+
+
+# Frame RMS energy of the whole recording, decoded in blocks through an ffmpeg pipe
+def read_frame_energy(audio_file, sample_rate=ANALYSIS_SAMPLE_RATE, frame_ms=FRAME_MS):
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"Audio file not found: {audio_file}")
+
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-i", audio_file, "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    block_size = sample_rate * frame_ms // 1000 * 2 * READ_BLOCK_FRAMES
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found. Install ffmpeg and make sure it is on PATH")
+
+    energy = []
+    with process:
+        while True:
+            block = process.stdout.read(block_size)
+            if not block:
+                break
+            energy.append(frame_rms(np.frombuffer(block[: len(block) // 2 * 2], dtype="<i2"), sample_rate, frame_ms))
+        error = process.stderr.read()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {error.decode('utf-8', errors='replace').strip()}")
+    return np.concatenate(energy) if energy else np.zeros(0, dtype=np.float32)
+
+
+# Kept (start_ms, end_ms) spans: speech frames, bridged over pauses shorter than min_silence_ms and padded
+def find_speech_spans(energy, duration_ms, frame_ms=FRAME_MS, margin_db=VAD_MARGIN_DB, min_silence_ms=MIN_SILENCE_MS, padding_ms=PADDING_MS):
+    if len(energy) == 0:
+        return [(0, duration_ms)]
+    decibels = 20 * np.log10(np.maximum(energy, 1.0) / 32768)
+    threshold = np.percentile(decibels, NOISE_FLOOR_PERCENTILE) + margin_db
+    speech_frames = np.flatnonzero(decibels > threshold)
+    if len(speech_frames) == 0:
+        return [(0, duration_ms)]  # Nothing stands out: keep everything rather than guess
+
+    # Runs of speech frames, split wherever the gap reaches min_silence_ms
+    gaps = np.flatnonzero(np.diff(speech_frames) * frame_ms >= min_silence_ms)
+    run_starts = np.concatenate(([speech_frames[0]], speech_frames[gaps + 1]))
+    run_ends = np.concatenate((speech_frames[gaps], [speech_frames[-1]])) + 1
+
+    spans = []
+    for first, last in zip(run_starts, run_ends):
+        start_ms = max(0, int(first) * frame_ms - padding_ms)
+        end_ms = min(duration_ms, int(last) * frame_ms + padding_ms)
+        if spans and start_ms <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], end_ms)
+        else:
+            spans.append((start_ms, end_ms))
+    return spans
+
+
+def detect_speech(audio_file, duration_ms):
+    """SpeechMap of audio_file with its long quiet stretches cut."""
+    with span("vad", duration_ms=duration_ms) as current:
+        spans = find_speech_spans(read_frame_energy(audio_file), duration_ms)
+        speech_map = SpeechMap(spans, duration_ms)
+        current.set(removed_ms=speech_map.removed_ms, spans=len(spans))
+    return speech_map
+
+
+def plan_condensed_boundaries(speech_map, end_ms, num_chunks, max_chunk_ms, search_ms=SEARCH_WINDOW_MS, start_ms=0):
+    """Like chunk_planner.plan_chunk_boundaries, on the condensed timeline of
+    speech_map: each boundary moves to the nearest cut (a removed silence)
+    within search_ms of its target, and stays on target when there is none."""
+    duration_ms = end_ms - start_ms
+    num_chunks = max(num_chunks, math.ceil(duration_ms / max_chunk_ms))
+    if num_chunks <= 1:
+        return [(start_ms, end_ms)]
+
+    nominal_ms = duration_ms / num_chunks
+    search_ms = int(min(search_ms, (max_chunk_ms - nominal_ms) / 2, nominal_ms / 4))  # Neighbouring cuts stay half a chunk apart
+    cut_points = speech_map.cut_points()
+    cuts = []
+    for i in range(1, num_chunks):
+        target_ms = start_ms + round(i * nominal_ms)
+        nearby = [point for point in cut_points if abs(point - target_ms) <= search_ms]
+        cuts.append(min(nearby, key=lambda point: abs(point - target_ms)) if nearby else target_ms)
+
+    edges = [start_ms, *cuts, end_ms]
+    return [(edges[i], edges[i + 1]) for i in range(num_chunks)]
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Long-running local Whisper worker. Loading a model ("turbo" especially)
+# takes many seconds and gigabytes of RAM, so the daemon loads each model once
+# and keeps it in memory between jobs:
+#   python whisper_daemon.py --model turbo
+# Clients POST {"audio": path, "model": name, "options": {...}} to /transcribe
+# and get the Whisper result (text, segments, language) back as JSON. The audio
+# is read from disk by the daemon, so it only listens on localhost. Jobs for
+# the same model run one at a time.
+#
+# transcribe() is what scripts call: it uses the daemon when one is running
+# and falls back to loading the model in-process otherwise.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+DAEMON_URL = os.getenv("WHISPER_DAEMON_URL", f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+HEALTH_TIMEOUT = 0.5  # Seconds to wait for a daemon before falling back to in-process
+
+_models = {}  # In-process model cache: name -> model
+_models_lock = threading.Lock()
+
+
+# Load a Whisper model once per process
+def load_model(model_name):
+    with _models_lock:
+        if model_name not in _models:
+            import whisper  # Imported here: torch alone takes seconds to import
+
+            print(f"Loading Whisper model '{model_name}'...")
+            start_time = time.time()
+            _models[model_name] = whisper.load_model(model_name)
+            print(f"Model '{model_name}' loaded in {time.time() - start_time:.2f} seconds.")
+        return _models[model_name]
+
+
+def transcribe_local(audio_file, model_name, **options):
+    return load_model(model_name).transcribe(audio=audio_file, **options)
+
+
+# Daemon status dict, or None when no daemon answers at url
+def get_daemon_status(url=DAEMON_URL, timeout=HEALTH_TIMEOUT):
+    try:
+        with urllib.request.urlopen(f"{url}/health", timeout=timeout) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def transcribe_with_daemon(audio_file, model_name, url=DAEMON_URL, **options):
+    request_body = json.dumps({"audio": os.path.abspath(audio_file), "model": model_name, "options": options}).encode("utf-8")
+    request = urllib.request.Request(f"{url}/transcribe", data=request_body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"Whisper daemon failed to transcribe {audio_file}: {e.read().decode('utf-8', 'replace')}") from e
+
+
+# Transcribe with the daemon if one is running, otherwise in this process
+def transcribe(audio_file, model_name, url=DAEMON_URL, **options):
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"Audio file not found: {audio_file}")
+
+    status = get_daemon_status(url)
+    if status:
+        print(f"Sending transcription job to the Whisper daemon at {url} (loaded models: {', '.join(status['models']) or 'none'})")
+        return transcribe_with_daemon(audio_file, model_name, url, **options)
+
+    print("No Whisper daemon running, transcribing in-process (start one with: python whisper_daemon.py)")
+    return transcribe_local(audio_file, model_name, **options)
+
+
+class WhisperDaemonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, data):
+        body = json.dumps(data, default=float).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"models": sorted(_models), "jobs": self.server.jobs_done})
+        else:
+            self.send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/transcribe":
+            self.send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+            return
+
+        job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        audio_file = job["audio"]
+        model_name = job.get("model") or self.server.default_model
+        if not os.path.exists(audio_file):
+            self.send_json(404, {"error": f"Audio file not found: {audio_file}"})
+            return
+
+        try:
+            model = load_model(model_name)
+            with self.server.get_model_lock(model_name):
+                print(f"Transcribing {audio_file} with '{model_name}'...")
+                start_time = time.time()
+                result = model.transcribe(audio=audio_file, **job.get("options", {}))
+                print(f"Finished {audio_file} in {time.time() - start_time:.2f} seconds.")
+                self.server.jobs_done += 1
+        except Exception as e:
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self.send_json(200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WhisperDaemon(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, default_model="turbo"):
+        super().__init__((host, port), WhisperDaemonHandler)
+        self.default_model = default_model
+        self.jobs_done = 0
+        self.model_locks = {}
+        self.model_locks_lock = threading.Lock()
+
+    # One job at a time per model: Whisper models are not safe to share between threads
+    def get_model_lock(self, model_name):
+        with self.model_locks_lock:
+            return self.model_locks.setdefault(model_name, threading.Lock())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a Whisper model loaded and serve local transcription jobs.")
+    parser.add_argument("--model", default="turbo", help="Model to preload (others are loaded on first use, default: turbo)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    load_model(args.model)
+    daemon = WhisperDaemon(port=args.port, default_model=args.model)
+    print(f"Whisper daemon listening on http://{DEFAULT_HOST}:{args.port}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from audio_chunker import get_audio_duration, iter_audio_chunks
+from chunk_planner import plan_chunk_boundaries
+
+# Multi-process local Whisper transcription for CPU-only machines. The
+# recording is cut into windows at quiet points (chunk_planner), each worker
+# process loads its own copy of the model and transcribes whole windows, and
+# the results are merged back in timestamp order with segment times shifted
+# to the original recording's timeline.
+
+WINDOWS_PER_WORKER = 2  # More windows than workers evens out uneven window times
+WINDOW_SAMPLE_RATE = 16000  # Whisper's native input rate
+
+_worker_model = None
+
+
+# Process pool initializer: limit torch threads, then load this worker's model
+def init_worker(model_name, threads):
+    global _worker_model
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+    import whisper
+
+    _worker_model = whisper.load_model(model_name)
+
+
+# Transcribe one window and shift its timestamps by the window start
+def transcribe_window(window_file, start_ms, options):
+    start_time = time.time()
+    result = _worker_model.transcribe(audio=window_file, **options)
+    offset = start_ms / 1000
+    for segment in result["segments"]:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words", []):
+            word["start"] += offset
+            word["end"] += offset
+    return start_ms, result, time.time() - start_time, os.getpid()
+
+
+def transcribe_parallel(audio_file, model_name, workers, threads=None, **options):
+    """Transcribe audio_file on `workers` processes with one model each
+    (`threads` torch threads per worker). Returns a Whisper-style result dict
+    with the merged text and segments in recording time."""
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"Audio file not found: {audio_file}")
+    if workers < 1:
+        raise ValueError(f"Number of Whisper workers must be at least 1, got {workers}")
+
+    duration_ms = get_audio_duration(audio_file)
+    num_windows = max(1, min(workers * WINDOWS_PER_WORKER, math.ceil(duration_ms / 60000)))  # Windows of at least a minute
+    boundaries = plan_chunk_boundaries(audio_file, duration_ms, num_windows, max_chunk_ms=duration_ms)
+    print(f"Transcribing {duration_ms / 60000:.1f} min in {len(boundaries)} windows on {workers} worker(s), {threads or 'default'} thread(s) each...")
+
+    start_time = time.time()
+    with tempfile.TemporaryDirectory() as windows_dir:
+        # Models are only loaded in the workers, so the parent never starts torch threads and forking is safe
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_name, threads)) as executor:
+            # Each window is queued as soon as it is exported, while workers are still loading their models
+            windows = iter_audio_chunks(
+                audio_file,
+                windows_dir,
+                boundaries,
+                extension="wav",
+                name_format="window_{number}",
+                extra_args=["-ac", "1", "-ar", str(WINDOW_SAMPLE_RATE)],
+            )
+            futures = [executor.submit(transcribe_window, window.path, window.start_ms, options) for window in windows]
+            results = sorted(future.result() for future in futures)
+    elapsed = time.time() - start_time
+
+    for start_ms, _, window_seconds, pid in results:
+        print(f"  Window at {start_ms / 1000:.1f}s: {window_seconds:.2f} seconds (worker {pid})")
+    audio_seconds = duration_ms / 1000
+    print(f"Transcribed {audio_seconds / 60:.1f} min in {elapsed:.2f} seconds with {workers} worker(s): real-time factor {elapsed / audio_seconds:.3f}")
+
+    segments = [segment for _, result, _, _ in results for segment in result["segments"]]
+    for number, segment in enumerate(segments):
+        segment["id"] = number
+    return {
+        "text": " ".join(result["text"].strip() for _, result, _, _ in results if result["text"].strip()),
+        "segments": segments,
+        "language": results[0][1].get("language") if results else None,
+    }